@@ -0,0 +1,263 @@
+"""
+===========================================================================
+ Modulo: Arboles compilados (evaluacion de ensembles sin xgboost/sklearn)
+===========================================================================
+
+Descripcion:
+------------
+Exporta ensembles de arboles entrenados a arrays planos de NumPy y los
+evalua vectorizado, sin importar xgboost, sklearn ni joblib:
+
+- Un nodo por posicion en arrays globales: feature (-1 = hoja), umbral
+  (float32), izq, der, faltante (hijo si el valor es NaN) y valor de la
+  hoja; raices[t] es el primer nodo del arbol t
+- Regla unica: x < umbral -> izq. xgboost ya usa esa regla; los umbrales
+  de sklearn (x <= t en float64) se convierten al float32 equivalente,
+  asi las decisiones coinciden bit a bit con el modelo original
+- xgboost (Booster o XGBClassifier, objetivo logistico): margen = suma de
+  hojas + base_score en escala logit, prob = sigmoide. Se lee del JSON
+  del modelo (save_raw("json")), que guarda los umbrales exactos
+- RandomForestClassifier binario: hoja = fraccion de la clase positiva /
+  n_arboles, prob = suma
+- La evaluacion avanza todas las filas x arboles un nivel por iteracion
+  (profundidad maxima iteraciones), por lotes de FILAS_LOTE filas
+- verificar_equivalencia() compara contra el modelo original sobre
+  muestras pegadas a cada umbral (a ambos lados y NaN), lo que recorre
+  todas las ramas; registro_modelos solo guarda el .npz si pasa
+
+Uso:
+----
+    from my_modules.arboles_compilados import ArbolesCompilados, exportar, verificar_equivalencia
+    compilado = exportar(modelo, features)
+    assert verificar_equivalencia(modelo, compilado)["ok"]
+    compilado.guardar("modelo.npz")
+    prob = ArbolesCompilados.cargar("modelo.npz").prob(X)
+===========================================================================
+"""
+
+import os
+import json
+
+import numpy as np
+
+FORMATO = 1
+FILAS_LOTE = 20_000
+TOLERANCIA = 1e-5
+
+class ArbolesCompilados:
+    ARRAYS = ("feature", "umbral", "izq", "der", "faltante", "valor", "raices")
+
+    def __init__(self, feature, umbral, izq, der, faltante, valor, raices, feature_names,
+                 tipo, transformacion="identidad", base=0.0, profundidad=None):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.umbral = np.asarray(umbral, dtype=np.float32)
+        self.izq = np.asarray(izq, dtype=np.int32)
+        self.der = np.asarray(der, dtype=np.int32)
+        self.faltante = np.asarray(faltante, dtype=np.int32)
+        self.valor = np.asarray(valor, dtype=np.float64)
+        self.raices = np.asarray(raices, dtype=np.int32)
+        self.feature_names_in_ = list(feature_names)
+        self.tipo = tipo
+        self.transformacion = transformacion
+        self.base = float(base)
+        self.profundidad = profundidad if profundidad is not None else _profundidad(self.izq, self.der, self.raices)
+
+    def __len__(self):
+        return len(self.raices)
+
+    # === EVALUACION ===
+    def _margen_lote(self, X):
+        filas = np.arange(len(X))[:, None]
+        nodos = np.broadcast_to(self.raices, (len(X), len(self.raices))).copy()
+        for _ in range(self.profundidad):
+            f = self.feature[nodos]
+            interno = f >= 0
+            if not interno.any():
+                break
+            x = X[filas, np.where(interno, f, 0)]
+            siguiente = np.where(np.isnan(x), self.faltante[nodos],
+                                 np.where(x < self.umbral[nodos], self.izq[nodos], self.der[nodos]))
+            nodos = np.where(interno, siguiente, nodos)
+        return self.valor[nodos].sum(axis=1)
+
+    def margen(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        salida = np.empty(len(X), dtype=np.float64)
+        for i in range(0, len(X), FILAS_LOTE):
+            salida[i:i + FILAS_LOTE] = self._margen_lote(X[i:i + FILAS_LOTE])
+        return salida + self.base
+
+    def prob(self, X):
+        """Probabilidad de la clase positiva para X (filas x feature_names_in_)."""
+        m = self.margen(X)
+        return 1.0 / (1.0 + np.exp(-m)) if self.transformacion == "sigmoide" else m
+
+    # === PERSISTENCIA ===
+    def guardar(self, path):
+        meta = {"formato": FORMATO, "feature_names": self.feature_names_in_, "tipo": self.tipo,
+                "transformacion": self.transformacion, "base": self.base, "profundidad": self.profundidad}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **{k: getattr(self, k) for k in self.ARRAYS})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def cargar(cls, path):
+        with np.load(path, allow_pickle=False) as datos:
+            meta = json.loads(str(datos["meta"]))
+            if meta["formato"] != FORMATO:
+                raise ValueError(f"Formato de arboles compilados no soportado: {meta['formato']}")
+            arrays = {k: datos[k] for k in cls.ARRAYS}
+        return cls(**arrays, feature_names=meta["feature_names"], tipo=meta["tipo"],
+                   transformacion=meta["transformacion"], base=meta["base"], profundidad=meta["profundidad"])
+
+def _profundidad(izq, der, raices):
+    """Maximo numero de saltos raiz -> hoja (hojas apuntan a si mismas)."""
+    profundidad, nivel = 0, np.asarray(raices)
+    while True:
+        internos = nivel[izq[nivel] != nivel]
+        if not len(internos):
+            return profundidad
+        profundidad += 1
+        nivel = np.concatenate([izq[internos], der[internos]])
+
+# === EXPORTACION ===
+def _concatenar(arboles):
+    """arboles: lista de dicts con arrays locales (hijos -1 en hojas). Devuelve arrays globales + raices."""
+    partes = {k: [] for k in ("feature", "umbral", "izq", "der", "faltante", "valor")}
+    raices, offset = [], 0
+    for a in arboles:
+        n = len(a["feature"])
+        local = np.arange(n)
+        hoja = a["izq"] < 0
+        partes["feature"].append(np.where(hoja, -1, a["feature"]))
+        partes["umbral"].append(np.where(hoja, 0, a["umbral"]).astype(np.float32))
+        for k in ("izq", "der", "faltante"):
+            partes[k].append(np.where(hoja, local, a[k]) + offset)
+        partes["valor"].append(np.where(hoja, a["valor"], 0.0))
+        raices.append(offset)
+        offset += n
+    return {k: np.concatenate(v) for k, v in partes.items()}, np.array(raices, dtype=np.int32)
+
+def _base_logit(valor):
+    # base_score viene como texto ("5E-1" o "[5E-1]" segun version) en escala de probabilidad
+    b = float(str(valor).strip("[]"))
+    return float(np.log(b / (1.0 - b)))
+
+def _desde_xgboost(modelo, feature_names):
+    booster = modelo.get_booster() if hasattr(modelo, "get_booster") else modelo
+    learner = json.loads(bytes(booster.save_raw("json")))["learner"]
+    objetivo = learner["objective"]["name"]
+    if objetivo not in ("binary:logistic", "reg:logistic"):
+        raise ValueError(f"Objetivo xgboost no soportado: {objetivo}")
+    gb = learner["gradient_booster"]
+    if gb["name"] != "gbtree":
+        raise ValueError(f"Booster no soportado: {gb['name']}")
+    arboles_json = gb["model"]["trees"]
+    # XGBClassifier con early stopping predice solo hasta best_iteration
+    mejor = getattr(modelo, "best_iteration", None) if hasattr(modelo, "get_booster") else None
+    if mejor is not None:
+        paralelos = int(gb["model"]["gbtree_model_param"].get("num_parallel_tree", 1))
+        arboles_json = arboles_json[:(mejor + 1) * paralelos]
+
+    nombres = booster.feature_names
+    if nombres is not None and feature_names is not None and list(nombres) != list(feature_names):
+        raise ValueError("Las features del booster no coinciden con las registradas")
+    arboles = []
+    for t in arboles_json:
+        if any(t.get("split_type", [])):
+            raise ValueError("Splits categoricos no soportados")
+        izq = np.array(t["left_children"], dtype=np.int64)
+        der = np.array(t["right_children"], dtype=np.int64)
+        cond = np.array(t["split_conditions"], dtype=np.float64)
+        arboles.append({
+            "feature": np.array(t["split_indices"], dtype=np.int64),
+            "umbral": cond.astype(np.float32),
+            "izq": izq,
+            "der": der,
+            "faltante": np.where(np.array(t["default_left"], dtype=bool), izq, der),
+            "valor": cond,  # en las hojas split_conditions guarda el valor de la hoja
+        })
+    arrays, raices = _concatenar(arboles)
+    base = _base_logit(learner["learner_model_param"]["base_score"])
+    return ArbolesCompilados(**arrays, raices=raices, feature_names=feature_names or nombres,
+                             tipo="xgboost", transformacion="sigmoide", base=base)
+
+def _umbral_menor_igual(t):
+    """Umbral float32 u tal que, para x float32, x <= t (float64) <=> x < u."""
+    c = t.astype(np.float32)
+    c = np.where(c.astype(np.float64) > t, np.nextafter(c, np.float32(-np.inf)), c)
+    return np.nextafter(c, np.float32(np.inf))
+
+def _desde_sklearn(modelo, feature_names):
+    if len(getattr(modelo, "classes_", [])) != 2:
+        raise ValueError("Solo clasificadores binarios de sklearn")
+    estimadores = modelo.estimators_
+    arboles = []
+    for est in estimadores:
+        tree = est.tree_
+        valores = tree.value[:, 0, :]
+        izq = tree.children_left.astype(np.int64)
+        # missing_go_to_left existe desde sklearn 1.3; sin el los NaN van a la izquierda
+        va_izq = getattr(tree, "missing_go_to_left", None)
+        va_izq = np.ones(len(izq), dtype=bool) if va_izq is None else va_izq.astype(bool)
+        arboles.append({
+            "feature": tree.feature.astype(np.int64),
+            "umbral": _umbral_menor_igual(tree.threshold),
+            "izq": izq,
+            "der": tree.children_right.astype(np.int64),
+            "faltante": np.where(va_izq, izq, tree.children_right),
+            "valor": valores[:, -1] / valores.sum(axis=1) / len(estimadores),
+        })
+    arrays, raices = _concatenar(arboles)
+    nombres = feature_names or list(getattr(modelo, "feature_names_in_", []))
+    return ArbolesCompilados(**arrays, raices=raices, feature_names=nombres, tipo="rf")
+
+def exportar(modelo, feature_names=None):
+    """ArbolesCompilados equivalente a un Booster/XGBClassifier o a un RandomForestClassifier."""
+    if hasattr(modelo, "save_raw") or hasattr(modelo, "get_booster"):
+        return _desde_xgboost(modelo, feature_names)
+    if hasattr(modelo, "estimators_") and hasattr(getattr(modelo.estimators_[0], "tree_", None), "children_left"):
+        return _desde_sklearn(modelo, feature_names)
+    raise ValueError(f"Modelo no exportable: {type(modelo).__name__}")
+
+# === EQUIVALENCIA ===
+def prob_original(modelo, X, feature_names):
+    if hasattr(modelo, "inplace_predict"):
+        return np.asarray(modelo.inplace_predict(X))
+    import pandas as pd
+    return modelo.predict_proba(pd.DataFrame(X, columns=feature_names))[:, -1]
+
+def muestras_frontera(compilado, n=2000, frac_nan=0.05, semilla=42):
+    """Filas con cada feature tomada de sus umbrales (justo debajo, en el umbral o justo encima) o NaN."""
+    rng = np.random.default_rng(semilla)
+    internos = compilado.feature >= 0
+    X = np.zeros((n, len(compilado.feature_names_in_)), dtype=np.float32)
+    for j in range(X.shape[1]):
+        umbrales = compilado.umbral[internos & (compilado.feature == j)]
+        if not len(umbrales):
+            continue
+        u = rng.choice(umbrales, n)
+        lado = rng.integers(-1, 2, n)
+        X[:, j] = np.where(lado < 0, np.nextafter(u, np.float32(-np.inf)), np.where(lado > 0, np.nextafter(u, np.float32(np.inf)), u))
+    if frac_nan:
+        X[rng.random(X.shape) < frac_nan] = np.nan
+    return X
+
+def verificar_equivalencia(modelo, compilado, X=None, tolerancia=TOLERANCIA):
+    """Compara prob y prediccion (prob > 0.5) del compilado contra el modelo original."""
+    if X is None:
+        # sklearn anterior a 1.3 no admite NaN: el RF se verifica sin faltantes
+        X = muestras_frontera(compilado, frac_nan=0.05 if compilado.tipo == "xgboost" else 0.0)
+    X = np.asarray(X, dtype=np.float32)
+    esperado = prob_original(modelo, X, compilado.feature_names_in_)
+    obtenido = compilado.prob(X)
+    dif = np.abs(esperado - obtenido)
+    # Las predicciones solo pueden diferir donde la prob esta a menos de la tolerancia de 0.5
+    distintas = ((esperado > 0.5) != (obtenido > 0.5)) & (np.abs(esperado - 0.5) > tolerancia)
+    return {
+        "ok": bool(dif.max(initial=0.0) <= tolerancia and not distintas.any()),
+        "filas": len(X),
+        "max_dif": float(dif.max(initial=0.0)),
+        "predicciones_distintas": int(distintas.sum()),
+    }
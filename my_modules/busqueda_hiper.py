@@ -0,0 +1,273 @@
+"""
+===========================================================================
+ Modulo: Busqueda de hiperparametros (random search + successive halving)
+===========================================================================
+
+Descripcion:
+------------
+Busqueda offline, solo CPU, de hiperparametros para los modelos ML
+(xgboost y RandomForest) sobre el dataset materializado de dataset_ml:
+
+- Las configuraciones se muestrean al azar (semilla fija) del espacio de
+  cada modelo y se filtran por successive halving: en cada ronda el
+  recurso (rondas de boosting / numero de arboles) se multiplica por eta
+  y sigue solo el mejor 1/eta
+- Los datos se preparan una sola vez y se comparten entre ensayos: para
+  xgboost un QuantileDMatrix de entrenamiento (cuantizado una vez,
+  leido por lotes) y otro de validacion con los mismos cortes; para RF
+  arrays float32 en memoria
+- Validacion: ultimo frac_val de fechas, con el entrenamiento purgado
+  (filtros_fold de entrenamiento_xgb)
+- Los ensayos corren en hilos (xgboost y sklearn liberan el GIL) dentro
+  de un presupuesto de cpus: cpus // hilos ensayos a la vez
+- Cada ensayo terminado se anota en un checkpoint JSONL
+  (data/busquedas/, con la huella del contenido del dataset en el
+  nombre); relanzar la misma busqueda salta los ensayos ya hechos,
+  asi que un corte por limite_horas se reanuda sin perder nada
+- La mejor configuracion se reentrena sobre todo el dataset y se
+  registra en el registro de modelos en sombra, con sus parametros y la
+  metrica de validacion
+
+Uso:
+----
+    from my_modules.busqueda_hiper import buscar
+    id_modelo, mejor = buscar("xgboost", ruta_parquet, features)
+===========================================================================
+"""
+
+import os
+import json
+import math
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from my_modules.cache_incremental import combinar
+from my_modules.entrenamiento_xgb import (
+    PARAMS_DEFECTO, crear_iterador, fechas_unicas, filtros_fold, objetivo_binario,
+)
+from my_modules.registro_modelos import RegistroModelos
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+BUSQUEDAS_DIR = REPO_DIR / "data" / "busquedas"
+MAX_FILAS_RF = 2_000_000
+
+# === ESPACIOS ===
+# (tipo, minimo, maximo); "log" muestrea uniforme en escala logaritmica
+ESPACIOS = {
+    "xgboost": {
+        "max_depth": ("int", 2, 8),
+        "eta": ("log", 0.01, 0.3),
+        "subsample": ("float", 0.5, 1.0),
+        "colsample_bytree": ("float", 0.5, 1.0),
+        "min_child_weight": ("log", 1, 50),
+        "lambda": ("log", 0.1, 10),
+    },
+    "rf": {
+        "max_depth": ("int", 3, 20),
+        "min_samples_leaf": ("int", 1, 200),
+        "max_features": ("float", 0.2, 1.0),
+    },
+}
+RECURSO_MIN = {"xgboost": 50, "rf": 25}
+
+def muestrear(espacio, n, semilla=42):
+    rng = random.Random(semilla)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for nombre, (tipo, bajo, alto) in espacio.items():
+            if tipo == "int":
+                config[nombre] = rng.randint(bajo, alto)
+            elif tipo == "log":
+                config[nombre] = round(math.exp(rng.uniform(math.log(bajo), math.log(alto))), 5)
+            else:
+                config[nombre] = round(rng.uniform(bajo, alto), 4)
+        configs.append(config)
+    return configs
+
+def logloss(y, prob):
+    prob = np.clip(np.asarray(prob, dtype=np.float64), 1e-7, 1 - 1e-7)
+    return float(-np.mean(y * np.log(prob) + (1 - y) * np.log(1 - prob)))
+
+# === CHECKPOINT ===
+class RegistroEnsayos:
+    """Checkpoint JSONL: una linea por ensayo terminado, clave (ensayo, recurso)."""
+    def __init__(self, path):
+        self.path = Path(path)
+        self.hechos = {}
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                for linea in f:
+                    try:
+                        e = json.loads(linea)
+                    except ValueError:
+                        continue  # ultima linea truncada por un corte
+                    self.hechos[(e["ensayo"], e["recurso"])] = e
+
+    def anotar(self, entrada):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entrada) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.hechos[(entrada["ensayo"], entrada["recurso"])] = entrada
+
+    def puntuacion(self, ensayo, recurso):
+        e = self.hechos.get((ensayo, recurso))
+        return math.inf if e is None or e.get("logloss") is None else e["logloss"]
+
+# === DATOS ===
+def filtros_validacion(ruta, frac_val=0.2):
+    """(filtro entrenamiento purgado, filtro validacion) con el ultimo frac_val de fechas como validacion."""
+    fechas = fechas_unicas(ruta)
+    inicio = fechas[min(len(fechas) - 1, int(len(fechas) * (1 - frac_val)))]
+    return filtros_fold(inicio, fechas[-1], fechas[-1])
+
+def _leer_tabla(ruta, features, objetivo, filtro=None, max_filas=None):
+    import pyarrow.dataset as ds
+    df = ds.dataset(str(ruta), format="parquet").to_table(columns=[*features, objetivo], filter=filtro).to_pandas()
+    df = df.dropna(subset=features)
+    if max_filas and len(df) > max_filas:
+        df = df.sample(max_filas, random_state=42)
+    return df[features].astype(np.float32), objetivo_binario(df[objetivo])
+
+def preparar_xgb(ruta, features, objetivo, filtros):
+    import xgboost as xgb
+    filtro_train, filtro_val = filtros
+    dtrain = xgb.QuantileDMatrix(crear_iterador(ruta, features, objetivo, filtro_train), max_bin=256)
+    dval = xgb.QuantileDMatrix(crear_iterador(ruta, features, objetivo, filtro_val), ref=dtrain)
+    return {"train": dtrain, "val": dval, "y_val": dval.get_label(), "filas": dtrain.num_row()}
+
+def preparar_rf(ruta, features, objetivo, filtros):
+    filtro_train, filtro_val = filtros
+    X_train, y_train = _leer_tabla(ruta, features, objetivo, filtro_train, MAX_FILAS_RF)
+    X_val, y_val = _leer_tabla(ruta, features, objetivo, filtro_val)
+    return {"X_train": X_train.to_numpy(), "y_train": y_train, "X_val": X_val.to_numpy(), "y_val": y_val,
+            "filas": len(X_train)}
+
+# === ENSAYOS ===
+def ensayo_xgb(datos, params, recurso, hilos):
+    import xgboost as xgb
+    booster = xgb.train(dict(PARAMS_DEFECTO, **params, nthread=hilos), datos["train"], num_boost_round=recurso)
+    return logloss(datos["y_val"], booster.predict(datos["val"]))
+
+def ensayo_rf(datos, params, recurso, hilos):
+    from sklearn.ensemble import RandomForestClassifier
+    modelo = RandomForestClassifier(n_estimators=recurso, n_jobs=hilos, random_state=42, **params)
+    modelo.fit(datos["X_train"], datos["y_train"])
+    return logloss(datos["y_val"], modelo.predict_proba(datos["X_val"])[:, -1])
+
+def final_xgb(ruta, features, objetivo, params, recurso, hilos):
+    import xgboost as xgb
+    dtodo = xgb.QuantileDMatrix(crear_iterador(ruta, features, objetivo), max_bin=256)
+    return xgb.train(dict(PARAMS_DEFECTO, **params, nthread=hilos), dtodo, num_boost_round=recurso)
+
+def final_rf(ruta, features, objetivo, params, recurso, hilos):
+    from sklearn.ensemble import RandomForestClassifier
+    X, y = _leer_tabla(ruta, features, objetivo, max_filas=MAX_FILAS_RF)
+    modelo = RandomForestClassifier(n_estimators=recurso, n_jobs=hilos, random_state=42, **params)
+    return modelo.fit(X, y)  # DataFrame: conserva feature_names_in_ para la inferencia
+
+MODELOS = {
+    "xgboost": {"preparar": preparar_xgb, "ensayo": ensayo_xgb, "final": final_xgb},
+    "rf": {"preparar": preparar_rf, "ensayo": ensayo_rf, "final": final_rf},
+}
+
+def _ejecutar(ensayo, datos, params, recurso, hilos):
+    t0 = time.perf_counter()
+    try:
+        return ensayo(datos, params, recurso, hilos), None, round(time.perf_counter() - t0, 1)
+    except Exception as e:
+        return None, str(e), round(time.perf_counter() - t0, 1)
+
+# === BUSQUEDA ===
+def huella_parquet(ruta):
+    """Huella de contenido barata del parquet (tamano + mtime) cuando no llega la de dataset_ml."""
+    st = Path(ruta).stat()
+    return combinar(st.st_size, st.st_mtime_ns)
+
+def path_busqueda(modelo, ruta, n_configs, eta, rondas, semilla, frac_val, directorio=BUSQUEDAS_DIR,
+                  huella_dataset=None):
+    # El contenido entra en la clave: un dataset reconstruido con los mismos nombres no reanuda ensayos viejos
+    huella = combinar(modelo, json.dumps(ESPACIOS[modelo], sort_keys=True), n_configs, eta, rondas, semilla, frac_val,
+                      huella_dataset or huella_parquet(ruta))
+    return Path(directorio) / f"{modelo}_{Path(ruta).stem}_{huella[:8]}.jsonl"
+
+def buscar(modelo, ruta, features, objetivo="senal", n_configs=27, eta=3, rondas=3, semilla=42,
+           frac_val=0.2, cpus=None, hilos=1, limite_horas=None, registrar=True,
+           directorio=BUSQUEDAS_DIR, huella_dataset=None, log=print):
+    """
+    Successive halving sobre n_configs configuraciones aleatorias.
+    huella_dataset: huella de contenido de materializar_dataset (por
+    defecto tamano + mtime del parquet); forma parte del checkpoint.
+    Devuelve (id del modelo registrado o None, mejor ensayo).
+    """
+    if modelo not in MODELOS:
+        raise ValueError(f"Modelo desconocido: {modelo}")
+    spec = MODELOS[modelo]
+    features = list(features)
+    configs = muestrear(ESPACIOS[modelo], n_configs, semilla)
+    ensayos = RegistroEnsayos(path_busqueda(modelo, ruta, n_configs, eta, rondas, semilla, frac_val, directorio,
+                                            huella_dataset))
+    limite = None if limite_horas is None else time.time() + limite_horas * 3600
+    paralelo = max(1, (cpus or os.cpu_count() or 1) // hilos)
+    if ensayos.hechos:
+        log(f"Reanudando {ensayos.path.name}: {len(ensayos.hechos)} ensayos ya hechos")
+
+    t0 = time.perf_counter()
+    datos = spec["preparar"](ruta, features, objetivo, filtros_validacion(ruta, frac_val))
+    log(f"Datos de {modelo} preparados en {time.perf_counter() - t0:.1f}s: {datos['filas']} filas de entrenamiento")
+
+    vivos = list(range(n_configs))
+    completa = True
+    for k in range(rondas):
+        recurso = RECURSO_MIN[modelo] * eta ** k
+        pendientes = [i for i in vivos if (i, recurso) not in ensayos.hechos]
+        log(f"Ronda {k}: {len(vivos)} configuraciones con recurso {recurso} ({len(pendientes)} pendientes, {paralelo} a la vez x {hilos} hilos)")
+        with ThreadPoolExecutor(max_workers=paralelo) as pool:
+            futuros = {}
+            for i in pendientes:
+                futuros[pool.submit(_ejecutar, spec["ensayo"], datos, configs[i], recurso, hilos)] = i
+            for futuro in as_completed(futuros):
+                if futuro.cancelled():
+                    continue
+                i = futuros[futuro]
+                puntuacion, error, segundos = futuro.result()
+                ensayos.anotar({"ensayo": i, "recurso": recurso, "params": configs[i],
+                                "logloss": puntuacion, "error": error, "segundos": segundos})
+                log(f"  ensayo {i} recurso {recurso}: {error or f'logloss {puntuacion:.5f}'} en {segundos}s")
+                if completa and limite is not None and time.time() > limite:
+                    # Los que ya corren terminan y se anotan; los no empezados se cancelan
+                    completa = False
+                    for pendiente in futuros:
+                        pendiente.cancel()
+        if not completa:
+            log(f"Limite de {limite_horas}h alcanzado en la ronda {k}; relanzar la misma busqueda para reanudar")
+            break
+        vivos = sorted(vivos, key=lambda i: ensayos.puntuacion(i, recurso))[:max(1, len(vivos) // eta)]
+    del datos
+
+    candidatos = [e for (i, r), e in ensayos.hechos.items() if i < n_configs and e.get("logloss") is not None]
+    if not candidatos:
+        log("Ningun ensayo terminado")
+        return None, None
+    mejor = min(candidatos, key=lambda e: (-e["recurso"], e["logloss"]))
+    log(f"Mejor: ensayo {mejor['ensayo']} recurso {mejor['recurso']} logloss {mejor['logloss']:.5f} {mejor['params']}")
+    if not (registrar and completa):
+        return None, mejor
+
+    t0 = time.perf_counter()
+    final = spec["final"](ruta, features, objetivo, mejor["params"], mejor["recurso"], cpus or os.cpu_count() or 1)
+    parametros = dict(mejor["params"], recurso=mejor["recurso"])
+    id_modelo = RegistroModelos().registrar(
+        final, f"{modelo}_busqueda", features, objetivo=objetivo, dataset=Path(ruta).stem,
+        huella_dataset=huella_dataset,
+        metricas={"logloss_val": mejor["logloss"], "ensayos": len(candidatos), "busqueda": ensayos.path.name},
+        parametros=parametros, estado="sombra",
+    )
+    log(f"Modelo final reentrenado en {time.perf_counter() - t0:.1f}s y registrado en sombra: {id_modelo}")
+    return id_modelo, mejor
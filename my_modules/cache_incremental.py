@@ -0,0 +1,136 @@
+"""
+===========================================================================
+ Modulo: Recomputo incremental por hash de contenido
+===========================================================================
+
+Descripcion:
+------------
+Manifiesto de ejecucion que guarda, por etapa y por clave (p.ej.
+"AAPL|cruce_medias_v4"), la huella de sus entradas y las rutas de salida
+generadas. Si en la siguiente ejecucion la huella coincide y las salidas
+siguen en disco, la etapa puede reutilizarlas en lugar de recalcular.
+
+Huellas:
+--------
+- huella_archivo(path): sha256 del contenido (memo por tamano + mtime)
+- huella_estrategia(funcion): sha256 del fuente del modulo + defaults
+  de la firma + parametros explicitos
+- combinar(*partes): sha256 de varias huellas/valores
+
+Uso:
+----
+    manifiesto = ManifiestoIncremental(PATH, forzar=args.force)
+    huella = combinar(huella_archivo(parquet), huella_estrategia(fn))
+    if manifiesto.vigente("senales", clave, huella):
+        ...reutilizar salidas...
+    else:
+        ...recalcular...
+        manifiesto.registrar("senales", clave, huella, [salida])
+    manifiesto.guardar()
+===========================================================================
+"""
+
+import os
+import json
+import hashlib
+import inspect
+import sys
+from datetime import datetime
+from pathlib import Path
+
+_MEMO_ARCHIVOS = {}
+
+
+# === HUELLAS ===
+def huella_archivo(path):
+    path = Path(path)
+    st = path.stat()
+    memo = (str(path), st.st_size, st.st_mtime_ns)
+    if memo not in _MEMO_ARCHIVOS:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloque)
+        _MEMO_ARCHIVOS[memo] = h.hexdigest()
+    return _MEMO_ARCHIVOS[memo]
+
+def huella_estrategia(funcion, params=None):
+    modulo = sys.modules.get(funcion.__module__)
+    try:
+        fuente = Path(modulo.__file__).read_bytes()
+    except Exception:
+        fuente = inspect.getsource(funcion).encode("utf-8")
+    firma = inspect.signature(funcion)
+    defaults = {k: repr(p.default) for k, p in firma.parameters.items() if p.default is not inspect.Parameter.empty}
+    h = hashlib.sha256(fuente)
+    h.update(json.dumps(defaults, sort_keys=True).encode("utf-8"))
+    h.update(json.dumps(params or {}, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+def combinar(*partes):
+    h = hashlib.sha256()
+    for p in partes:
+        h.update(str(p).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+# === MANIFIESTO ===
+class ManifiestoIncremental:
+    def __init__(self, path, forzar=False):
+        self.path = Path(path)
+        self.forzar = forzar
+        self.entradas = {}
+        self.conteo = {}
+        if self.path.exists() and not forzar:
+            try:
+                with open(self.path, "r") as f:
+                    self.entradas = json.load(f).get("entradas", {})
+            except Exception:
+                self.entradas = {}
+
+    def _contar(self, etapa, tipo):
+        c = self.conteo.setdefault(etapa, {"hits": 0, "misses": 0})
+        c[tipo] += 1
+
+    def vigente(self, etapa, clave, huella):
+        """True si `clave` ya se calculo con la misma huella y sus salidas siguen en disco."""
+        previo = self.entradas.get(etapa, {}).get(clave)
+        ok = (
+            not self.forzar
+            and previo is not None
+            and previo["huella"] == huella
+            and all(os.path.exists(s) for s in previo["salidas"])
+        )
+        self._contar(etapa, "hits" if ok else "misses")
+        return ok
+
+    def salidas(self, etapa, clave):
+        return self.entradas.get(etapa, {}).get(clave, {}).get("salidas", [])
+
+    def registrar(self, etapa, clave, huella, salidas=()):
+        self.entradas.setdefault(etapa, {})[clave] = {
+            "huella": huella,
+            "salidas": [str(s) for s in salidas],
+            "ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def olvidar(self, etapa, clave):
+        self.entradas.get(etapa, {}).pop(clave, None)
+
+    def reporte(self):
+        return {
+            etapa: dict(c, total=c["hits"] + c["misses"],
+                        ratio_hits=round(c["hits"] / (c["hits"] + c["misses"]), 4) if c["hits"] + c["misses"] else 0.0)
+            for etapa, c in self.conteo.items()
+        }
+
+    def guardar(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "actualizado": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "ultimo_reporte": self.reporte(),
+                "entradas": self.entradas,
+            }, f, indent=1)
+        os.replace(tmp_path, self.path)
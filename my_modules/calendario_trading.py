@@ -0,0 +1,188 @@
+"""
+===========================================================================
+ Modulo: Calendario de sesiones de trading
+===========================================================================
+
+Descripcion:
+------------
+Precalcula las sesiones de mercado a partir de reglas de festivos
+configurables offline (config/calendario_trading.json) y asigna a cada
+sesion un indice int32. Toda la aritmetica de fechas (sumar N sesiones,
+contar sesiones entre fechas, detectar huecos) se reduce a operaciones
+enteras sobre arrays numpy.
+
+Uso:
+----
+    from my_modules.calendario_trading import cargar_calendario
+    cal = cargar_calendario()
+    salida = cal.offset(fechas_entrada, 3)           # +3 sesiones
+    n = cal.sessions_between(fecha_a, fecha_b)       # sesiones entre fechas
+    reporte = cal.reporte_huecos(df["fecha"], "AAPL")
+
+Convencion:
+-----------
+Una fecha que no es sesion (fin de semana, festivo) se ancla a la sesion
+anterior antes de operar. offset() devuelve NaT si cae fuera del rango
+precalculado.
+===========================================================================
+"""
+
+import json
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CALENDARIO_PATH = Path(__file__).resolve().parents[1] / "config" / "calendario_trading.json"
+NAT = np.datetime64("NaT", "D")
+
+
+# === REGLAS DE FESTIVOS ===
+def _domingo_pascua(anio):
+    # Algoritmo anonimo gregoriano (Meeus/Jones/Butcher)
+    a = anio % 19
+    b, c = divmod(anio, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(anio, mes, dia + 1)
+
+def _n_dia_semana(anio, mes, dia_semana, n):
+    if n > 0:
+        d = date(anio, mes, 1)
+        d += timedelta(days=(dia_semana - d.weekday()) % 7)
+        return d + timedelta(weeks=n - 1)
+    siguiente = date(anio + (mes == 12), mes % 12 + 1, 1)
+    d = siguiente - timedelta(days=1)
+    d -= timedelta(days=(d.weekday() - dia_semana) % 7)
+    return d + timedelta(weeks=n + 1)
+
+def _observado(d, observancia):
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    if d.weekday() == 5:
+        return d - timedelta(days=1) if observancia == "cercano" else None
+    return d
+
+def festivos(reglas, anio_inicio, anio_fin):
+    dias = set()
+    for anio in range(anio_inicio, anio_fin + 1):
+        for r in reglas.get("fijos", []):
+            if anio < r.get("desde", anio_inicio) or anio > r.get("hasta", anio_fin):
+                continue
+            d = _observado(date(anio, r["mes"], r["dia"]), r.get("observancia", "cercano"))
+            if d is not None:
+                dias.add(d)
+        for r in reglas.get("n_dia_semana", []):
+            if anio < r.get("desde", anio_inicio) or anio > r.get("hasta", anio_fin):
+                continue
+            dias.add(_n_dia_semana(anio, r["mes"], r["dia_semana"], r["n"]))
+        for r in reglas.get("pascua", []):
+            dias.add(_domingo_pascua(anio) + timedelta(days=r["offset_dias"]))
+    dias.update(date.fromisoformat(f) for f in reglas.get("cierres_extra", []))
+    return dias
+
+# === CONVERSION ===
+def _a_dias(fechas):
+    """Convierte escalar, lista, Series o DatetimeIndex a array datetime64[D]."""
+    if np.isscalar(fechas) or isinstance(fechas, (date, pd.Timestamp)):
+        fechas = [fechas]
+    return pd.to_datetime(pd.Index(fechas), errors="coerce").values.astype("datetime64[D]")
+
+# === CALENDARIO ===
+class CalendarioTrading:
+    def __init__(self, sesiones):
+        self.sesiones = np.unique(np.asarray(sesiones, dtype="datetime64[D]"))
+        self.n = len(self.sesiones)
+
+    def __len__(self):
+        return self.n
+
+    def indice(self, fechas):
+        """Indice int32 de sesion; fechas no habiles se anclan a la sesion anterior (-1 si anteriores al calendario)."""
+        dias = _a_dias(fechas)
+        idx = np.searchsorted(self.sesiones, dias, side="right").astype(np.int32) - 1
+        idx[np.isnat(dias)] = -1
+        return idx
+
+    def es_sesion(self, fechas):
+        dias = _a_dias(fechas)
+        pos = np.searchsorted(self.sesiones, dias).clip(max=self.n - 1)
+        return (self.sesiones[pos] == dias) & ~np.isnat(dias)
+
+    def fecha(self, indices):
+        indices = np.asarray(indices)
+        valido = (indices >= 0) & (indices < self.n)
+        out = np.full(indices.shape, NAT)
+        out[valido] = self.sesiones[indices[valido]]
+        return out
+
+    def offset(self, fechas, n_sesiones):
+        """Fecha de la sesion situada `n_sesiones` despues (o antes, si negativo) de cada fecha."""
+        idx = self.indice(fechas)
+        destino = idx + np.asarray(n_sesiones, dtype=np.int32)
+        destino[idx < 0] = -1
+        return self.fecha(destino)
+
+    def sessions_between(self, inicio, fin):
+        """Numero de sesiones desde `inicio` hasta `fin` (fin - inicio en indices de sesion)."""
+        return self.indice(fin) - self.indice(inicio)
+
+    def sesiones_en_rango(self, inicio, fin):
+        a = np.searchsorted(self.sesiones, _a_dias(inicio)[0], side="left")
+        b = np.searchsorted(self.sesiones, _a_dias(fin)[0], side="right")
+        return pd.DatetimeIndex(self.sesiones[a:b])
+
+    def reporte_huecos(self, fechas_presentes, simbolo=None):
+        """Compara sesiones esperadas vs presentes entre la primera y la ultima fecha del simbolo."""
+        dias = np.unique(_a_dias(fechas_presentes))
+        dias = dias[~np.isnat(dias)]
+        reporte = {
+            "simbolo": simbolo,
+            "fecha_min": None,
+            "fecha_max": None,
+            "esperadas": 0,
+            "presentes": int(len(dias)),
+            "faltantes": [],
+            "fuera_calendario": [],
+            "max_hueco_sesiones": 0,
+        }
+        if len(dias) == 0:
+            return reporte
+        en_calendario = self.es_sesion(dias)
+        validas = dias[en_calendario]
+        reporte["fuera_calendario"] = [str(d) for d in dias[~en_calendario]]
+        if len(validas) == 0:
+            return reporte
+
+        idx = self.indice(validas)
+        esperadas = np.arange(idx[0], idx[-1] + 1, dtype=np.int32)
+        faltantes = np.setdiff1d(esperadas, idx, assume_unique=True)
+        reporte.update({
+            "fecha_min": pd.Timestamp(validas[0]).date(),
+            "fecha_max": pd.Timestamp(validas[-1]).date(),
+            "esperadas": int(len(esperadas)),
+            "faltantes": [str(d) for d in self.sesiones[faltantes]],
+            "max_hueco_sesiones": int((np.diff(idx) - 1).max()) if len(idx) > 1 else 0,
+        })
+        return reporte
+
+def construir_calendario(reglas):
+    inicio = pd.Timestamp(reglas["inicio"])
+    fin = pd.Timestamp(reglas["fin"])
+    dias = pd.date_range(inicio, fin, freq="D")
+    dias = dias[dias.weekday.isin(reglas.get("dias_semana", [0, 1, 2, 3, 4]))]
+    cerrados = pd.DatetimeIndex(sorted(festivos(reglas, inicio.year, fin.year)))
+    return CalendarioTrading(dias.difference(cerrados).values)
+
+@lru_cache(maxsize=None)
+def cargar_calendario(path=CALENDARIO_PATH):
+    with open(path, "r") as f:
+        return construir_calendario(json.load(f))
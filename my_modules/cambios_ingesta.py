@@ -0,0 +1,121 @@
+"""
+===========================================================================
+ Modulo: Manifiesto de cambios de la ingesta (change feed)
+===========================================================================
+
+Descripcion:
+------------
+upd.py registra por ejecucion que simbolos recibieron filas nuevas y en
+que rango de fechas. Las etapas posteriores (shu_dia, fea, pub, alertas)
+pueden leer ese manifiesto con --cambios para procesar solo los simbolos
+afectados. Si el manifiesto no existe, es invalido o cambios_ultimo.json
+no es de hoy (la ingesta de hoy fallo o no escribio manifiesto) se vuelve
+al recorrido completo del universo.
+
+Formato (data/cambios/cambios_YYYY-MM-DD.json y cambios_ultimo.json):
+---------------------------------------------------------------------
+{
+  "run_id": "20250610_221503",
+  "generado": "2025-06-10 22:15:41",
+  "llegada_datos": "2025-06-10T22:05:12+00:00",
+  "simbolos": {"AAPL": {"fecha_min": "2025-06-10", "fecha_max": "2025-06-10", "filas": 1}},
+  "sin_cambios": ["F", ...],
+  "errores": ["XYZ", ...]
+}
+===========================================================================
+"""
+
+import os
+import json
+from datetime import datetime
+from pathlib import Path
+
+CAMBIOS_DIR = Path(__file__).resolve().parents[1] / "data" / "cambios"
+CAMBIOS_ULTIMO = CAMBIOS_DIR / "cambios_ultimo.json"
+
+
+# === ESCRITURA (ingesta) ===
+class RegistroCambios:
+    def __init__(self):
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.simbolos = {}
+        self.sin_cambios = []
+        self.errores = []
+        self.llegada_datos = None
+
+    def cambio(self, simbolo, fechas, filas, llegada=None):
+        fechas = sorted(str(f) for f in fechas)
+        self.simbolos[simbolo] = {"fecha_min": fechas[0], "fecha_max": fechas[-1], "filas": int(filas)}
+        # Momento en que el dato llego a la fuente (p.ej. LastModified de S3)
+        if llegada is not None and (self.llegada_datos is None or llegada > self.llegada_datos):
+            self.llegada_datos = llegada
+
+    def sin_cambio(self, simbolo):
+        self.sin_cambios.append(simbolo)
+
+    def error(self, simbolo):
+        self.errores.append(simbolo)
+
+    def guardar(self, directorio=CAMBIOS_DIR):
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        contenido = {
+            "run_id": self.run_id,
+            "generado": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "llegada_datos": self.llegada_datos.isoformat() if self.llegada_datos else None,
+            "simbolos": self.simbolos,
+            "sin_cambios": sorted(self.sin_cambios),
+            "errores": sorted(self.errores),
+        }
+        path = directorio / f"cambios_{datetime.now().date()}.json"
+        for destino in (path, directorio / CAMBIOS_ULTIMO.name):
+            tmp_path = destino.with_suffix(".json.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(contenido, f, indent=2)
+            os.replace(tmp_path, destino)
+        return path
+
+# === LECTURA (etapas posteriores) ===
+def cargar_cambios(path=CAMBIOS_ULTIMO):
+    """Devuelve el manifiesto como dict, o None si no existe o no se puede leer."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        if not isinstance(data.get("simbolos"), dict):
+            return None
+        return data
+    except Exception:
+        return None
+
+def fecha_ejecucion(cambios):
+    """Fecha (YYYY-MM-DD) de la ejecucion de upd que escribio el manifiesto, segun su run_id."""
+    try:
+        return datetime.strptime(str(cambios["run_id"])[:8], "%Y%m%d").date()
+    except (KeyError, ValueError):
+        return None
+
+def simbolos_a_procesar(todos, path_cambios=None, fecha=None):
+    """
+    Restringe `todos` a los simbolos del manifiesto.
+    Devuelve (simbolos, modo) con modo "incremental" o "completo" (sin manifiesto,
+    manifiesto invalido o cambios_ultimo.json de otra fecha que `fecha`, por defecto hoy).
+    """
+    todos = sorted(todos)
+    if path_cambios is None:
+        return todos, "completo"
+    cambios = cargar_cambios(path_cambios)
+    if cambios is None:
+        return todos, "completo"
+    # cambios_ultimo.json de un dia anterior: la ingesta de hoy no lo reescribio
+    if Path(path_cambios).name == CAMBIOS_ULTIMO.name and fecha_ejecucion(cambios) != (fecha or datetime.now().date()):
+        return todos, "completo"
+    afectados = {s.upper() for s in cambios["simbolos"]}
+    return [s for s in todos if s.upper() in afectados], "incremental"
+
+def agregar_argumento(parser):
+    """Anade --cambios [PATH] a un argparse.ArgumentParser (sin valor: cambios_ultimo.json)."""
+    parser.add_argument(
+        "--cambios", nargs="?", const=str(CAMBIOS_ULTIMO), default=None,
+        help="Procesa solo los simbolos del manifiesto de ingesta (por defecto el ultimo)",
+    )
+    return parser
@@ -0,0 +1,187 @@
+"""
+===========================================================================
+ Modulo: Datasets de entrenamiento point-in-time
+===========================================================================
+
+Descripcion:
+------------
+Construye el dataset de entrenamiento uniendo las etiquetas
+(my_modules.etiquetado) con las features (my_modules.feature_store) sin
+mirar al futuro:
+
+- Union estilo merge_asof por simbolo: cada fila etiquetada toma la
+  ultima fila de features con fecha <= su fecha (tolerancia de
+  TOLERANCIA_DIAS); nunca se rellena hacia atras
+- Solo entran etiquetas ya conocidas en `hasta` (fecha_etiqueta <=
+  hasta), asi un corte de entrenamiento no usa retornos posteriores
+- Poda de particiones: solo se leen los parquet de los simbolos pedidos
+  y el filtro de fechas se aplica al leer (estadisticas de row group)
+
+El resultado se materializa en data/datasets/<clave>.parquet, escrito
+por bloques de SIMBOLOS_POR_BLOQUE simbolos para no tener el universo
+entero en memoria (materializar_dataset devuelve solo la ruta). La clave
+sale de (set de features, especificacion de etiquetas, rango de fechas,
+simbolos); el manifiesto (cache_incremental) guarda ademas la huella de
+los parquet de entrada (tamano + mtime), de modo que se reconstruye solo
+si cambia alguna entrada. La clave identifica la definicion y la huella
+el contenido: ambas se devuelven (df.attrs["clave_dataset"] y
+df.attrs["huella_dataset"]) para que el registro de modelos sepa con que
+datos se entreno cada modelo.
+
+Uso:
+----
+    from my_modules.dataset_ml import construir_dataset
+    df = construir_dataset(desde="2015-01-01", hasta="2024-12-31")
+    df = construir_dataset(["AAPL"], etiquetas=["tb_etiqueta"], forzar=True)
+    ruta, clave, huella = materializar_dataset(etiquetas=["senal"])   # sin cargarlo
+===========================================================================
+"""
+
+import json
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from my_modules.cache_incremental import ManifiestoIncremental, combinar
+from my_modules.etiquetado import ESPEC_DEFECTO, huella_espec
+from my_modules.feature_store import (
+    ETIQUETAS_DIR, FEATURES_DIR, cargar_etiquetas, cargar_historia, espec_etiquetas,
+    huella_set, nombres_features, path_etiquetas, path_simbolo, simbolos_almacenados,
+)
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+DATASETS_DIR = REPO_DIR / "data" / "datasets"
+ETAPA = "dataset_ml"
+TOLERANCIA_DIAS = 7
+ETIQUETAS_DEFECTO = ["senal"]
+SIMBOLOS_POR_BLOQUE = 200
+FILAS_ROW_GROUP = 250_000
+
+def _fecha_texto(valor):
+    return None if valor is None else str(pd.Timestamp(valor).date())
+
+def clave_dataset(simbolos, desde, hasta, features, espec, etiquetas, dropna):
+    definicion = {
+        "features": features,
+        "huella_features": huella_set(),
+        "espec": huella_espec(espec),
+        "etiquetas": etiquetas,
+        "desde": _fecha_texto(desde),
+        "hasta": _fecha_texto(hasta),
+        "simbolos": simbolos,
+        "dropna": dropna,
+    }
+    return combinar(json.dumps(definicion, sort_keys=True))[:20], definicion
+
+def huella_entradas(paths):
+    """Huella barata de las entradas: nombre, tamano y mtime de cada parquet."""
+    partes = []
+    for p in paths:
+        st = p.stat()
+        partes.append(f"{p.name}:{st.st_size}:{st.st_mtime_ns}")
+    return combinar(*partes)
+
+def unir_point_in_time(df_etq, df_feat, tolerancia_dias=TOLERANCIA_DIAS):
+    """merge_asof hacia atras por simbolo: features conocidas a la fecha de cada etiqueta."""
+    izquierda = df_etq.assign(fecha=pd.to_datetime(df_etq["fecha"])).sort_values("fecha")
+    derecha = df_feat.assign(fecha=pd.to_datetime(df_feat["fecha"])).sort_values("fecha")
+    derecha["fecha_features"] = derecha["fecha"]
+    df = pd.merge_asof(
+        izquierda, derecha, on="fecha", by="simbolo", direction="backward",
+        tolerance=pd.Timedelta(days=tolerancia_dias),
+    )
+    return df.sort_values(["simbolo", "fecha"]).reset_index(drop=True)
+
+def _materializar(simbolos, desde, hasta, features, etiquetas, dropna, features_dir, etiquetas_dir):
+    columnas_etq = list(dict.fromkeys([*etiquetas, "fecha_etiqueta"]))
+    df_etq = cargar_etiquetas(simbolos, desde, hasta, columnas_etq, etiquetas_dir)
+    df_etq = df_etq[df_etq["fecha_etiqueta"].notna()]
+    if hasta is not None:
+        df_etq = df_etq[pd.to_datetime(df_etq["fecha_etiqueta"]) <= pd.Timestamp(hasta)]
+    # Las features pueden venir de hasta TOLERANCIA_DIAS antes de `desde`
+    desde_feat = None if desde is None else pd.Timestamp(desde) - pd.Timedelta(days=TOLERANCIA_DIAS)
+    df_feat = cargar_historia(simbolos, desde_feat, hasta, features, features_dir)
+    df = unir_point_in_time(df_etq, df_feat[["simbolo", "fecha", *features]])
+    if dropna:
+        df = df.dropna(subset=features)
+    return df
+
+def _escribir_por_bloques(salida, simbolos, desde, hasta, features, etiquetas, dropna, features_dir, etiquetas_dir):
+    """Materializa por bloques de SIMBOLOS_POR_BLOQUE simbolos (memoria acotada). Devuelve filas escritas."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    tmp_path = salida.with_name(f".{salida.name}.tmp")
+    escritor, filas = None, 0
+    try:
+        for i in range(0, len(simbolos), SIMBOLOS_POR_BLOQUE):
+            bloque = simbolos[i:i + SIMBOLOS_POR_BLOQUE]
+            df = _materializar(bloque, desde, hasta, features, etiquetas, dropna, features_dir, etiquetas_dir)
+            if df.empty:
+                continue
+            tabla = pa.Table.from_pandas(df, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(tmp_path, tabla.schema)
+            escritor.write_table(tabla.cast(escritor.schema), row_group_size=FILAS_ROW_GROUP)
+            filas += len(df)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    if escritor is None:
+        pd.DataFrame(columns=["simbolo", "fecha", "fecha_features", *features, *etiquetas, "fecha_etiqueta"]).to_parquet(tmp_path, index=False)
+    tmp_path.replace(salida)
+    return filas
+
+def materializar_dataset(simbolos=None, desde=None, hasta=None, features=None, espec=ESPEC_DEFECTO,
+                         etiquetas=None, dropna=False, forzar=False, features_dir=FEATURES_DIR,
+                         etiquetas_dir=ETIQUETAS_DIR, cache_dir=DATASETS_DIR, log=print):
+    """
+    Deja el dataset en disco (reutilizando la copia si nada cambio) sin
+    cargarlo entero. Devuelve (ruta del parquet, clave, huella del contenido).
+    """
+    features = list(features or nombres_features())
+    etiquetas = list(etiquetas or ETIQUETAS_DEFECTO)
+    simbolos = sorted(simbolos) if simbolos is not None else simbolos_almacenados(features_dir)
+    simbolos = [s for s in simbolos if path_etiquetas(s, etiquetas_dir).exists()]
+    if not simbolos:
+        raise FileNotFoundError(f"Sin etiquetas en {etiquetas_dir} para los simbolos pedidos")
+    distintas = {s for s in simbolos if espec_etiquetas(s, etiquetas_dir) != espec}
+    if distintas:
+        raise ValueError(f"Etiquetas generadas con otra especificacion ({len(distintas)} simbolos, p.ej. {sorted(distintas)[0]}); relanzar etq.py")
+
+    clave, definicion = clave_dataset(simbolos, desde, hasta, features, espec, etiquetas, dropna)
+    cache_dir = Path(cache_dir)
+    salida = cache_dir / f"{clave}.parquet"
+    entradas = [p for s in simbolos for p in (path_simbolo(s, features_dir), path_etiquetas(s, etiquetas_dir)) if p.exists()]
+    huella = huella_entradas(entradas)
+    huella_corta = huella[:20]
+
+    manifiesto = ManifiestoIncremental(cache_dir / "manifiesto.json", forzar=forzar)
+    if manifiesto.vigente(ETAPA, clave, huella):
+        log(f"Dataset {clave} reutilizado")
+        return salida, clave, huella_corta
+
+    t0 = time.perf_counter()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    filas = _escribir_por_bloques(salida, simbolos, desde, hasta, features, etiquetas, dropna, features_dir, etiquetas_dir)
+    with open(cache_dir / f"{clave}.json", "w") as f:
+        json.dump(dict(definicion, espec=espec, filas=filas, simbolos=len(simbolos), huella=huella_corta), f, indent=1)
+    manifiesto.registrar(ETAPA, clave, huella, [salida])
+    manifiesto.guardar()
+    log(f"Dataset {clave} construido: {filas} filas, {len(simbolos)} simbolos en {time.perf_counter() - t0:.1f}s")
+    return salida, clave, huella_corta
+
+def construir_dataset(simbolos=None, desde=None, hasta=None, features=None, espec=ESPEC_DEFECTO,
+                      etiquetas=None, dropna=False, forzar=False, features_dir=FEATURES_DIR,
+                      etiquetas_dir=ETIQUETAS_DIR, cache_dir=DATASETS_DIR, log=print):
+    """
+    Dataset (simbolo, fecha, fecha_features, features..., etiquetas...,
+    fecha_etiqueta) en memoria. La clave queda en df.attrs["clave_dataset"]
+    y la huella del contenido en df.attrs["huella_dataset"] (registro de modelos).
+    """
+    salida, clave, huella = materializar_dataset(simbolos, desde, hasta, features, espec, etiquetas, dropna,
+                                         forzar, features_dir, etiquetas_dir, cache_dir, log)
+    df = pd.read_parquet(salida)
+    df.attrs["clave_dataset"] = clave
+    df.attrs["huella_dataset"] = huella
+    return df
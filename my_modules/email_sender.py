@@ -1,18 +1,23 @@
 # /home/ubuntu/tr/my_modules/email_sender.py
 
-import boto3
 import os
 import logging
+from functools import lru_cache
 from my_modules.config import MAX_EMAILS_PER_DAY, SES_PROFILE_NAME, LOCAL_LOG_PATH
 
 SENDER_EMAIL = os.getenv("EMAIL_TRADING")
 
-if not SENDER_EMAIL:
-    raise ValueError("La variable de entorno EMAIL_TRADING no está definida.")
+# boto3 y la sesion SES se crean en el primer envio, no al importar el modulo
+@lru_cache(maxsize=1)
+def cliente_ses():
+    import boto3
+    session = boto3.Session(profile_name=SES_PROFILE_NAME)
+    return session.client("ses", region_name="eu-central-1")
 
 def enviar_email(asunto, cuerpo, destinatario, adjuntos=None, html=False):
-    session = boto3.Session(profile_name=SES_PROFILE_NAME)
-    ses = session.client("ses", region_name="eu-central-1")
+    if not SENDER_EMAIL:
+        raise ValueError("La variable de entorno EMAIL_TRADING no está definida.")
+    ses = cliente_ses()
 
     if html:
         body = {"Html": {"Data": cuerpo}}
@@ -0,0 +1,219 @@
+"""
+===========================================================================
+ Modulo: Entrenamiento XGBoost fuera de memoria con validacion purgada
+===========================================================================
+
+Descripcion:
+------------
+Entrena el modelo global leyendo el dataset de dataset_ml por lotes
+(pyarrow scanner -> xgboost.DataIter), de modo que la memoria depende de
+filas_lote y no del tamano del dataset:
+
+- DMatrix de memoria externa (cache en disco por particion) y
+  tree_method="hist"
+- Validacion cruzada temporal purgada y con embargo: el rango de fechas
+  se parte en n_folds bloques contiguos; para cada bloque de test se
+  descartan del entrenamiento las filas anteriores cuya etiqueta se
+  conoce dentro o despues del test (fecha_etiqueta >= inicio) y las
+  posteriores dentro de embargo_dias tras el test
+- Early stopping en cada fold; el modelo final usa la mediana de las
+  mejores iteraciones sobre todo el dataset
+- Folds en paralelo (hilos, xgboost libera el GIL) hasta donde lo permite
+  presupuesto_mb; los hilos de xgboost se reparten entre los folds
+- corte_temporal(): particion train/test purgada para entrenamientos en
+  memoria (train_debug.py)
+
+Uso:
+----
+    from my_modules.entrenamiento_xgb import entrenar_externo
+    booster, reporte = entrenar_externo(ruta_parquet, features, objetivo="senal")
+===========================================================================
+"""
+
+import os
+import time
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+PARAMS_DEFECTO = {
+    "objective": "binary:logistic",
+    "eval_metric": "logloss",
+    "tree_method": "hist",
+    "max_depth": 4,
+    "eta": 0.1,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "seed": 42,
+}
+RONDAS_MAX = 1000
+PARADA_TEMPRANA = 50
+FILAS_LOTE = 500_000
+
+# === PARTICIONES TEMPORALES ===
+def fechas_unicas(ruta):
+    """Fechas distintas del dataset leyendo solo la columna fecha por lotes."""
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    unicas = set()
+    for lote in ds.dataset(str(ruta), format="parquet").to_batches(columns=["fecha"]):
+        unicas.update(pc.unique(lote.column(0)).to_pylist())
+    return sorted(pd.Timestamp(f) for f in unicas if f is not None)
+
+def particiones_purgadas(fechas, n_folds=5, embargo_dias=10):
+    """Lista de (inicio_test, fin_test, fin_embargo) sobre bloques contiguos de fechas."""
+    bloques = np.array_split(np.array(fechas, dtype="datetime64[ns]"), n_folds)
+    return [
+        (pd.Timestamp(b[0]), pd.Timestamp(b[-1]), pd.Timestamp(b[-1]) + timedelta(days=embargo_dias))
+        for b in bloques if len(b)
+    ]
+
+def filtros_fold(inicio, fin, fin_embargo):
+    """Expresiones pyarrow (entrenamiento, test) de un fold purgado con embargo."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    # fecha_etiqueta puede ser date32 o timestamp segun el origen: se compara como timestamp
+    fecha, fecha_etq = ds.field("fecha"), ds.field("fecha_etiqueta").cast(pa.timestamp("ns"))
+    test = (fecha >= inicio) & (fecha <= fin)
+    antes = (fecha < inicio) & (fecha_etq < inicio)
+    despues = fecha > fin_embargo
+    return antes | despues, test
+
+def corte_temporal(df, frac_test=0.2, embargo_dias=10):
+    """Mascaras (train, test) en memoria: test = ultimo frac_test de fechas, train purgado antes del test."""
+    fechas = pd.to_datetime(df["fecha"])
+    inicio = fechas.quantile(1 - frac_test)
+    test = fechas >= inicio
+    train = (fechas < inicio - timedelta(days=embargo_dias)) & (pd.to_datetime(df["fecha_etiqueta"]) < inicio)
+    return train.to_numpy(), test.to_numpy()
+
+# === LECTURA POR LOTES ===
+def objetivo_binario(serie):
+    """"buy" -> 1 para etiquetas de texto; > 0 para numericas (tb_etiqueta, etq_horizonte)."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return (serie.astype(float) > 0).astype(np.float32).to_numpy()
+    return (serie == "buy").astype(np.float32).to_numpy()
+
+def crear_iterador(ruta, features, objetivo, filtro=None, filas_lote=FILAS_LOTE, cache_dir=None):
+    """Iterador por lotes del parquet; con cache_dir es de memoria externa, sin el sirve para QuantileDMatrix."""
+    import xgboost as xgb
+    import pyarrow.dataset as ds
+
+    class IteradorParquet(xgb.DataIter):
+        def __init__(self):
+            self._lotes = None
+            self.filas = 0
+            super().__init__(cache_prefix=os.path.join(cache_dir, "xgb_cache") if cache_dir else None)
+
+        def reset(self):
+            self._lotes = None
+
+        def next(self, input_data):
+            if self._lotes is None:
+                self.filas = 0
+                scanner = ds.dataset(str(ruta), format="parquet").scanner(
+                    columns=[*features, objetivo], filter=filtro, batch_size=filas_lote)
+                self._lotes = scanner.to_batches()
+            for lote in self._lotes:
+                if lote.num_rows == 0:
+                    continue
+                df = lote.to_pandas()
+                X = df[features].to_numpy(dtype=np.float32)
+                input_data(data=X, label=objetivo_binario(df[objetivo]), feature_names=list(features))
+                self.filas += lote.num_rows
+                return 1
+            return 0
+
+    return IteradorParquet()
+
+def matriz_externa(ruta, features, objetivo, filtro=None, filas_lote=FILAS_LOTE, cache_dir=None):
+    import xgboost as xgb
+    iterador = crear_iterador(ruta, features, objetivo, filtro, filas_lote, cache_dir or tempfile.gettempdir())
+    return xgb.DMatrix(iterador, missing=np.nan), iterador
+
+# === ENTRENAMIENTO ===
+def estimar_mb_fold(features, filas_lote=FILAS_LOTE):
+    """Memoria aproximada de un fold: lote float32 + paginas de hist (x4)."""
+    return filas_lote * (len(features) + 1) * 4 * 4 / 1e6
+
+def evaluar_fold(ruta, features, objetivo, params, particion, nthread, filas_lote, cache_dir):
+    import xgboost as xgb
+    t0 = time.perf_counter()
+    filtro_train, filtro_test = filtros_fold(*particion)
+    metrica = params.get("eval_metric", "logloss")
+    with tempfile.TemporaryDirectory(dir=cache_dir, prefix="fold_") as tmp:
+        dtrain, _ = matriz_externa(ruta, features, objetivo, filtro_train, filas_lote, tmp)
+        dtest, _ = matriz_externa(ruta, features, objetivo, filtro_test, filas_lote, tmp)
+        fold = None
+        if dtrain.num_row() and dtest.num_row():
+            resultado = {}
+            booster = xgb.train(
+                dict(params, nthread=nthread), dtrain, num_boost_round=RONDAS_MAX,
+                evals=[(dtest, "test")], early_stopping_rounds=PARADA_TEMPRANA,
+                evals_result=resultado, verbose_eval=False,
+            )
+            fold = {
+                "inicio_test": str(particion[0].date()),
+                "fin_test": str(particion[1].date()),
+                "filas_train": int(dtrain.num_row()),
+                "filas_test": int(dtest.num_row()),
+                "mejor_iteracion": int(booster.best_iteration),
+                metrica: round(float(resultado["test"][metrica][booster.best_iteration]), 5),
+                "segundos": round(time.perf_counter() - t0, 1),
+            }
+            del booster
+        # Las matrices se liberan antes de borrar su cache en disco
+        del dtrain, dtest
+    return fold
+
+def validar_purgado(ruta, features, objetivo, params=None, n_folds=5, embargo_dias=10,
+                    hilos=None, presupuesto_mb=4000, filas_lote=FILAS_LOTE, cache_dir=None, log=print):
+    """CV purgada con early stopping; folds en paralelo segun presupuesto_mb. Devuelve lista de folds."""
+    params = dict(PARAMS_DEFECTO, **(params or {}))
+    hilos = hilos or os.cpu_count() or 1
+    particiones = particiones_purgadas(fechas_unicas(ruta), n_folds, embargo_dias)
+    paralelo = int(max(1, min(len(particiones), presupuesto_mb // max(estimar_mb_fold(features, filas_lote), 1), hilos)))
+    nthread = max(1, hilos // paralelo)
+    log(f"CV purgada: {len(particiones)} folds, {paralelo} en paralelo x {nthread} hilos, embargo {embargo_dias} dias")
+    with ThreadPoolExecutor(max_workers=paralelo) as pool:
+        folds = list(pool.map(
+            lambda p: evaluar_fold(ruta, features, objetivo, params, p, nthread, filas_lote, cache_dir), particiones))
+    folds = [f for f in folds if f is not None]
+    for f in folds:
+        log(f"Fold {f['inicio_test']}..{f['fin_test']}: {f}")
+    return folds
+
+def entrenar_externo(ruta, features, objetivo="senal", params=None, n_folds=5, embargo_dias=10,
+                     hilos=None, presupuesto_mb=4000, filas_lote=FILAS_LOTE, cache_dir=None, log=print):
+    """
+    CV purgada + modelo final sobre todo el dataset con la mediana de las
+    mejores iteraciones. Devuelve (xgboost.Booster, reporte).
+    """
+    import xgboost as xgb
+    params = dict(PARAMS_DEFECTO, **(params or {}))
+    hilos = hilos or os.cpu_count() or 1
+    folds = validar_purgado(ruta, features, objetivo, params, n_folds, embargo_dias, hilos,
+                            presupuesto_mb, filas_lote, cache_dir, log)
+    rondas = int(statistics.median(f["mejor_iteracion"] + 1 for f in folds)) if folds else 100
+
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=cache_dir, prefix="final_") as tmp:
+        dtodo, _ = matriz_externa(ruta, features, objetivo, None, filas_lote, tmp)
+        booster = xgb.train(dict(params, nthread=hilos), dtodo, num_boost_round=rondas)
+        filas = int(dtodo.num_row())
+        del dtodo
+    metrica = params.get("eval_metric", "logloss")
+    reporte = {
+        "folds": folds,
+        "rondas": rondas,
+        "filas": filas,
+        f"{metrica}_cv": round(statistics.mean(f[metrica] for f in folds), 5) if folds else None,
+        "segundos_final": round(time.perf_counter() - t0, 1),
+        "params": params,
+    }
+    log(f"Modelo final: {rondas} rondas sobre {filas} filas en {reporte['segundos_final']}s")
+    return booster, reporte
@@ -0,0 +1,204 @@
+"""
+===========================================================================
+ Modulo: Estado del sistema en SQLite (WAL)
+===========================================================================
+
+Descripcion:
+------------
+Sustituye las copias de guardar_estado() que hacian load-modify-dump sin
+bloqueo sobre reports/summary/system_status.json (y config/system_status.json
+en shu_*). Con etapas en paralelo esas escrituras se pisaban o dejaban el
+JSON truncado.
+
+- Tabla `estado`: ultima ejecucion por modulo (upsert atomico)
+- Tabla `historial`: todas las ejecuciones con inicio, fin y duracion
+- WAL + busy_timeout: escritores concurrentes se serializan sin perder
+  datos y los lectores (status_report) no bloquean a nadie
+- En cada escritura se regenera system_status.json (junto a la base)
+  de forma atomica, dentro de la misma transaccion, para quien aun lea
+  el JSON
+- La primera vez que se crea la base importa los JSON existentes
+
+Uso:
+----
+    from my_modules.estado_sistema import guardar_estado, cargar_estado
+    guardar_estado("backtest", "OK", "12 modelos procesados", inicio=t0)
+    cargar_estado()          # {modulo: {fecha, ultima_ejecucion, status, mensaje, duracion_s}}
+    historial("backtest", limite=30)
+===========================================================================
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+DB_PATH = REPO_DIR / "reports" / "summary" / "system_status.db"
+JSON_PATH = REPO_DIR / "reports" / "summary" / "system_status.json"
+JSON_LEGADO = [JSON_PATH, REPO_DIR / "config" / "system_status.json"]
+TIMEOUT_S = 30
+
+# Sin `inicio` explicito la duracion se mide desde que el script importo el modulo
+_INICIO_PROCESO = time.time()
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS estado (
+    modulo TEXT PRIMARY KEY,
+    fecha TEXT,
+    ultima_ejecucion TEXT,
+    status TEXT,
+    mensaje TEXT,
+    duracion_s REAL
+);
+CREATE TABLE IF NOT EXISTS historial (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    modulo TEXT NOT NULL,
+    fecha TEXT,
+    inicio TEXT,
+    fin TEXT,
+    duracion_s REAL,
+    status TEXT,
+    mensaje TEXT,
+    host TEXT,
+    pid INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_historial_modulo_fin ON historial (modulo, fin);
+"""
+
+# === CONEXION ===
+def conectar(db_path=DB_PATH):
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    nueva = not db_path.exists()
+    con = sqlite3.connect(db_path, timeout=TIMEOUT_S, isolation_level=None)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(f"PRAGMA busy_timeout={TIMEOUT_S * 1000}")
+    con.executescript(ESQUEMA)
+    if nueva:
+        importar_json(con)
+    return con
+
+def _utc(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+# === ESCRITURA ===
+def guardar_estado(modulo, status, mensaje, fecha=None, inicio=None, duracion_s=None, db_path=DB_PATH):
+    """
+    Upsert del estado de `modulo` y alta en el historial, en una transaccion.
+    `inicio` acepta datetime o timestamp; si no se da, se usa el arranque del proceso.
+    """
+    fin = time.time()
+    if isinstance(inicio, datetime):
+        inicio = inicio.timestamp()
+    if inicio is None:
+        inicio = _INICIO_PROCESO
+    if duracion_s is None:
+        duracion_s = fin - inicio
+    duracion_s = round(float(duracion_s), 3)
+    fecha = fecha or datetime.utcnow().strftime("%Y-%m-%d")
+    fin_str = _utc(fin)
+
+    con = conectar(db_path)
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        con.execute(
+            "INSERT INTO historial (modulo, fecha, inicio, fin, duracion_s, status, mensaje, host, pid) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (modulo, fecha, _utc(inicio), fin_str, duracion_s, status, mensaje, socket.gethostname(), os.getpid()),
+        )
+        con.execute(
+            "INSERT INTO estado (modulo, fecha, ultima_ejecucion, status, mensaje, duracion_s) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(modulo) DO UPDATE SET fecha=excluded.fecha, ultima_ejecucion=excluded.ultima_ejecucion, "
+            "status=excluded.status, mensaje=excluded.mensaje, duracion_s=excluded.duracion_s",
+            (modulo, fecha, fin_str, status, mensaje, duracion_s),
+        )
+        # Exportar aun con el lock de escritura: otro escritor no puede colar un JSON mas viejo despues
+        exportar_json(con, Path(db_path).with_suffix(".json"))
+        con.execute("COMMIT")
+    except Exception:
+        if con.in_transaction:
+            con.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+
+def importar_json(con, paths=JSON_LEGADO):
+    """Carga en `estado` los system_status.json existentes (el mas reciente gana por modulo)."""
+    for path in paths:
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except Exception:
+            continue
+        for modulo, info in data.items():
+            if not isinstance(info, dict):
+                continue
+            ultima = info.get("ultima_ejecucion") or info.get("fecha")
+            con.execute(
+                "INSERT INTO estado (modulo, fecha, ultima_ejecucion, status, mensaje, duracion_s) "
+                "VALUES (?, ?, ?, ?, ?, NULL) "
+                "ON CONFLICT(modulo) DO UPDATE SET fecha=excluded.fecha, ultima_ejecucion=excluded.ultima_ejecucion, "
+                "status=excluded.status, mensaje=excluded.mensaje "
+                "WHERE COALESCE(excluded.ultima_ejecucion, '') > COALESCE(estado.ultima_ejecucion, '')",
+                (modulo, info.get("fecha"), ultima, info.get("status"), info.get("mensaje")),
+            )
+
+def exportar_json(con=None, path=JSON_PATH):
+    """Escribe la vista `estado` como system_status.json (tmp + os.replace)."""
+    data = cargar_estado(con)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+# === LECTURA ===
+def cargar_estado(con=None, db_path=DB_PATH):
+    """Ultimo estado por modulo, con la misma forma que el antiguo system_status.json."""
+    propia = con is None
+    con = con or conectar(db_path)
+    try:
+        filas = con.execute("SELECT * FROM estado ORDER BY modulo").fetchall()
+    finally:
+        if propia:
+            con.close()
+    return {
+        f["modulo"]: {
+            "fecha": f["fecha"],
+            "ultima_ejecucion": f["ultima_ejecucion"],
+            "status": f["status"],
+            "mensaje": f["mensaje"],
+            "duracion_s": f["duracion_s"],
+        }
+        for f in filas
+    }
+
+def historial(modulo=None, desde=None, limite=None, db_path=DB_PATH):
+    """Ejecuciones (mas recientes primero); `desde` es 'YYYY-MM-DD[ HH:MM:SS]' en UTC."""
+    sql = "SELECT modulo, fecha, inicio, fin, duracion_s, status, mensaje, host, pid FROM historial"
+    condiciones, params = [], []
+    if modulo:
+        condiciones.append("modulo = ?")
+        params.append(modulo)
+    if desde:
+        condiciones.append("fin >= ?")
+        params.append(str(desde))
+    if condiciones:
+        sql += " WHERE " + " AND ".join(condiciones)
+    sql += " ORDER BY fin DESC, id DESC"
+    if limite:
+        sql += " LIMIT ?"
+        params.append(int(limite))
+    con = conectar(db_path)
+    try:
+        return [dict(f) for f in con.execute(sql, params).fetchall()]
+    finally:
+        con.close()
@@ -35,11 +35,11 @@ DataFrame con columnas: ['fecha', 'signal', 'estrategia', ...]
 """
 
 import pandas as pd
-import ta
-from my_modules.logger_estrategia import configurar_logger
+from my_modules.logger_estrategia import logger_perezoso, registrar_ejecucion
 
-logger = configurar_logger("bollinger_breakout_v4")
+logger = logger_perezoso("bollinger_breakout_v4")
 
+@registrar_ejecucion("bollinger_breakout_v4")
 def generar_senales(df: pd.DataFrame,
                     window: int = 20,
                     s: float = 2.5,
@@ -80,6 +80,7 @@ def generar_senales(df: pd.DataFrame,
             df["f_vol"] = df["volume"] > promedio_vol * vol_multiplier
             df["breakout"] &= df["f_vol"]
 
+        import ta  # diferido: importar la estrategia no carga ta
         df["atr"] = ta.volatility.average_true_range(df["high"], df["low"], df["close"], window=14)
         df["atr_ratio"] = df["atr"] / df["close"]
         df["f_atr"] = df["atr_ratio"] > atr_threshold
@@ -89,8 +90,6 @@ def generar_senales(df: pd.DataFrame,
         df.loc[df["breakout"], "signal"] = "buy"
         df["estrategia"] = "bollinger_breakout_v4"
 
-        logger.info(f"Breakout v4 | BUY={df['signal'].eq('buy').sum()}")
-
         columnas = ["fecha", "signal", "estrategia"]
         if debug:
             columnas += ["media", "bb_up", "breakout", "atr", "atr_ratio"]
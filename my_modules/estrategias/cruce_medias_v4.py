@@ -36,11 +36,11 @@ DataFrame con ['fecha', 'signal', 'estrategia', ...]
 """
 
 import pandas as pd
-import ta
-from my_modules.logger_estrategia import configurar_logger
+from my_modules.logger_estrategia import logger_perezoso, registrar_ejecucion
 
-logger = configurar_logger("cruce_medias_v4")
+logger = logger_perezoso("cruce_medias_v4")
 
+@registrar_ejecucion("cruce_medias_v4")
 def generar_senales(df: pd.DataFrame,
                     usar_filtro_volatilidad: bool = True,
                     confirmar_al_dia_siguiente: bool = True,
@@ -73,6 +73,7 @@ def generar_senales(df: pd.DataFrame,
 
         # Filtro de volatilidad
         if usar_filtro_volatilidad:
+            import ta  # diferido: importar la estrategia no carga ta
             df["atr"] = ta.volatility.average_true_range(df["high"], df["low"], df["close"], window=14)
             df["atr_ratio"] = df["atr"] / df["close"]
             df["vol_ok"] = df["atr_ratio"] > 0.01
@@ -90,8 +91,6 @@ def generar_senales(df: pd.DataFrame,
         df.loc[df["cruce_bajista"], "signal"] = "sell"
         df["estrategia"] = "cruce_medias_v4"
 
-        logger.info(f"Cruce Medias v4 | BUY={df['signal'].eq('buy').sum()} | SELL={df['signal'].eq('sell').sum()}")
-
         columnas = ["fecha", "signal", "estrategia"]
         if debug:
             columnas += ["ema_10", "ema_30", "ema_200", "cruce_alcista", "cruce_bajista"]
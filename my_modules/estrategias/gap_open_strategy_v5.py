@@ -23,10 +23,11 @@ DataFrame con ['fecha', 'signal', 'estrategia']
 """
 
 import pandas as pd
-from my_modules.logger_estrategia import configurar_logger
+from my_modules.logger_estrategia import logger_perezoso, registrar_ejecucion
 
-logger = configurar_logger("gap_open_strategy_v5")
+logger = logger_perezoso("gap_open_strategy_v5")
 
+@registrar_ejecucion("gap_open_strategy_v5")
 def generar_senales(df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
     try:
         df = df.copy()
@@ -68,8 +69,6 @@ def generar_senales(df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
         df.loc[df["cond_sell"], "signal"] = "sell"
         df["estrategia"] = "gap_open_strategy_v5"
 
-        logger.info(f"GapOpen v5 | BUY={df['signal'].eq('buy').sum()} | SELL={df['signal'].eq('sell').sum()}")
-
         columnas = ["fecha", "signal", "estrategia"]
         if debug:
             columnas += [
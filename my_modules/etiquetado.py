@@ -0,0 +1,172 @@
+"""
+===========================================================================
+ Modulo: Etiquetado vectorizado (horizonte fijo y triple barrera)
+===========================================================================
+
+Descripcion:
+------------
+Calcula para cada barra de un simbolo, sin bucles por fecha:
+
+- Horizonte fijo: retorno del cierre a `dias` sesiones de calendario
+  (NaN si esa sesion falta en el historico, como etq.py) y etiqueta
+  retorno_futuro > objetivo
+- Triple barrera con la semantica de gen_ordenes_v2: entrada en el
+  open de la barra siguiente a la senal, TP/SL sobre high/low de las
+  `max_dias` sesiones posteriores (TP gana si ambos tocan en la misma
+  barra, un hueco no alarga la operacion) y vencimiento al cierre;
+  las ordenes cuyo plazo no ha terminado al final del historico quedan
+  sin etiqueta
+- Union con las senales heuristicas por merge (simbolo, fecha):
+  senal = "buy" si hubo senal buy heuristica y el retorno supera el
+  objetivo (criterio de etq.py), si no "hold"
+
+Las etiquetas se guardan en el feature store (feature_store.guardar_
+etiquetas) con la especificacion usada en los metadatos. fecha_etiqueta
+es la primera fecha en que todas las etiquetas de la fila son conocidas
+(sirve para purgar en validacion y para uniones point-in-time).
+
+Uso:
+----
+    from my_modules.etiquetado import ESPEC_DEFECTO, etiquetar
+    df_etq = etiquetar(df_historico, "AAPL", df_senales, ESPEC_DEFECTO)
+===========================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+from my_modules.calendario_trading import cargar_calendario
+from my_modules.cache_incremental import combinar
+
+# Mismos valores que etq.py (horizonte) y gen_ordenes_v2 (triple barrera)
+ESPEC_DEFECTO = {
+    "dias": 3,
+    "objetivo": 0.02,
+    "tp": 0.03,
+    "sl": 0.01,
+    "max_dias": 5,
+    "lado": "buy",
+}
+
+TIPOS_SALIDA = np.array(["TIMEOUT", "TP", "SL"])
+
+def huella_espec(espec):
+    return combinar(*(f"{k}={espec[k]}" for k in sorted(espec)))
+
+def _fechas_dia(df):
+    return pd.to_datetime(df["fecha"]).to_numpy().astype("datetime64[D]")
+
+# === HORIZONTE FIJO ===
+def retorno_horizonte(fechas, close, dias, calendario=None):
+    """Retorno close(t + dias sesiones) / close(t) - 1 y fecha destino; NaN si falta la sesion."""
+    calendario = calendario or cargar_calendario()
+    destino = calendario.offset(fechas, dias)
+    pos = np.searchsorted(fechas, destino).clip(max=len(fechas) - 1)
+    presente = (fechas[pos] == destino) & ~np.isnat(destino)
+    retorno = np.where(presente, close[pos] / close - 1, np.nan)
+    return retorno, destino
+
+# === TRIPLE BARRERA ===
+def triple_barrera(fechas, open_, high, low, close, tp, sl, max_dias, lado="buy", calendario=None):
+    """
+    Salida de una orden abierta en el open de la barra siguiente a cada
+    barra. Devuelve dict de arrays: tipo (TP/SL/TIMEOUT, None sin entrada o
+    abierta),
+    retorno (con el signo del lado), barras hasta la salida y fecha_salida.
+    """
+    calendario = calendario or cargar_calendario()
+    n = len(fechas)
+    # Ultima barra dentro de max_dias sesiones de cada entrada
+    vence = calendario.offset(fechas, max_dias)
+    limites = np.searchsorted(fechas, vence, side="right") - 1
+
+    i = np.arange(n)
+    valida = i < n - 2
+    entrada = np.minimum(i + 1, n - 1)
+    precio_entrada = open_[entrada]
+    limite = limites[entrada]
+
+    k = np.arange(1, max_dias + 1)
+    j = entrada[:, None] + k[None, :]
+    en_rango = (j <= n - 1) & (j <= limite[:, None])
+    j = np.minimum(j, n - 1)
+
+    if lado == "buy":
+        nivel_tp, nivel_sl = precio_entrada * (1 + tp), precio_entrada * (1 - sl)
+        toca_tp = high[j] >= nivel_tp[:, None]
+        toca_sl = low[j] <= nivel_sl[:, None]
+    else:
+        nivel_tp, nivel_sl = precio_entrada * (1 - tp), precio_entrada * (1 + sl)
+        toca_tp = low[j] <= nivel_tp[:, None]
+        toca_sl = high[j] >= nivel_sl[:, None]
+    toca_tp &= en_rango
+    toca_sl &= en_rango
+    toca = toca_tp | toca_sl
+
+    hay_salida = toca.any(axis=1)
+    primera = toca.argmax(axis=1)
+    es_tp = toca_tp[i, primera]
+    codigo = np.where(hay_salida, np.where(es_tp, 1, 2), 0)
+    # Sin TP/SL y con el plazo aun sin cumplir al final del historico: la orden sigue abierta
+    abierta = ~hay_salida & (np.isnat(vence[entrada]) | (vence[entrada] > fechas[-1]))
+    valida &= ~abierta
+
+    idx_vence = np.maximum(np.minimum(np.minimum(entrada + max_dias, limite), n - 1), entrada)
+    idx_salida = np.where(hay_salida, entrada + k[primera], idx_vence)
+    precio_salida = np.select([codigo == 1, codigo == 2], [nivel_tp, nivel_sl], close[idx_vence])
+
+    retorno = precio_salida / precio_entrada - 1
+    if lado != "buy":
+        retorno = -retorno
+    tipo = TIPOS_SALIDA[codigo].astype(object)
+    tipo[~valida] = None
+    return {
+        "tipo": tipo,
+        "retorno": np.where(valida, retorno, np.nan),
+        "barras": np.where(valida, idx_salida - i, -1),
+        "fecha_salida": np.where(valida, fechas[np.minimum(idx_salida, n - 1)], np.datetime64("NaT")),
+    }
+
+# === SENALES HEURISTICAS ===
+def senales_buy(df_senales):
+    """Numero de estrategias con senal buy por (simbolo, fecha)."""
+    if df_senales is None or df_senales.empty:
+        return pd.DataFrame(columns=["simbolo", "fecha", "senal_heuristica"])
+    buys = df_senales[df_senales["signal"] == "buy"]
+    buys = buys.assign(fecha=pd.to_datetime(buys["fecha"]).dt.date)
+    return buys.groupby(["simbolo", "fecha"]).size().rename("senal_heuristica").reset_index()
+
+# === ETIQUETADO ===
+def etiquetar(df, simbolo, df_senales=None, espec=ESPEC_DEFECTO, calendario=None):
+    """Etiquetas de todas las barras del historico de un simbolo (una fila por fecha); None con menos de 3 barras."""
+    calendario = calendario or cargar_calendario()
+    df = df[df["fecha"].notna()]
+    df = df.assign(fecha=pd.to_datetime(df["fecha"])).sort_values("fecha").drop_duplicates("fecha", keep="last")
+    if len(df) < 3:
+        return None
+    fechas = _fechas_dia(df)
+    open_, high, low, close = (df[c].to_numpy(dtype=float) for c in ("open", "high", "low", "close"))
+
+    retorno, destino = retorno_horizonte(fechas, close, espec["dias"], calendario)
+    tb = triple_barrera(fechas, open_, high, low, close, espec["tp"], espec["sl"], espec["max_dias"],
+                        espec["lado"], calendario)
+
+    salida = pd.DataFrame({
+        "simbolo": simbolo,
+        "fecha": pd.to_datetime(fechas).date,
+        "retorno_futuro": retorno,
+        "etq_horizonte": np.where(np.isnan(retorno), np.nan, (retorno > espec["objetivo"]).astype(float)),
+        "tb_tipo": tb["tipo"],
+        "tb_etiqueta": pd.Series(tb["tipo"]).map({"TP": 1.0, "SL": -1.0, "TIMEOUT": 0.0}).to_numpy(),
+        "tb_retorno": tb["retorno"],
+        "tb_barras": tb["barras"],
+    })
+    # Fecha en la que se conocen todas las etiquetas de la fila (NaT si alguna queda abierta)
+    conocida = np.maximum(destino, tb["fecha_salida"])
+    conocida[np.isnat(destino) | np.isnat(tb["fecha_salida"])] = np.datetime64("NaT")
+    salida["fecha_etiqueta"] = pd.to_datetime(conocida).date
+
+    salida = salida.merge(senales_buy(df_senales), on=["simbolo", "fecha"], how="left")
+    salida["senal_heuristica"] = salida["senal_heuristica"].fillna(0).astype(int)
+    salida["senal"] = np.where((salida["senal_heuristica"] > 0) & (salida["retorno_futuro"] > espec["objetivo"]), "buy", "hold")
+    return salida
@@ -0,0 +1,308 @@
+"""
+===========================================================================
+ Modulo: Feature store (historico completo de features por simbolo)
+===========================================================================
+
+Descripcion:
+------------
+Calcula el set de features (FEATURES) para todas las fechas de cada
+simbolo y lo guarda en data/features/<SIMBOLO>_features.parquet, el
+formato que leen etq.py, sml.py y alerta_precio_*. Cada ejecucion solo
+anade las fechas nuevas: del historico se toman las lookback()-1 filas
+previas a la primera fecha nueva, de modo que las ventanas moviles dan
+lo mismo que un calculo completo.
+
+- registrar_feature(nombre, lookback) anade features al set; lookback
+  es el numero de filas (incluida la actual) que necesita la ventana
+- Solo se guardan filas con todas las ventanas completas
+- El simbolo se recalcula entero si cambia el set de features
+  (huella_set, guardada en los metadatos del parquet) o si el
+  historico ya procesado cambio (filas recuperadas o cierre distinto
+  en la ultima fecha guardada)
+- features_dia.parquet guarda la ultima fila por simbolo (inferencia)
+- etiquetas/<SIMBOLO>_etiquetas.parquet guarda las etiquetas de
+  my_modules.etiquetado (una fila por fecha, espec en los metadatos)
+
+Columnas: simbolo, datetime, fecha (date32), open, high, low, close y
+las de FEATURES (volume incluido).
+
+Uso:
+----
+    from my_modules.feature_store import actualizar_simbolo, cargar_historia, cargar_ultimas
+    resultado = actualizar_simbolo("AAPL")
+    df = cargar_historia(["AAPL", "MSFT"], desde="2020-01-01")   # entrenamiento
+    df_hoy = cargar_ultimas()                                     # inferencia
+
+    @registrar_feature("ma_50", 50)
+    def ma_50(df):
+        return df["close"].rolling(50).mean()
+===========================================================================
+"""
+
+import os
+import json
+import inspect
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from my_modules.cache_incremental import combinar
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+HISTORIC_DIR = REPO_DIR / "data" / "historic"
+FEATURES_DIR = REPO_DIR / "data" / "features"
+ULTIMAS_PATH = FEATURES_DIR / "features_dia.parquet"
+ETIQUETAS_DIR = FEATURES_DIR / "etiquetas"
+SUFIJO = "_features.parquet"
+SUFIJO_ETIQUETAS = "_etiquetas.parquet"
+CLAVE_METADATOS = b"feature_store"
+
+COLUMNAS_BASE = ["simbolo", "datetime", "fecha", "open", "high", "low", "close"]
+
+FEATURES = {}
+
+def registrar_feature(nombre, lookback):
+    """Decorador: funcion(df ordenado por fecha) -> Series alineada con df."""
+    def decorador(funcion):
+        FEATURES[nombre] = (lookback, funcion)
+        return funcion
+    return decorador
+
+# === FEATURES ===
+def calcular_rsi(series, window=14):
+    delta = series.diff()
+    up = delta.clip(lower=0)
+    down = -delta.clip(upper=0)
+    ma_up = up.rolling(window).mean()
+    ma_down = down.rolling(window).mean()
+    rs = ma_up / ma_down
+    return 100 - (100 / (1 + rs))
+
+@registrar_feature("ma_5", 5)
+def _ma_5(df):
+    return df["close"].rolling(5).mean()
+
+@registrar_feature("ma_20", 20)
+def _ma_20(df):
+    return df["close"].rolling(20).mean()
+
+@registrar_feature("rsi_14", 15)
+def _rsi_14(df):
+    return calcular_rsi(df["close"], 14)
+
+@registrar_feature("pos_rango_60", 60)
+def _pos_rango_60(df):
+    minimo = df["low"].rolling(60).min()
+    return (df["close"] - minimo) / (df["high"].rolling(60).max() - minimo)
+
+@registrar_feature("volatilidad_20", 20)
+def _volatilidad_20(df):
+    return df["close"].rolling(20).std()
+
+@registrar_feature("cambio_1d", 2)
+def _cambio_1d(df):
+    return df["close"].pct_change(1)
+
+@registrar_feature("cambio_3d", 4)
+def _cambio_3d(df):
+    return df["close"].pct_change(3)
+
+@registrar_feature("volume", 1)
+def _volume(df):
+    return df["volume"]
+
+def nombres_features():
+    return list(FEATURES)
+
+def lookback():
+    return max(lb for lb, _ in FEATURES.values())
+
+def huella_set():
+    """Huella del set de features (nombres, lookbacks y fuente de cada funcion)."""
+    partes = []
+    for nombre, (lb, funcion) in FEATURES.items():
+        try:
+            fuente = inspect.getsource(funcion)
+        except (OSError, TypeError):
+            fuente = funcion.__qualname__
+        partes += [nombre, lb, fuente]
+    return combinar(*partes)
+
+# === CALCULO ===
+def preparar_historico(df):
+    """Historico ordenado y sin duplicados, con datetime y fecha normalizados."""
+    if "datetime" not in df.columns:
+        df = df.assign(datetime=df["fecha"])
+    df = df[df["datetime"].notna()]
+    df = df.assign(datetime=pd.to_datetime(df["datetime"]))
+    df = df.sort_values("datetime").drop_duplicates("datetime", keep="last")
+    df["fecha"] = df["datetime"].dt.date
+    return df.reset_index(drop=True)
+
+def calcular_features(df, simbolo, desde=0):
+    """
+    Features de todas las filas de df (historico preparado). Devuelve las
+    filas desde la posicion `desde` que tienen todas las ventanas completas.
+    """
+    calculadas = {nombre: funcion(df) for nombre, (_, funcion) in FEATURES.items()}
+    salida = df[[c for c in COLUMNAS_BASE if c in df.columns]].assign(simbolo=simbolo, **calculadas)
+    salida = salida[COLUMNAS_BASE + nombres_features()]
+    return salida.iloc[max(desde, lookback() - 1):].reset_index(drop=True)
+
+# === ALMACEN ===
+def path_simbolo(simbolo, directorio=FEATURES_DIR):
+    return Path(directorio) / f"{simbolo}{SUFIJO}"
+
+def simbolos_almacenados(directorio=FEATURES_DIR):
+    return sorted(p.name[:-len(SUFIJO)] for p in Path(directorio).glob(f"*{SUFIJO}"))
+
+def leer_metadatos(path):
+    import pyarrow.parquet as pq
+    metadatos = pq.read_schema(path).metadata or {}
+    if CLAVE_METADATOS not in metadatos:
+        return {}
+    return json.loads(metadatos[CLAVE_METADATOS])
+
+def escribir_parquet(df, path, metadatos=None):
+    """Escritura atomica (tmp + os.replace) con metadatos del feature store."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    if metadatos is not None:
+        tabla = tabla.replace_schema_metadata({**(tabla.schema.metadata or {}), CLAVE_METADATOS: json.dumps(metadatos)})
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    pq.write_table(tabla, tmp_path)
+    os.replace(tmp_path, path)
+
+def _estado_guardado(path, huella):
+    """(fecha, close, filas) de la ultima fila guardada si el archivo es compatible; si no None."""
+    if not path.exists():
+        return None
+    meta = leer_metadatos(path)
+    if meta.get("huella") != huella:
+        return None
+    guardado = pd.read_parquet(path, columns=["fecha", "close"])
+    if guardado.empty:
+        return None
+    ultima = guardado.iloc[-1]
+    return ultima["fecha"], ultima["close"], len(guardado)
+
+def actualizar_simbolo(simbolo, df_hist=None, directorio=FEATURES_DIR, historic_dir=HISTORIC_DIR, completo=False):
+    """
+    Anade al parquet del simbolo las fechas nuevas de su historico.
+    Devuelve dict con modo (incremental|completo|sin_cambios|insuficiente),
+    filas_nuevas y la ultima fila calculada (Series) o None.
+    """
+    if df_hist is None:
+        df_hist = pd.read_parquet(Path(historic_dir) / f"{simbolo}.parquet")
+    df = preparar_historico(df_hist)
+    path = path_simbolo(simbolo, directorio)
+    huella = huella_set()
+    lb = lookback()
+
+    if len(df) < lb:
+        return {"modo": "insuficiente", "filas_nuevas": 0, "ultima": None}
+
+    estado = None if completo else _estado_guardado(path, huella)
+    if estado is not None:
+        fecha_ult, close_ult, filas_guardadas = estado
+        fechas = df["fecha"].to_numpy()
+        pos = int(np.searchsorted(fechas, fecha_ult, side="right"))
+        # El historico procesado debe seguir igual: mismas filas hasta la ultima fecha y mismo cierre
+        coherente = (pos > 0 and fechas[pos - 1] == fecha_ult
+                     and pos - (lb - 1) == filas_guardadas
+                     and np.isclose(df["close"].iat[pos - 1], close_ult, equal_nan=True))
+        if not coherente:
+            estado = None
+
+    meta = {"huella": huella, "lookback": lb, "features": nombres_features()}
+    if estado is None:
+        nuevas = calcular_features(df, simbolo)
+        escribir_parquet(nuevas, path, meta)
+        return {"modo": "completo", "filas_nuevas": len(nuevas), "ultima": nuevas.iloc[-1] if len(nuevas) else None}
+
+    if pos == len(df):
+        return {"modo": "sin_cambios", "filas_nuevas": 0, "ultima": None}
+
+    # Solo el tramo necesario: lb-1 filas de contexto + fechas nuevas
+    inicio = pos - (lb - 1)
+    tramo = df.iloc[inicio:].reset_index(drop=True)
+    nuevas = calcular_features(tramo, simbolo, desde=lb - 1)
+    previas = pd.read_parquet(path)
+    escribir_parquet(pd.concat([previas, nuevas], ignore_index=True), path, meta)
+    return {"modo": "incremental", "filas_nuevas": len(nuevas), "ultima": nuevas.iloc[-1]}
+
+# === LECTURA ===
+def ultima_guardada(simbolo, directorio=FEATURES_DIR):
+    path = path_simbolo(simbolo, directorio)
+    if not path.exists():
+        return None
+    df = pd.read_parquet(path)
+    return df.iloc[-1] if len(df) else None
+
+def _fecha(valor):
+    return None if valor is None else pd.Timestamp(valor).date()
+
+def _leer_dataset(paths, desde=None, hasta=None, columnas=None):
+    """Lee varios parquet filtrando por fecha y columnas al leer (pyarrow.dataset, en paralelo)."""
+    import pyarrow.dataset as ds
+    filtro = None
+    if desde is not None:
+        filtro = ds.field("fecha") >= _fecha(desde)
+    if hasta is not None:
+        cond = ds.field("fecha") <= _fecha(hasta)
+        filtro = cond if filtro is None else filtro & cond
+    if columnas is not None:
+        columnas = list(dict.fromkeys(["simbolo", "fecha", *columnas]))
+    tabla = ds.dataset([str(p) for p in paths], format="parquet").to_table(columns=columnas, filter=filtro)
+    return tabla.to_pandas()
+
+def cargar_historia(simbolos=None, desde=None, hasta=None, columnas=None, directorio=FEATURES_DIR):
+    """Historia completa (entrenamiento) de los simbolos pedidos."""
+    simbolos = simbolos_almacenados(directorio) if simbolos is None else list(simbolos)
+    paths = [p for p in (path_simbolo(s, directorio) for s in simbolos) if p.exists()]
+    if not paths:
+        return pd.DataFrame(columns=columnas or COLUMNAS_BASE + nombres_features())
+    return _leer_dataset(paths, desde, hasta, columnas)
+
+# === ETIQUETAS ===
+def path_etiquetas(simbolo, directorio=ETIQUETAS_DIR):
+    return Path(directorio) / f"{simbolo}{SUFIJO_ETIQUETAS}"
+
+def guardar_etiquetas(simbolo, df, espec, directorio=ETIQUETAS_DIR):
+    """Etiquetas de todas las fechas del simbolo (my_modules.etiquetado), con la especificacion en metadatos."""
+    escribir_parquet(df, path_etiquetas(simbolo, directorio), {"espec": espec})
+
+def espec_etiquetas(simbolo, directorio=ETIQUETAS_DIR):
+    path = path_etiquetas(simbolo, directorio)
+    return leer_metadatos(path).get("espec") if path.exists() else None
+
+def cargar_etiquetas(simbolos=None, desde=None, hasta=None, columnas=None, directorio=ETIQUETAS_DIR):
+    if simbolos is None:
+        simbolos = sorted(p.name[:-len(SUFIJO_ETIQUETAS)] for p in Path(directorio).glob(f"*{SUFIJO_ETIQUETAS}"))
+    paths = [p for p in (path_etiquetas(s, directorio) for s in simbolos) if p.exists()]
+    if not paths:
+        return pd.DataFrame(columns=columnas or ["simbolo", "fecha"])
+    return _leer_dataset(paths, desde, hasta, columnas)
+
+def guardar_ultimas(filas, path=ULTIMAS_PATH):
+    """Actualiza features_dia.parquet con las ultimas filas (una por simbolo) calculadas."""
+    if not filas:
+        return None
+    df = pd.DataFrame(filas)[["simbolo", "fecha"] + nombres_features()]
+    path = Path(path)
+    if path.exists():
+        previas = pd.read_parquet(path)
+        previas = previas[~previas["simbolo"].isin(df["simbolo"])]
+        df = pd.concat([previas, df], ignore_index=True)
+    df = df.sort_values("simbolo").reset_index(drop=True)
+    escribir_parquet(df, path, {"huella": huella_set(), "features": nombres_features()})
+    return df
+
+def cargar_ultimas(simbolos=None, path=ULTIMAS_PATH):
+    """Ultima fila de features por simbolo (inferencia diaria)."""
+    filtros = None if simbolos is None else [("simbolo", "in", list(simbolos))]
+    return pd.read_parquet(path, filters=filtros)
@@ -0,0 +1,144 @@
+"""
+===========================================================================
+ Modulo: Inferencia ML por lotes
+===========================================================================
+
+Descripcion:
+------------
+Carga las features una sola vez en una matriz float32 (filas = pares
+simbolo/fecha) y puntua todos los modelos sobre esa matriz compartida:
+
+- MatrizFeatures.submatriz(feature_names) alinea las columnas de cada
+  modelo con un mapeo cacheado por lista de features (las que faltan
+  quedan como NaN)
+- Solo se puntuan las filas con todas las features del modelo; no se
+  rellenan huecos con valores posteriores (el bfill anterior filtraba
+  futuro)
+- Modo diario: ultima fila por simbolo (feature_store.cargar_ultimas);
+  modo historico: historia completa del feature store
+- Acepta modelos sklearn/xgboost y ArbolesCompilados (evaluacion solo
+  con NumPy, ver arboles_compilados)
+- Salida: una tabla compacta (modelo, simbolo, fecha, pred, prob,
+  pred_senal) con modelo y simbolo como categorias
+
+Uso:
+----
+    from my_modules.inferencia_ml import MatrizFeatures, cargar_matriz, puntuar
+    matriz = cargar_matriz("diario")
+    df_senales = puntuar(matriz, {"xgboost_20250601": modelo})
+===========================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+from my_modules.arboles_compilados import ArbolesCompilados
+from my_modules.feature_store import cargar_historia, cargar_ultimas
+
+COLUMNAS_ID = ["simbolo", "fecha"]
+
+class MatrizFeatures:
+    def __init__(self, df):
+        numericas = [c for c in df.select_dtypes(include=[np.number]).columns if c not in COLUMNAS_ID]
+        self.simbolo = df["simbolo"].astype("category").to_numpy()
+        self.fecha = df["fecha"].to_numpy()
+        self.columnas = numericas
+        self.X = df[numericas].to_numpy(dtype=np.float32)
+        self._posicion = {c: i for i, c in enumerate(numericas)}
+        self._mapeos = {}
+
+    def __len__(self):
+        return len(self.X)
+
+    def alinear(self, feature_names):
+        """Indices de columna de cada feature del modelo (-1 si la matriz no la tiene), cacheados."""
+        clave = tuple(feature_names)
+        if clave not in self._mapeos:
+            self._mapeos[clave] = np.array([self._posicion.get(c, -1) for c in clave], dtype=np.int64)
+        return self._mapeos[clave]
+
+    def submatriz(self, feature_names):
+        idx = self.alinear(feature_names)
+        if (idx >= 0).all():
+            return self.X[:, idx]
+        X = np.full((len(self.X), len(idx)), np.nan, dtype=np.float32)
+        presentes = idx >= 0
+        X[:, presentes] = self.X[:, idx[presentes]]
+        return X
+
+    def faltantes(self, feature_names):
+        idx = self.alinear(feature_names)
+        return [c for c, i in zip(feature_names, idx) if i < 0]
+
+def cargar_matriz(modo="diario", simbolos=None, desde=None):
+    if modo == "diario":
+        df = cargar_ultimas(simbolos)
+    elif modo == "historico":
+        df = cargar_historia(simbolos, desde=desde)
+    else:
+        raise ValueError(f"Modo desconocido: {modo}")
+    return MatrizFeatures(df)
+
+def nombres_modelo(modelo):
+    """Features con las que se entreno el modelo (feature_names_in_ de sklearn/xgboost, feature_names de un Booster); None si no constan."""
+    nombres = getattr(modelo, "feature_names_in_", None)
+    if nombres is None:
+        nombres = getattr(modelo, "feature_names", None)
+    return None if nombres is None else list(nombres)
+
+def predecir_modelo(modelo, matriz, feature_names, filas=None):
+    """(indices de filas puntuadas, pred, prob de la clase 1 o NaN) sobre las filas completas."""
+    X = matriz.submatriz(feature_names)
+    completas = ~np.isnan(X).any(axis=1)
+    if filas is not None:
+        completas &= filas
+    idx = np.flatnonzero(completas)
+    if not len(idx):
+        return idx, np.empty(0), np.empty(0)
+    if isinstance(modelo, ArbolesCompilados):
+        prob = modelo.prob(X[idx])
+        return idx, (prob > 0.5).astype(int), prob
+    if hasattr(modelo, "inplace_predict"):
+        # xgboost.Booster (entrenamiento_xgb): binary:logistic devuelve la probabilidad
+        prob = np.asarray(modelo.inplace_predict(X[idx]))
+        return idx, (prob > 0.5).astype(int), prob
+    X = pd.DataFrame(X[idx], columns=feature_names)
+    if hasattr(modelo, "predict_proba"):
+        prob = modelo.predict_proba(X)[:, -1]
+        clases = getattr(modelo, "classes_", np.array([0, 1]))
+        pred = np.asarray(clases)[(prob > 0.5).astype(int)] if len(clases) == 2 else modelo.predict(X)
+    else:
+        pred = modelo.predict(X)
+        prob = np.full(len(idx), np.nan)
+    return idx, np.asarray(pred), prob
+
+def puntuar(matriz, modelos, filas_por_modelo=None, log=print):
+    """
+    modelos: {nombre: modelo}. filas_por_modelo opcional {nombre: mascara
+    booleana} para limitar las filas de cada modelo (p.ej. sus simbolos).
+    """
+    partes = []
+    for nombre, modelo in modelos.items():
+        feature_names = nombres_modelo(modelo)
+        if feature_names is None:
+            log(f"Modelo {nombre} no contiene metadata de features, omitido")
+            continue
+        faltan = matriz.faltantes(feature_names)
+        if faltan:
+            log(f"Modelo {nombre}: features ausentes en el store {faltan}")
+        filas = None if filas_por_modelo is None else filas_por_modelo.get(nombre)
+        idx, pred, prob = predecir_modelo(modelo, matriz, feature_names, filas)
+        partes.append(pd.DataFrame({
+            "modelo": nombre,
+            "simbolo": matriz.simbolo[idx],
+            "fecha": matriz.fecha[idx],
+            "pred": pred,
+            "prob": prob.astype(np.float32),
+        }))
+    if not partes:
+        return pd.DataFrame(columns=["modelo", "simbolo", "fecha", "pred", "prob", "pred_senal"])
+    df = pd.concat(partes, ignore_index=True)
+    df["pred_senal"] = pd.Categorical(np.where(df["pred"] == 1, "buy", "hold"), categories=["buy", "hold"])
+    df["modelo"] = df["modelo"].astype("category")
+    df["simbolo"] = df["simbolo"].astype("category")
+    return df
@@ -1,8 +1,133 @@
+"""
+Logging de estrategias con escritura en lote.
+
+Cada estrategia escribe en logs/estrategias/<nombre>/<nombre>.log y
+<nombre>_<fecha>.csv, pero los registros no se escriben en el hilo que
+llama: un QueueHandler los encola y un unico hilo escritor los agrupa por
+fichero y los vuelca en lotes (una apertura por fichero y lote).
+
+- registrar_ejecucion(nombre): decorador de generar_senales que registra
+  una linea estructurada por llamada (simbolo, buy, sell, duracion) y
+  acumula el resumen por ejecucion
+- contexto_simbolo(simbolo): indica a que simbolo pertenecen los registros
+- fijar_verbosidad(False): en corridas masivas descarta INFO por llamada;
+  avisos, errores y el resumen final se mantienen
+- emitir_resumen(): escribe una linea RESUMEN por estrategia (se llama
+  tambien al salir del proceso)
+- Cada llamada alimenta tambien my_modules.metricas (estrategia_segundos,
+  senales) etiquetado por estrategia y simbolo
+- Con --profile / TR_PROFILE cada llamada se perfila como
+  "estrategia.<nombre>" (my_modules.perfilado)
+
+Formato: fecha,nivel,simbolo,mensaje
+"""
+
+import atexit
+import contextvars
+import functools
 import logging
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from logging.handlers import QueueHandler
 from pathlib import Path
 
+from my_modules.metricas import contar, observar
+from my_modules.perfilado import perfilar
+
+VERBOSO = os.getenv("ESTRATEGIAS_LOG_VERBOSO", "1") != "0"
+MAX_LOTE = 1000
+ESPERA_LOTE_S = 0.5
+FORMATO = "%(asctime)s,%(levelname)s,%(simbolo)s,%(message)s"
+
+_COLA = queue.SimpleQueue()
+_FIN = object()
+_escritor = None
+_lock = threading.Lock()
+_simbolo = contextvars.ContextVar("simbolo_estrategia", default="")
+_resumen = {}
+
+# === ESCRITOR EN LOTE ===
+class EscritorLotes(threading.Thread):
+    """Vacia la cola en lotes de hasta MAX_LOTE lineas o ESPERA_LOTE_S segundos."""
+    def __init__(self, cola):
+        super().__init__(name="escritor_logs_estrategias", daemon=True)
+        self.cola = cola
+
+    def run(self):
+        terminar = False
+        while not terminar:
+            item = self.cola.get()
+            lote = []
+            limite = time.monotonic() + ESPERA_LOTE_S
+            while True:
+                if item is _FIN:
+                    terminar = True
+                    break
+                lote.append(item)
+                restante = limite - time.monotonic()
+                if len(lote) >= MAX_LOTE or restante <= 0:
+                    break
+                try:
+                    item = self.cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+            self.escribir(lote)
+
+    @staticmethod
+    def escribir(lote):
+        por_fichero = {}
+        for destinos, linea in lote:
+            for path in destinos:
+                por_fichero.setdefault(path, []).append(linea)
+        for path, lineas in por_fichero.items():
+            try:
+                with open(path, "a") as f:
+                    f.write("".join(lineas))
+            except OSError:
+                pass
+
+def _asegurar_escritor():
+    global _escritor
+    with _lock:
+        if _escritor is None:
+            _escritor = EscritorLotes(_COLA)
+            _escritor.start()
+            atexit.register(detener_escritor)
+            atexit.register(emitir_resumen)  # atexit es LIFO: el resumen se encola antes de detener
+
+def detener_escritor(timeout=5):
+    global _escritor
+    with _lock:
+        escritor, _escritor = _escritor, None
+    if escritor is not None:
+        _COLA.put(_FIN)
+        escritor.join(timeout)
+
+class HandlerCola(QueueHandler):
+    """Formatea en el hilo que llama y encola (destinos, linea) para el escritor."""
+    def __init__(self, destinos):
+        super().__init__(_COLA)
+        self.destinos = tuple(destinos)
+        self.setFormatter(logging.Formatter(FORMATO))
+
+    def prepare(self, record):
+        return self.destinos, self.format(record) + "\n"
+
+class FiltroEstrategia(logging.Filter):
+    """Anade el simbolo en curso, cuenta avisos/errores y aplica la verbosidad."""
+    def filter(self, record):
+        if not hasattr(record, "simbolo"):
+            record.simbolo = _simbolo.get()
+        if record.levelno >= logging.WARNING:
+            contadores = _contadores(record.name)
+            contadores["errores" if record.levelno >= logging.ERROR else "avisos"] += 1
+            return True
+        return VERBOSO or getattr(record, "forzar", False)
+
 def configurar_logger(nombre_estrategia, log_dir_base=None):
     if log_dir_base is None:
         log_dir_base = str(Path.home() / "tr" / "logs" / "estrategias")
@@ -17,17 +142,107 @@ def configurar_logger(nombre_estrategia, log_dir_base=None):
     dir_estrategia = os.path.join(log_dir_base, nombre_estrategia)
     os.makedirs(dir_estrategia, exist_ok=True)
 
-    # Log persistente
+    # Log persistente + log diario, escritos por el hilo escritor
     log_file_persistente = os.path.join(dir_estrategia, f"{nombre_estrategia}.log")
-    fh = logging.FileHandler(log_file_persistente)
-    fh.setFormatter(logging.Formatter("%(asctime)s,%(levelname)s,%(message)s"))
-
-    # Log diario
     log_file_diario = os.path.join(dir_estrategia, f"{nombre_estrategia}_{hoy}.csv")
-    dh = logging.FileHandler(log_file_diario)
-    dh.setFormatter(logging.Formatter("%(asctime)s,%(levelname)s,%(message)s"))
 
-    logger.addHandler(fh)
-    logger.addHandler(dh)
+    _asegurar_escritor()
+    logger.addHandler(HandlerCola([log_file_persistente, log_file_diario]))
+    logger.addFilter(FiltroEstrategia())
+    logger.propagate = False
 
     return logger
+
+# === CONTEXTO, VERBOSIDAD Y RESUMEN ===
+def fijar_verbosidad(verboso):
+    global VERBOSO
+    VERBOSO = bool(verboso)
+
+@contextmanager
+def contexto_simbolo(simbolo):
+    token = _simbolo.set(simbolo)
+    try:
+        yield
+    finally:
+        _simbolo.reset(token)
+
+def _contadores(nombre):
+    with _lock:
+        return _resumen.setdefault(nombre, {
+            "llamadas": 0, "buy": 0, "sell": 0, "avisos": 0, "errores": 0, "duracion_s": 0.0,
+        })
+
+def registrar_ejecucion(nombre_estrategia):
+    """Decorador para generar_senales: linea estructurada por llamada y acumulado por ejecucion."""
+    clave_perfil = f"estrategia.{nombre_estrategia}"
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(df, *args, **kwargs):
+            t0 = time.perf_counter()
+            with perfilar(clave_perfil):
+                df_out = funcion(df, *args, **kwargs)
+            duracion = time.perf_counter() - t0
+
+            n_buy = n_sell = 0
+            if df_out is not None and "signal" in getattr(df_out, "columns", ()):
+                n_buy = int(df_out["signal"].eq("buy").sum())
+                n_sell = int(df_out["signal"].eq("sell").sum())
+            simbolo = _simbolo.get() or None
+            observar("estrategia_segundos", duracion, estrategia=nombre_estrategia, simbolo=simbolo)
+            contar("senales", n_buy, estrategia=nombre_estrategia, simbolo=simbolo, senal="buy")
+            contar("senales", n_sell, estrategia=nombre_estrategia, simbolo=simbolo, senal="sell")
+            contadores = _contadores(nombre_estrategia)
+            with _lock:
+                contadores["llamadas"] += 1
+                contadores["buy"] += n_buy
+                contadores["sell"] += n_sell
+                contadores["duracion_s"] += duracion
+            if VERBOSO:
+                logger = configurar_logger(nombre_estrategia)
+                logger.info(f"EJECUCION,buy={n_buy},sell={n_sell},duracion_ms={duracion * 1000:.1f}")
+            return df_out
+        return envoltura
+    return decorador
+
+def resumen_ejecucion():
+    """Copia de los contadores acumulados por estrategia en este proceso."""
+    with _lock:
+        return {nombre: dict(c, duracion_s=round(c["duracion_s"], 3)) for nombre, c in _resumen.items()}
+
+def emitir_resumen(reiniciar=True):
+    """Escribe una linea RESUMEN por estrategia (con cualquier verbosidad) y devuelve el resumen."""
+    resumen = resumen_ejecucion()
+    for nombre, c in resumen.items():
+        if not c["llamadas"] and not c["errores"] and not c["avisos"]:
+            continue
+        configurar_logger(nombre).info(
+            f"RESUMEN,llamadas={c['llamadas']},buy={c['buy']},sell={c['sell']},"
+            f"avisos={c['avisos']},errores={c['errores']},duracion_s={c['duracion_s']}",
+            extra={"simbolo": "*", "forzar": True},
+        )
+    if reiniciar:
+        with _lock:
+            _resumen.clear()
+    return resumen
+
+class LoggerPerezoso:
+    """
+    Sustituto de configurar_logger para usar a nivel de modulo: no crea
+    carpetas ni abre ficheros hasta el primer mensaje. Importar una
+    estrategia queda libre de efectos secundarios.
+    """
+    def __init__(self, nombre_estrategia, log_dir_base=None):
+        self._nombre = nombre_estrategia
+        self._log_dir_base = log_dir_base
+        self._logger = None
+
+    def _real(self):
+        if self._logger is None:
+            self._logger = configurar_logger(self._nombre, self._log_dir_base)
+        return self._logger
+
+    def __getattr__(self, atributo):
+        return getattr(self._real(), atributo)
+
+def logger_perezoso(nombre_estrategia, log_dir_base=None):
+    return LoggerPerezoso(nombre_estrategia, log_dir_base)
@@ -0,0 +1,227 @@
+"""
+===========================================================================
+ Modulo: Generador de mercado sintetico (OHLCV diario)
+===========================================================================
+
+Descripcion:
+------------
+Genera paneles OHLCV diarios realistas para probar escala y casos
+limite sin datos externos. Todo se calcula con arrays (sesiones x
+simbolos) por bloques de BLOQUE simbolos; solo la recursion GARCH
+recorre el eje temporal, vectorizada sobre el bloque.
+
+- Retornos log con deriva y volatilidad propias por simbolo
+- Agrupamiento de volatilidad GARCH(1,1) con innovaciones t de Student
+- Saltos (Poisson) y gaps de apertura de 3-10% (ejercitan
+  gap_open_strategy_v5), aplicados en el tramo nocturno
+- Volumen ligado a |retorno| con picos aleatorios de 3-10x (ejercitan
+  ruptura_volumen_v1)
+- Dias faltantes sueltos, suspensiones (halts) de varias sesiones que
+  reabren con gap, y simbolos que cotizan desde mas tarde
+- Fechas = sesiones de config/calendario_trading.json
+
+La salida usa el formato del historico: un parquet por simbolo con
+datetime, fecha (date32), open, high, low, close, volume; y un
+symbol_groups.json con grupos de tam_grupo simbolos.
+
+La misma semilla produce el mismo mercado (rng por semilla y bloque).
+
+Uso:
+----
+    from my_modules.mercado_sintetico import escribir_historico, escribir_grupos
+    resumen = escribir_historico("/tmp/historic", n_simbolos=5000, anios=20)
+    escribir_grupos(resumen["simbolos"], "/tmp/symbol_groups.json")
+
+    for simbolo, columnas in iterar_panel(50, anios=1, prob_gap=0.05):
+        ...
+===========================================================================
+"""
+
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from my_modules.calendario_trading import cargar_calendario
+
+VERSION = 1
+SEMILLA = 20240101
+BLOQUE = 256
+SESIONES_ANIO = 252
+FECHA_FIN = "2025-12-31"
+PREFIJO = "SYN"
+
+PARAMETROS = {
+    "drift_anual": (-0.05, 0.15),
+    "vol_anual": (0.15, 0.60),
+    "precio_inicial": (2.0, 500.0),
+    "volumen_base": (1e4, 5e6),
+    "garch_alpha": 0.08,
+    "garch_beta": 0.90,
+    "colas_df": 5,
+    "frac_noche": 0.3,
+    "prob_salto": 1.5 / SESIONES_ANIO,
+    "salto_media": -0.005,
+    "salto_std": 0.05,
+    "prob_gap": 0.01,
+    "gap_rango": (0.03, 0.10),
+    "prob_pico_volumen": 0.01,
+    "pico_volumen": (3.0, 10.0),
+    "prob_dia_faltante": 0.002,
+    "halts_anio": 0.2,
+    "halt_sesiones": (1, 10),
+    "frac_listados_tarde": 0.2,
+}
+
+COLUMNAS = ["open", "high", "low", "close", "volume"]
+
+def nombres_simbolos(n, prefijo=PREFIJO):
+    return [f"{prefijo}{i:04d}" for i in range(n)]
+
+def sesiones_sinteticas(anios, fecha_fin=FECHA_FIN):
+    sesiones = cargar_calendario().sesiones
+    sesiones = sesiones[sesiones <= np.datetime64(fecha_fin)]
+    return sesiones[-int(anios * SESIONES_ANIO):]
+
+def _log_uniforme(rng, rango, n):
+    return np.exp(rng.uniform(np.log(rango[0]), np.log(rango[1]), n))
+
+# === GENERACION ===
+def generar_bloque(rng, T, n, p):
+    """Arrays (T x n) de open/high/low/close/volume y la mascara de filas presentes."""
+    dt = 1 / SESIONES_ANIO
+    mu = rng.uniform(*p["drift_anual"], n) * dt
+    var_obj = rng.uniform(*p["vol_anual"], n) ** 2 * dt
+    alpha, beta, df = p["garch_alpha"], p["garch_beta"], p["colas_df"]
+    omega = var_obj * (1 - alpha - beta)
+
+    # GARCH(1,1): unico bucle temporal, vectorizado sobre los simbolos del bloque
+    z = rng.standard_t(df, (T, n)) * np.sqrt((df - 2) / df)
+    h = np.empty((T, n))
+    eps = np.empty((T, n))
+    h_t = var_obj.copy()
+    for t in range(T):
+        h[t] = h_t
+        eps[t] = np.sqrt(h_t) * z[t]
+        h_t = omega + alpha * eps[t] ** 2 + beta * h_t
+
+    f = p["frac_noche"]
+    saltos = (rng.random((T, n)) < p["prob_salto"]) * rng.normal(p["salto_media"], p["salto_std"], (T, n))
+    gaps = ((rng.random((T, n)) < p["prob_gap"])
+            * rng.choice([-1.0, 1.0], (T, n)) * rng.uniform(*p["gap_rango"], (T, n)))
+    r_noche = np.sqrt(f) * eps + saltos + gaps
+    sigma_dia = np.sqrt(h * (1 - f))
+    r_dia = mu - 0.5 * h + sigma_dia * rng.standard_normal((T, n))
+
+    log_p0 = np.log(_log_uniforme(rng, p["precio_inicial"], n))
+    log_close = log_p0 + np.cumsum(r_noche + r_dia, axis=0)
+    log_open = np.vstack([log_p0[None, :], log_close[:-1]]) + r_noche
+    open_, close = np.exp(log_open), np.exp(log_close)
+    high = np.maximum(open_, close) * np.exp(0.8 * sigma_dia * np.abs(rng.standard_normal((T, n))))
+    low = np.minimum(open_, close) * np.exp(-0.8 * sigma_dia * np.abs(rng.standard_normal((T, n))))
+
+    movimiento = np.abs(r_noche + r_dia) / np.sqrt(var_obj)
+    picos = np.where(rng.random((T, n)) < p["prob_pico_volumen"], rng.uniform(*p["pico_volumen"], (T, n)), 1.0)
+    volume = np.round(_log_uniforme(rng, p["volumen_base"], n)
+                      * np.exp(0.4 * rng.standard_normal((T, n))) * (1 + 0.5 * movimiento) * picos)
+
+    # Filas presentes: dias sueltos, halts de varias sesiones y altas tardias
+    presente = rng.random((T, n)) >= p["prob_dia_faltante"]
+    t_ini, s_ini = np.nonzero(rng.random((T, n)) < p["halts_anio"] / SESIONES_ANIO)
+    if len(t_ini):
+        largos = rng.integers(p["halt_sesiones"][0], p["halt_sesiones"][1] + 1, len(t_ini))
+        desplaz = np.arange(largos.sum()) - np.repeat(np.cumsum(largos) - largos, largos)
+        t_halt = np.repeat(t_ini, largos) + desplaz
+        s_halt = np.repeat(s_ini, largos)
+        dentro = t_halt < T
+        presente[t_halt[dentro], s_halt[dentro]] = False
+    tarde = rng.random(n) < p["frac_listados_tarde"]
+    inicio = np.where(tarde, rng.integers(0, max(T // 2, 1), n), 0)
+    presente &= np.arange(T)[:, None] >= inicio[None, :]
+
+    return {
+        "open": open_.round(4), "high": high.round(4), "low": low.round(4),
+        "close": close.round(4), "volume": volume,
+    }, presente
+
+def iterar_panel(n_simbolos, anios=1, semilla=SEMILLA, prefijo=PREFIJO, fecha_fin=FECHA_FIN, **parametros):
+    """
+    Genera (simbolo, columnas) por simbolo; columnas es un dict de arrays
+    numpy con "fecha" (datetime64[D]) y COLUMNAS, solo filas presentes.
+    """
+    desconocidos = set(parametros) - set(PARAMETROS)
+    if desconocidos:
+        raise ValueError(f"Parametros desconocidos: {sorted(desconocidos)}")
+    p = dict(PARAMETROS, **parametros)
+    sesiones = sesiones_sinteticas(anios, fecha_fin)
+    simbolos = nombres_simbolos(n_simbolos, prefijo)
+
+    for b, inicio in enumerate(range(0, n_simbolos, BLOQUE)):
+        bloque = simbolos[inicio:inicio + BLOQUE]
+        rng = np.random.default_rng([semilla, b])
+        datos, presente = generar_bloque(rng, len(sesiones), len(bloque), p)
+        for j, simbolo in enumerate(bloque):
+            filas = presente[:, j]
+            columnas = {"fecha": sesiones[filas]}
+            columnas.update({c: datos[c][filas, j] for c in COLUMNAS})
+            yield simbolo, columnas
+
+# === ESCRITURA ===
+def tabla_historico(columnas):
+    """pyarrow.Table con el esquema del historico (datetime, fecha date32, OHLCV)."""
+    import pyarrow as pa
+    tabla = {
+        "datetime": pa.array(columnas["fecha"].astype("datetime64[ns]")),
+        "fecha": pa.array(columnas["fecha"]),
+    }
+    tabla.update({c: pa.array(columnas[c]) for c in COLUMNAS})
+    return pa.table(tabla)
+
+def escribir_simbolo(directorio, simbolo, columnas):
+    import pyarrow.parquet as pq
+    pq.write_table(tabla_historico(columnas), Path(directorio) / f"{simbolo}.parquet")
+    return len(columnas["fecha"])
+
+def escribir_historico(directorio, n_simbolos, anios=1, semilla=SEMILLA, hilos=8, **parametros):
+    """
+    Escribe <directorio>/<simbolo>.parquet para todo el panel (escritura en
+    `hilos` hilos; pyarrow libera el GIL). Devuelve un resumen con simbolos,
+    filas y tiempos.
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    simbolos, filas, pendientes = [], 0, []
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        for simbolo, columnas in iterar_panel(n_simbolos, anios, semilla, **parametros):
+            simbolos.append(simbolo)
+            pendientes.append(pool.submit(escribir_simbolo, directorio, simbolo, columnas))
+            if len(pendientes) >= 4 * hilos:
+                filas += sum(f.result() for f in pendientes)
+                pendientes = []
+        filas += sum(f.result() for f in pendientes)
+    return {
+        "version": VERSION,
+        "semilla": semilla,
+        "simbolos": simbolos,
+        "anios": anios,
+        "filas": filas,
+        "duracion_s": round(time.perf_counter() - t0, 2),
+    }
+
+def escribir_grupos(simbolos, path, tam_grupo=5):
+    """symbol_groups.json con el formato de config/ (grupo_N -> lista de simbolos)."""
+    grupos = {
+        f"grupo_{i // tam_grupo + 1}": list(simbolos[i:i + tam_grupo])
+        for i in range(0, len(simbolos), tam_grupo)
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(grupos, f, indent=2)
+    os.replace(tmp_path, path)
+    return grupos
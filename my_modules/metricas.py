@@ -0,0 +1,235 @@
+"""
+===========================================================================
+ Modulo: Instrumentacion de tiempos y contadores
+===========================================================================
+
+Descripcion:
+------------
+Registro en proceso de metricas etiquetadas por etapa / simbolo /
+estrategia, sin parsear cadenas de log:
+
+- medir(nombre, **etiquetas): context manager y decorador; observa la
+  duracion en segundos en un histograma
+- observar(nombre, valor, **etiquetas): muestra arbitraria en histograma
+- contar(nombre, valor=1, **etiquetas): contador
+
+Al final de la ejecucion (exportar o exportar_al_salir):
+- Prometheus textfile: metrics/textfile/<job>.prom (para el textfile
+  collector de node_exporter); series _bucket/_sum/_count
+- Tabla Parquet: reports/metricas/fecha=YYYY-MM-DD/<job>_<run_id>.parquet
+  con una fila por serie (count, suma, min, max, p50, p95)
+
+Uso:
+----
+    from my_modules.metricas import medir, contar, exportar_al_salir
+    exportar_al_salir("shu_cro")
+    with medir("senales_segundos", etapa="shu_cro", simbolo=s, estrategia=e):
+        ...
+===========================================================================
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import bisect
+import threading
+from contextlib import ContextDecorator
+from datetime import datetime
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+TEXTFILE_DIR = REPO_DIR / "metrics" / "textfile"
+PARQUET_DIR = REPO_DIR / "reports" / "metricas"
+ETIQUETAS_TABLA = ["etapa", "simbolo", "estrategia"]
+
+# Limites en segundos: desde una llamada de estrategia (ms) hasta una etapa completa (min)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# === SERIES ===
+class Histograma:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)  # el ultimo es +Inf
+        self.count = 0
+        self.suma = 0.0
+        self.minimo = None
+        self.maximo = None
+
+    def observar(self, valor):
+        self.conteos[bisect.bisect_left(self.buckets, valor)] += 1
+        self.count += 1
+        self.suma += valor
+        self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+        self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+
+    def cuantil(self, q):
+        """Aproximacion por interpolacion lineal dentro del bucket (como histogram_quantile)."""
+        if not self.count:
+            return None
+        objetivo = q * self.count
+        acumulado = 0
+        for i, c in enumerate(self.conteos):
+            if acumulado + c >= objetivo and c:
+                inferior = self.buckets[i - 1] if i > 0 else 0.0
+                superior = self.buckets[i] if i < len(self.buckets) else self.maximo
+                valor = inferior + (superior - inferior) * (objetivo - acumulado) / c
+                return min(max(valor, self.minimo), self.maximo)
+            acumulado += c
+        return self.maximo
+
+class Registro:
+    def __init__(self):
+        self.contadores = {}
+        self.histogramas = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _clave(nombre, etiquetas):
+        return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items() if v is not None))
+
+    def contar(self, nombre, valor=1, **etiquetas):
+        clave = self._clave(nombre, etiquetas)
+        with self.lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        clave = self._clave(nombre, etiquetas)
+        with self.lock:
+            h = self.histogramas.get(clave)
+            if h is None:
+                h = self.histogramas[clave] = Histograma()
+            h.observar(float(valor))
+
+    def reiniciar(self):
+        with self.lock:
+            self.contadores.clear()
+            self.histogramas.clear()
+
+REGISTRO = Registro()
+
+def contar(nombre, valor=1, **etiquetas):
+    REGISTRO.contar(nombre, valor, **etiquetas)
+
+def observar(nombre, valor, **etiquetas):
+    REGISTRO.observar(nombre, valor, **etiquetas)
+
+class medir(ContextDecorator):
+    """Cronometra un bloque o una funcion y lo observa en `nombre` (segundos)."""
+    def __init__(self, nombre, **etiquetas):
+        self.nombre = nombre
+        self.etiquetas = etiquetas
+        self.duracion = None
+
+    def _recreate_cm(self):
+        # Como decorador, cada llamada usa su propia instancia (seguro entre hilos)
+        return type(self)(self.nombre, **self.etiquetas)
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        self.duracion = time.perf_counter() - self.t0
+        etiquetas = dict(self.etiquetas)
+        if tipo is not None:
+            etiquetas["resultado"] = "error"
+        observar(self.nombre, self.duracion, **etiquetas)
+        return False
+
+# === EXPORTACION ===
+def _nombre_prom(nombre):
+    return re.sub(r"[^a-zA-Z0-9_:]", "_", f"tr_{nombre}")
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _etiquetas_prom(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+def texto_prometheus(job, registro=REGISTRO):
+    lineas = []
+    base = (("job", job),)
+    with registro.lock:
+        contadores = dict(registro.contadores)
+        histogramas = {k: (h.buckets, list(h.conteos), h.count, h.suma) for k, h in registro.histogramas.items()}
+
+    for nombre in sorted({n for n, _ in contadores}):
+        metrica = _nombre_prom(nombre) + "_total"
+        lineas.append(f"# TYPE {metrica} counter")
+        for (n, etiquetas), valor in sorted(contadores.items()):
+            if n == nombre:
+                lineas.append(f"{metrica}{_etiquetas_prom(base + etiquetas)} {valor}")
+
+    for nombre in sorted({n for n, _ in histogramas}):
+        metrica = _nombre_prom(nombre)
+        lineas.append(f"# TYPE {metrica} histogram")
+        for (n, etiquetas), (buckets, conteos, count, suma) in sorted(histogramas.items()):
+            if n != nombre:
+                continue
+            acumulado = 0
+            for limite, c in zip(list(buckets) + ["+Inf"], conteos):
+                acumulado += c
+                lineas.append(f"{metrica}_bucket{_etiquetas_prom(base + etiquetas, [('le', limite)])} {acumulado}")
+            lineas.append(f"{metrica}_sum{_etiquetas_prom(base + etiquetas)} {suma:.6f}")
+            lineas.append(f"{metrica}_count{_etiquetas_prom(base + etiquetas)} {count}")
+
+    lineas.append(f'tr_ultima_exportacion_timestamp_segundos{{job="{job}"}} {time.time():.0f}')
+    return "\n".join(lineas) + "\n"
+
+def filas_tabla(job, run_id, registro=REGISTRO):
+    fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    filas = []
+    with registro.lock:
+        series = [(k, "counter", v) for k, v in registro.contadores.items()]
+        series += [(k, "histogram", h) for k, h in registro.histogramas.items()]
+    for (nombre, etiquetas), tipo, valor in series:
+        etiquetas = dict(etiquetas)
+        fila = {"fecha": fecha, "job": job, "run_id": run_id, "metrica": nombre, "tipo": tipo}
+        for e in ETIQUETAS_TABLA:
+            fila[e] = etiquetas.pop(e, None)
+        fila["otras_etiquetas"] = json.dumps(etiquetas, sort_keys=True) if etiquetas else None
+        if tipo == "counter":
+            fila.update(count=valor, suma=valor, minimo=None, maximo=None, p50=None, p95=None)
+        else:
+            fila.update(count=valor.count, suma=valor.suma, minimo=valor.minimo, maximo=valor.maximo,
+                        p50=valor.cuantil(0.5), p95=valor.cuantil(0.95))
+        filas.append(fila)
+    return filas
+
+def exportar(job, run_id=None, textfile_dir=TEXTFILE_DIR, parquet_dir=PARQUET_DIR, registro=REGISTRO):
+    """Escribe el textfile de Prometheus y la tabla Parquet. Devuelve las rutas escritas."""
+    run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+    rutas = []
+
+    textfile_dir = Path(textfile_dir)
+    textfile_dir.mkdir(parents=True, exist_ok=True)
+    prom_path = textfile_dir / f"{job}.prom"
+    tmp_path = prom_path.with_name(f".{prom_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(texto_prometheus(job, registro))
+    os.replace(tmp_path, prom_path)
+    rutas.append(prom_path)
+
+    filas = filas_tabla(job, run_id, registro)
+    if filas:
+        import pandas as pd  # diferido: los jobs cortos no pagan pandas si no exportan
+        particion = Path(parquet_dir) / f"fecha={datetime.now().date()}"
+        particion.mkdir(parents=True, exist_ok=True)
+        parquet_path = particion / f"{job}_{run_id}.parquet"
+        pd.DataFrame(filas).to_parquet(parquet_path, index=False)
+        rutas.append(parquet_path)
+    return rutas
+
+def exportar_al_salir(job, run_id=None):
+    """Registra la exportacion en atexit; los fallos de exportacion no cambian el exit code."""
+    def _exportar():
+        try:
+            exportar(job, run_id)
+        except Exception as e:
+            print(f"[metricas] No se pudieron exportar las metricas de {job}: {e}")
+    atexit.register(_exportar)
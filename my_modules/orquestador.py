@@ -0,0 +1,140 @@
+"""
+===========================================================================
+ Modulo: Orquestador DAG en proceso
+===========================================================================
+
+Descripcion:
+------------
+Ejecuta etapas de un pipeline dentro de un mismo proceso, en orden
+topologico, pasando los resultados en memoria. Cada etapa recibe el
+contexto `ctx` (dict nombre_etapa -> resultado) y devuelve su resultado.
+
+- Tiempo por etapa y latencia total del DAG
+- Si una dependencia falla o se omite, la etapa se marca SKIP
+- Etapas con siempre=True se ejecutan aunque fallen sus dependencias
+  (p.ej. el reporte de estado)
+- Si el proceso arranco my_modules.recursos_job, cada etapa registra
+  cpu_s, pico_rss_mb y pico_mem_host_pct
+- Con perfilado activo (my_modules.perfilado) cada etapa se perfila como
+  "etapa.<nombre>"
+- persistir_dir opcional: guarda cada resultado intermedio (DataFrame,
+  dict de DataFrames o JSON) para depuracion
+
+Uso:
+----
+    etapas = [
+        Etapa("upd", lambda ctx: ...),
+        Etapa("shu_dia", lambda ctx: ..., depende_de=["upd"]),
+    ]
+    reporte = ejecutar_dag(etapas, log=log)
+===========================================================================
+"""
+
+import json
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from my_modules.metricas import observar
+from my_modules.perfilado import perfilar
+from my_modules.recursos_job import etapa_recursos, ultimo_registro
+
+
+class Etapa:
+    def __init__(self, nombre, funcion, depende_de=(), siempre=False):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.depende_de = list(depende_de)
+        self.siempre = siempre
+
+def orden_topologico(etapas):
+    por_nombre = {e.nombre: e for e in etapas}
+    for e in etapas:
+        faltantes = [d for d in e.depende_de if d not in por_nombre]
+        if faltantes:
+            raise ValueError(f"Etapa {e.nombre} depende de etapas inexistentes: {faltantes}")
+
+    # Kahn estable: respeta el orden de declaracion entre etapas listas
+    pendientes = {e.nombre: set(e.depende_de) for e in etapas}
+    orden = []
+    while pendientes:
+        listas = [e for e in etapas if e.nombre in pendientes and not pendientes[e.nombre]]
+        if not listas:
+            raise ValueError(f"Ciclo de dependencias entre: {sorted(pendientes)}")
+        for e in listas:
+            orden.append(e)
+            del pendientes[e.nombre]
+            for deps in pendientes.values():
+                deps.discard(e.nombre)
+    return orden
+
+def persistir_resultado(nombre, resultado, directorio):
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    if isinstance(resultado, pd.DataFrame):
+        resultado.to_parquet(directorio / f"{nombre}.parquet", index=False)
+    elif isinstance(resultado, dict) and resultado and all(isinstance(v, pd.DataFrame) for v in resultado.values()):
+        subdir = directorio / nombre
+        subdir.mkdir(exist_ok=True)
+        for clave, df in resultado.items():
+            df.to_parquet(subdir / f"{clave}.parquet", index=False)
+    elif resultado is not None:
+        with open(directorio / f"{nombre}.json", "w") as f:
+            json.dump(resultado, f, indent=2, default=str)
+
+def ejecutar_dag(etapas, persistir_dir=None, log=print):
+    """Ejecuta el DAG. Devuelve dict con 'etapas' (lista de registros), 'resultados' y 'duracion_total_s'."""
+    ctx = {}
+    registros = []
+    estados = {}
+    inicio_total = time.perf_counter()
+
+    for etapa in orden_topologico(etapas):
+        registro = {
+            "etapa": etapa.nombre,
+            "inicio": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "SKIP",
+            "duracion_s": 0.0,
+            "mensaje": "",
+        }
+        fallidas = [d for d in etapa.depende_de if estados.get(d) != "OK"]
+        if fallidas and not etapa.siempre:
+            registro["mensaje"] = f"dependencias sin completar: {', '.join(fallidas)}"
+            estados[etapa.nombre] = "SKIP"
+            registros.append(registro)
+            log(f"[{etapa.nombre}] SKIP: {registro['mensaje']}")
+            continue
+
+        ctx["_reporte"] = registros
+        t0 = time.perf_counter()
+        try:
+            with etapa_recursos(etapa.nombre), perfilar(f"etapa.{etapa.nombre}"):
+                ctx[etapa.nombre] = etapa.funcion(ctx)
+            registro["status"] = "OK"
+            if persistir_dir:
+                persistir_resultado(etapa.nombre, ctx[etapa.nombre], persistir_dir)
+        except Exception as e:
+            registro["status"] = "ERROR"
+            registro["mensaje"] = str(e)
+            traceback.print_exc()
+        duracion = time.perf_counter() - t0
+        registro["duracion_s"] = round(duracion, 3)
+        observar("etapa_segundos", duracion, etapa=etapa.nombre, resultado=registro["status"].lower())
+        recursos = ultimo_registro(etapa.nombre)
+        if recursos:
+            registro.update(cpu_s=recursos["cpu_s"], pico_rss_mb=recursos["pico_rss_mb"],
+                            pico_mem_host_pct=recursos["pico_mem_host_pct"])
+        estados[etapa.nombre] = registro["status"]
+        registros.append(registro)
+        log(f"[{etapa.nombre}] {registro['status']} ({registro['duracion_s']}s) {registro['mensaje']}".rstrip())
+
+    ctx.pop("_reporte", None)
+    observar("dag_segundos", time.perf_counter() - inicio_total)
+    return {
+        "etapas": registros,
+        "resultados": ctx,
+        "duracion_total_s": round(time.perf_counter() - inicio_total, 3),
+    }
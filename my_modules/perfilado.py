@@ -0,0 +1,181 @@
+"""
+===========================================================================
+ Modulo: Perfilado opcional (cProfile) por estrategia y etapa
+===========================================================================
+
+Descripcion:
+------------
+Modo --profile comun a los runners (shu_cro, shu_dia,
+run_backtest_heuristico, gen_ordenes_v2, fea, sml, pipeline_diario).
+Tambien se activa con la variable de entorno TR_PROFILE=1.
+
+- perfilar(clave): context manager; con el perfilado apagado devuelve un
+  nullcontext compartido (coste de una llamada y un `with` vacio)
+- Cada llamada de estrategia (registrar_ejecucion) se perfila como
+  "estrategia.<nombre>" y cada etapa del orquestador como "etapa.<nombre>"
+- Todo lo que no cae en un bloque se atribuye a "job"
+- Los bloques anidados suspenden al exterior: el tiempo de cada clave es
+  exclusivo y la suma de claves es el tiempo perfilado del proceso
+
+Al salir se escribe en reports/profiling/<job>/<run_id>/:
+- <clave>.prof por clave y todo.prof combinado (snakeviz, pstats)
+- resumen.txt: claves ordenadas por tiempo y top de funciones de cada una
+
+Uso:
+----
+    from my_modules.perfilado import agregar_argumento_perfil, activar_perfilado, perfilar
+    args = agregar_argumento_perfil(parser).parse_args()
+    activar_perfilado("shu_cro", args.profile)
+    with perfilar("backtest"):
+        ...
+===========================================================================
+"""
+
+import io
+import os
+import atexit
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+PROFILE_DIR = REPO_DIR / "reports" / "profiling"
+TOP_FUNCIONES = 25
+CLAVE_BASE = "job"
+
+_NULO = nullcontext()
+_activo = False
+_job = None
+_perfiles = {}  # (clave, id de hilo) -> cProfile.Profile
+_pila = threading.local()
+_lock = threading.Lock()
+
+def perfilado_activo():
+    return _activo
+
+def agregar_argumento_perfil(parser):
+    """Anade --profile a un argparse.ArgumentParser."""
+    parser.add_argument("--profile", action="store_true",
+                        help="Perfila la ejecucion con cProfile (tambien TR_PROFILE=1)")
+    return parser
+
+# === BLOQUES ===
+def _perfil(clave):
+    import cProfile
+    ident = threading.get_ident()
+    with _lock:
+        perfil = _perfiles.get((clave, ident))
+        if perfil is None:
+            perfil = _perfiles[(clave, ident)] = cProfile.Profile()
+    return perfil
+
+def _pila_hilo():
+    if not hasattr(_pila, "perfiles"):
+        _pila.perfiles = []
+    return _pila.perfiles
+
+class _Bloque:
+    def __init__(self, clave):
+        self.clave = clave
+
+    def __enter__(self):
+        pila = _pila_hilo()
+        if pila:
+            pila[-1].disable()
+        perfil = _perfil(self.clave)
+        pila.append(perfil)
+        perfil.enable()
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        pila = _pila_hilo()
+        pila.pop().disable()
+        if pila:
+            pila[-1].enable()
+        return False
+
+def perfilar(clave):
+    """Bloque perfilado bajo `clave`; sin perfilado activo no hace nada."""
+    if not _activo:
+        return _NULO
+    return _Bloque(clave)
+
+# === ACTIVACION ===
+def activar_perfilado(job, activo=None, directorio=PROFILE_DIR, top=TOP_FUNCIONES):
+    """
+    Activa el perfilado si `activo` (flag --profile) o TR_PROFILE. Empieza a
+    perfilar el hilo principal bajo "job" y registra el volcado en atexit.
+    Devuelve True si quedo activo.
+    """
+    global _activo, _job
+    if not activo:
+        activo = os.getenv("TR_PROFILE", "0") not in ("", "0")
+    if not activo or _activo:
+        return _activo
+    _activo, _job = True, job
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    salida = Path(directorio) / job / run_id
+
+    def _volcar():
+        try:
+            ruta = volcar(salida, top)
+            print(f"[perfilado] Perfiles de {job} en {ruta}")
+        except Exception as e:
+            print(f"[perfilado] No se pudieron escribir los perfiles de {job}: {e}")
+    atexit.register(_volcar)
+    _Bloque(CLAVE_BASE).__enter__()
+    return True
+
+def _stats_por_clave():
+    import pstats
+    por_clave = {}
+    with _lock:
+        perfiles = list(_perfiles.items())
+    for (clave, _), perfil in perfiles:
+        if clave in por_clave:
+            por_clave[clave].add(perfil)
+        else:
+            por_clave[clave] = pstats.Stats(perfil)
+    return por_clave
+
+def volcar(salida, top=TOP_FUNCIONES):
+    """Detiene los perfiles del hilo actual y escribe .prof por clave, todo.prof y resumen.txt."""
+    import pstats
+    pila = _pila_hilo()
+    while pila:
+        pila.pop().disable()
+
+    salida = Path(salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    por_clave = _stats_por_clave()
+    if not por_clave:
+        return salida
+
+    total = sum(s.total_tt for s in por_clave.values()) or 1.0
+    combinado = None
+    resumen = io.StringIO()
+    ordenadas = sorted(por_clave.items(), key=lambda kv: kv[1].total_tt, reverse=True)
+
+    resumen.write(f"Perfil de {_job} - {datetime.now():%Y-%m-%d %H:%M:%S} - {total:.2f}s perfilados\n\n")
+    for clave, stats in ordenadas:
+        resumen.write(f"{clave:<40} {stats.total_tt:>10.3f}s {100 * stats.total_tt / total:>6.1f}%\n")
+
+    for clave, stats in ordenadas:
+        nombre = "".join(c if c.isalnum() or c in "._-" else "_" for c in clave)
+        stats.dump_stats(salida / f"{nombre}.prof")
+        if combinado is None:
+            combinado = pstats.Stats(str(salida / f"{nombre}.prof"))
+        else:
+            combinado.add(str(salida / f"{nombre}.prof"))
+
+        resumen.write(f"\n=== {clave} ({stats.total_tt:.3f}s) ===\n")
+        stats.stream = resumen
+        stats.sort_stats("tottime").print_stats(top)
+
+    combinado.dump_stats(salida / "todo.prof")
+    tmp_path = salida / f".resumen.txt.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(resumen.getvalue())
+    os.replace(tmp_path, salida / "resumen.txt")
+    return salida
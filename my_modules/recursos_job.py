@@ -0,0 +1,438 @@
+"""
+===========================================================================
+ Modulo: Contabilidad de recursos por job y etapa (psutil)
+===========================================================================
+
+Descripcion:
+------------
+monitor_ec2_status.py mide CPU/RAM/disco del host, pero no dice que job
+los consume. Este modulo corre un hilo muestreador dentro del proceso del
+job y atribuye a cada etapa:
+
+- wall_s, cpu_s (usuario + sistema, incluidos procesos hijos)
+- pico_rss_mb del proceso + hijos y rss al terminar
+- bytes leidos / escritos (io_counters, si el SO lo permite)
+- pico de memoria del host (%) durante la etapa y si supero el umbral
+  de monitor_ec2_status (65%)
+- volumen procesado (filas, simbolos, simbolos/s) si el job lo anota con
+  anotar_volumen()
+- commit de git y huella de cada estrategia de my_modules/estrategias,
+  para saber que cambio cuando una etapa se degrada
+
+Los registros se guardan en reports/summary/recursos.db (SQLite WAL) como
+buffer circular: se conservan las ultimas MAX_ETAPAS filas de etapas y
+MAX_MUESTRAS muestras crudas. reporte_baseline() compara cada ejecucion
+con la mediana de las anteriores de la misma etapa y derivas() filtra las
+etapas recientes degradadas (lo usa status_report).
+
+Uso:
+----
+    from my_modules.recursos_job import iniciar_muestreo, etapa_recursos
+    iniciar_muestreo("shu_cro")          # registra tambien la etapa "total"
+    with etapa_recursos("senales"):
+        ...
+        anotar_volumen(filas=len(df), simbolos=len(simbolos))
+===========================================================================
+"""
+
+import os
+import json
+import time
+import atexit
+import hashlib
+import sqlite3
+import subprocess
+import statistics
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+DB_PATH = REPO_DIR / "reports" / "summary" / "recursos.db"
+UMBRAL_MEMORIA_HOST = 65  # mismo umbral que THRESHOLDS["memoria"] en monitor_ec2_status
+INTERVALO_S = 1.0
+MAX_ETAPAS = 20000
+MAX_MUESTRAS = 200000
+MB = 1024 * 1024
+ESTRATEGIAS_DIR = REPO_DIR / "my_modules" / "estrategias"
+# derivas(): etapas mas cortas que esto no se marcan por tiempo (ruido)
+MIN_WALL_DERIVA_S = 5.0
+MIN_BASELINE_DERIVA = 3
+# Metricas de reporte_baseline: +1 peor si sube, -1 peor si baja
+METRICAS_BASELINE = {"wall_s": 1, "cpu_s": 1, "pico_rss_mb": 1, "simbolos_s": -1}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS etapas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job TEXT, run_id TEXT, etapa TEXT, inicio TEXT, fin TEXT,
+    wall_s REAL, cpu_s REAL, pico_rss_mb REAL, rss_fin_mb REAL,
+    io_lectura_mb REAL, io_escritura_mb REAL,
+    pico_mem_host_pct REAL, supero_umbral INTEGER, n_muestras INTEGER,
+    filas INTEGER, simbolos INTEGER, simbolos_s REAL, commit_git TEXT, estrategias TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_etapas_job_etapa ON etapas (job, etapa, id);
+CREATE TABLE IF NOT EXISTS muestras (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts TEXT, job TEXT, run_id TEXT, etapa TEXT,
+    rss_mb REAL, cpu_pct REAL, mem_host_pct REAL
+);
+"""
+
+# Columnas que no existian en la primera version de la tabla
+COLUMNAS_AGREGADAS = {
+    "filas": "INTEGER", "simbolos": "INTEGER", "simbolos_s": "REAL",
+    "commit_git": "TEXT", "estrategias": "TEXT",
+}
+
+def conectar(db_path=DB_PATH):
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.executescript(ESQUEMA)
+    _migrar(con)
+    return con
+
+def _migrar(con):
+    """Anade a bases creadas por versiones anteriores las columnas que falten."""
+    existentes = {f["name"] for f in con.execute("PRAGMA table_info(etapas)")}
+    for columna, tipo in COLUMNAS_AGREGADAS.items():
+        if columna not in existentes:
+            con.execute(f"ALTER TABLE etapas ADD COLUMN {columna} {tipo}")
+
+# === VERSION DEL CODIGO ===
+def commit_actual():
+    try:
+        salida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, timeout=5)
+        return salida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def huellas_estrategias(directorio=ESTRATEGIAS_DIR):
+    """{estrategia: sha1 corto del fuente} de las estrategias activas."""
+    huellas = {}
+    for archivo in sorted(Path(directorio).glob("*.py")):
+        huellas[archivo.stem] = hashlib.sha1(archivo.read_bytes()).hexdigest()[:10]
+    return huellas
+
+def describir_cambios(anterior, actual):
+    """Texto con el cambio de commit y de estrategias entre dos registros de etapas."""
+    cambios = []
+    if anterior.get("commit_git") != actual.get("commit_git"):
+        cambios.append(f"commit {anterior.get('commit_git') or '?'} -> {actual.get('commit_git') or '?'}")
+    previas = json.loads(anterior.get("estrategias") or "{}")
+    nuevas = json.loads(actual.get("estrategias") or "{}")
+    agregadas = sorted(set(nuevas) - set(previas))
+    quitadas = sorted(set(previas) - set(nuevas))
+    modificadas = sorted(e for e in set(nuevas) & set(previas) if nuevas[e] != previas[e])
+    if agregadas:
+        cambios.append("estrategias nuevas: " + ", ".join(agregadas))
+    if quitadas:
+        cambios.append("estrategias quitadas: " + ", ".join(quitadas))
+    if modificadas:
+        cambios.append("estrategias modificadas: " + ", ".join(modificadas))
+    return "; ".join(cambios)
+
+# === MUESTREO ===
+class MuestreadorRecursos(threading.Thread):
+    def __init__(self, job, intervalo=INTERVALO_S, db_path=DB_PATH):
+        import psutil  # diferido: solo los jobs que miden recursos lo cargan
+        super().__init__(name=f"recursos_{job}", daemon=True)
+        self.psutil = psutil
+        self.job = job
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.intervalo = intervalo
+        self.db_path = db_path
+        self.proceso = psutil.Process(os.getpid())
+        self.proceso.cpu_percent(None)
+        self.commit = commit_actual()
+        self.estrategias = json.dumps(huellas_estrategias(), sort_keys=True)
+        self.muestras = deque(maxlen=MAX_MUESTRAS)
+        self.registros = []
+        self.activas = {}  # etapa -> {"pico_rss", "pico_host", "n", "filas", "simbolos"}
+        self.lock = threading.Lock()
+        self.parar = threading.Event()
+
+    def _arbol(self):
+        procesos = [self.proceso]
+        try:
+            procesos += self.proceso.children(recursive=True)
+        except self.psutil.Error:
+            pass
+        return procesos
+
+    def rss(self):
+        total = 0
+        for p in self._arbol():
+            try:
+                total += p.memory_info().rss
+            except self.psutil.Error:
+                pass
+        return total
+
+    def cpu_s(self):
+        t = self.proceso.cpu_times()
+        total = t.user + t.system + t.children_user + t.children_system
+        for p in self._arbol()[1:]:
+            try:
+                c = p.cpu_times()
+                total += c.user + c.system
+            except self.psutil.Error:
+                pass
+        return total
+
+    def io(self):
+        try:
+            c = self.proceso.io_counters()
+            return c.read_bytes, c.write_bytes
+        except (AttributeError, self.psutil.Error):
+            return None, None
+
+    def muestrear(self):
+        rss = self.rss()
+        host = self.psutil.virtual_memory().percent
+        cpu = self.proceso.cpu_percent(None)
+        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.lock:
+            for nombre, a in self.activas.items():
+                a["pico_rss"] = max(a["pico_rss"], rss)
+                a["pico_host"] = max(a["pico_host"], host)
+                a["n"] += 1
+            etapa = next(reversed(self.activas), None) if self.activas else None
+        self.muestras.append((ts, self.job, self.run_id, etapa, round(rss / MB, 1), cpu, host))
+
+    def run(self):
+        while not self.parar.wait(self.intervalo):
+            try:
+                self.muestrear()
+            except Exception:
+                pass
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = datetime.now()
+        t0, cpu0 = time.perf_counter(), self.cpu_s()
+        lect0, escr0 = self.io()
+        rss0 = self.rss()
+        with self.lock:
+            self.activas[nombre] = {"pico_rss": rss0, "pico_host": self.psutil.virtual_memory().percent, "n": 0,
+                                    "filas": None, "simbolos": None}
+        try:
+            yield
+        finally:
+            self.muestrear()
+            with self.lock:
+                a = self.activas.pop(nombre)
+            lect1, escr1 = self.io()
+            rss1 = self.rss()
+            wall_s = round(time.perf_counter() - t0, 3)
+            registro = {
+                "job": self.job, "run_id": self.run_id, "etapa": nombre,
+                "inicio": inicio.strftime("%Y-%m-%d %H:%M:%S"),
+                "fin": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "wall_s": wall_s,
+                "cpu_s": round(self.cpu_s() - cpu0, 3),
+                "pico_rss_mb": round(max(a["pico_rss"], rss1) / MB, 1),
+                "rss_fin_mb": round(rss1 / MB, 1),
+                "io_lectura_mb": None if lect0 is None else round((lect1 - lect0) / MB, 2),
+                "io_escritura_mb": None if escr0 is None else round((escr1 - escr0) / MB, 2),
+                "pico_mem_host_pct": a["pico_host"],
+                "supero_umbral": int(a["pico_host"] >= UMBRAL_MEMORIA_HOST),
+                "n_muestras": a["n"],
+                "filas": a["filas"],
+                "simbolos": a["simbolos"],
+                "simbolos_s": round(a["simbolos"] / wall_s, 3) if a["simbolos"] and wall_s > 0 else None,
+                "commit_git": self.commit,
+                "estrategias": self.estrategias,
+            }
+            with self.lock:
+                self.registros.append(registro)
+
+    def anotar(self, filas=None, simbolos=None, etapa=None):
+        with self.lock:
+            if etapa is None:
+                etapa = next(reversed(self.activas), None)
+            a = self.activas.get(etapa)
+            if a is None:
+                return
+            if filas is not None:
+                a["filas"] = (a["filas"] or 0) + int(filas)
+            if simbolos is not None:
+                a["simbolos"] = (a["simbolos"] or 0) + int(simbolos)
+
+    def guardar(self):
+        with self.lock:
+            registros, self.registros = self.registros, []
+        muestras = list(self.muestras)
+        self.muestras.clear()
+        if not registros and not muestras:
+            return
+        con = conectar(self.db_path)
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            if registros:
+                columnas = list(registros[0])
+                con.executemany(
+                    f"INSERT INTO etapas ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})",
+                    [tuple(r[c] for c in columnas) for r in registros],
+                )
+            con.executemany(
+                "INSERT INTO muestras (ts, job, run_id, etapa, rss_mb, cpu_pct, mem_host_pct) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                muestras,
+            )
+            # Buffer circular: se descartan las filas mas antiguas
+            con.execute("DELETE FROM etapas WHERE id <= (SELECT MAX(id) FROM etapas) - ?", (MAX_ETAPAS,))
+            con.execute("DELETE FROM muestras WHERE id <= (SELECT MAX(id) FROM muestras) - ?", (MAX_MUESTRAS,))
+            con.execute("COMMIT")
+        except Exception:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    def detener(self):
+        self.parar.set()
+        if self.is_alive():
+            self.join(self.intervalo * 2)
+        self.guardar()
+
+# === API DE PROCESO ===
+_MUESTREADOR = None
+_etapa_total = None
+
+def iniciar_muestreo(job, intervalo=INTERVALO_S, db_path=DB_PATH):
+    """Arranca el muestreador del proceso; al salir guarda la etapa 'total' y las muestras."""
+    global _MUESTREADOR, _etapa_total
+    if _MUESTREADOR is not None:
+        return _MUESTREADOR
+    try:
+        _MUESTREADOR = MuestreadorRecursos(job, intervalo, db_path)
+    except ImportError as e:
+        print(f"[recursos] psutil no disponible, sin contabilidad de recursos: {e}")
+        return None
+    _MUESTREADOR.start()
+    _etapa_total = _MUESTREADOR.etapa("total")
+    _etapa_total.__enter__()
+    atexit.register(finalizar_muestreo)
+    return _MUESTREADOR
+
+def finalizar_muestreo():
+    global _MUESTREADOR, _etapa_total
+    if _MUESTREADOR is None:
+        return
+    if _etapa_total is not None:
+        _etapa_total.__exit__(None, None, None)
+        _etapa_total = None
+    try:
+        _MUESTREADOR.detener()
+    except Exception as e:
+        print(f"[recursos] No se pudieron guardar los recursos de {_MUESTREADOR.job}: {e}")
+    _MUESTREADOR = None
+
+@contextmanager
+def etapa_recursos(nombre):
+    """Mide `nombre` con el muestreador del proceso; sin muestreador activo no hace nada."""
+    if _MUESTREADOR is None:
+        yield None
+        return
+    with _MUESTREADOR.etapa(nombre):
+        yield _MUESTREADOR
+
+def anotar_volumen(filas=None, simbolos=None, etapa=None):
+    """Suma filas/simbolos procesados a `etapa` (por defecto la etapa activa mas interna)."""
+    if _MUESTREADOR is not None:
+        _MUESTREADOR.anotar(filas, simbolos, etapa)
+
+def guardar_pendientes():
+    """Escribe ya los registros terminados del proceso (p.ej. antes de leer derivas en el mismo job)."""
+    if _MUESTREADOR is not None:
+        _MUESTREADOR.guardar()
+
+def ultimo_registro(nombre):
+    """Registro pendiente mas reciente de `nombre` en este proceso (o None)."""
+    if _MUESTREADOR is None:
+        return None
+    with _MUESTREADOR.lock:
+        for r in reversed(_MUESTREADOR.registros):
+            if r["etapa"] == nombre:
+                return dict(r)
+    return None
+
+# === CONSULTAS ===
+def etapas_recientes(minutos=60, db_path=DB_PATH):
+    """Etapas terminadas en los ultimos `minutos`, de mayor a menor pico de RSS."""
+    desde = datetime.fromtimestamp(time.time() - minutos * 60).strftime("%Y-%m-%d %H:%M:%S")
+    con = conectar(db_path)
+    try:
+        filas = con.execute(
+            "SELECT * FROM etapas WHERE fin >= ? ORDER BY pico_rss_mb DESC", (desde,)
+        ).fetchall()
+        return [dict(f) for f in filas]
+    finally:
+        con.close()
+
+def reporte_baseline(job=None, ventana=10, tolerancia=0.25, db_path=DB_PATH):
+    """
+    Para la ultima ejecucion de cada (job, etapa) compara wall_s, cpu_s, pico_rss_mb y
+    simbolos_s con la mediana de las `ventana` ejecuciones anteriores. Marca regresion
+    si supera la mediana en mas de `tolerancia` (proporcion); en simbolos_s, si cae
+    por debajo de mediana / (1 + tolerancia). `cambios` describe commit y estrategias
+    distintos respecto a la ejecucion anterior.
+    """
+    con = conectar(db_path)
+    try:
+        sql = "SELECT * FROM etapas" + (" WHERE job = ?" if job else "") + " ORDER BY id"
+        filas = [dict(f) for f in con.execute(sql, (job,) if job else ()).fetchall()]
+    finally:
+        con.close()
+
+    por_clave = {}
+    for f in filas:
+        por_clave.setdefault((f["job"], f["etapa"]), []).append(f)
+
+    reporte = []
+    for (job_f, etapa), historia in sorted(por_clave.items()):
+        ultima, previas = historia[-1], historia[-1 - ventana:-1]
+        fila = {
+            "job": job_f, "etapa": etapa, "fin": ultima["fin"], "n_baseline": len(previas),
+            "pico_mem_host_pct": ultima["pico_mem_host_pct"], "supero_umbral": bool(ultima["supero_umbral"]),
+            "filas": ultima["filas"], "simbolos": ultima["simbolos"], "commit_git": ultima["commit_git"],
+            "cambios": describir_cambios(previas[-1], ultima) if previas else "",
+            "regresiones": [],
+        }
+        for metrica, sentido in METRICAS_BASELINE.items():
+            valor = ultima[metrica]
+            base = [p[metrica] for p in previas if p[metrica] is not None]
+            mediana = statistics.median(base) if base else None
+            ratio = round(valor / mediana, 3) if mediana and valor is not None else None
+            fila[metrica] = valor
+            fila[f"{metrica}_baseline"] = mediana
+            fila[f"{metrica}_ratio"] = ratio
+            if ratio is not None and (ratio > 1 + tolerancia if sentido > 0 else ratio < 1 / (1 + tolerancia)):
+                fila["regresiones"].append(metrica)
+        reporte.append(fila)
+    return reporte
+
+def derivas(horas=36, ventana=10, tolerancia=0.5, job=None, db_path=DB_PATH):
+    """
+    Etapas terminadas en las ultimas `horas` cuyo wall_s o simbolos_s se alejo de
+    la mediana movil mas de `tolerancia`. Exige MIN_BASELINE_DERIVA ejecuciones
+    previas e ignora por tiempo las etapas de menos de MIN_WALL_DERIVA_S.
+    """
+    desde = datetime.fromtimestamp(time.time() - horas * 3600).strftime("%Y-%m-%d %H:%M:%S")
+    resultado = []
+    for r in reporte_baseline(job, ventana, tolerancia, db_path):
+        if r["fin"] < desde or r["n_baseline"] < MIN_BASELINE_DERIVA:
+            continue
+        motivos = [m for m in r["regresiones"] if m == "simbolos_s"]
+        if "wall_s" in r["regresiones"] and (r["wall_s"] or 0) >= MIN_WALL_DERIVA_S:
+            motivos.insert(0, "wall_s")
+        if motivos:
+            resultado.append(dict(r, motivos=motivos))
+    return resultado
@@ -0,0 +1,274 @@
+"""
+===========================================================================
+ Modulo: Registro de modelos ML
+===========================================================================
+
+Descripcion:
+------------
+Manifiesto (modelos/ml/registro.json) con una entrada por modelo:
+
+    id, ruta del artefacto, sha256, tipo, features, simbolos (None =
+    modelo universal), objetivo, dataset (clave de dataset_ml: la
+    definicion), huella_dataset (huella del contenido con el que se
+    entreno), metricas, estado (activo | sombra | retirado), creado
+
+- Los artefactos nuevos se guardan versionados en modelos/ml/registro/
+  <id>.joblib sin comprimir, de modo que joblib.load(mmap_mode="r")
+  mapea en memoria los arrays numpy (p.ej. arboles de sklearn); xgboost
+  guarda su propio buffer y se carga normal
+- cargar() es perezoso y cacheado por (ruta, sha256): un artefacto se
+  deserializa como mucho una vez por proceso y solo si se usa
+- modelos_para(simbolo) enruta cada simbolo a sus modelos activos
+  (especificos del simbolo + universales), asi la inferencia depende de
+  los modelos activos y no de todos los .pkl guardados
+- Los ensembles de arboles (xgboost, RandomForest) se exportan ademas a
+  <id>.npz (arboles_compilados) si la exportacion es equivalente al
+  modelo; cargar(id, compilado=True) devuelve esa version, que se evalua
+  solo con NumPy (sml.py diario no importa xgboost/sklearn/joblib).
+  compilar(id) exporta los registrados antes o importados del legado
+- importar_legado() registra los .pkl antiguos de modelos/ml
+  (xgboost_{simbolo}_AAAAMMDD_HHMM, xgboost_..., rf_debug_buy_...): el
+  mas reciente de cada familia queda activo (rf_debug en sombra) y el
+  resto retirado
+- Las escrituras releen el manifiesto bajo un flock, para que varios
+  procesos de entrenamiento puedan registrar a la vez; lote() agrupa
+  muchas altas en una sola escritura. preparar() guarda el artefacto
+  fuera del flock y anadir() solo actualiza el manifiesto, para que un
+  lote() no retenga el flock mientras se serializan y compilan modelos
+
+Uso:
+----
+    from my_modules.registro_modelos import RegistroModelos
+    registro = RegistroModelos()
+    id_modelo = registro.registrar(modelo, "xgboost_aapl", features, simbolos=["AAPL"],
+                                   dataset=clave, metricas={"auc": 0.61})
+    for entrada in registro.modelos_para("AAPL"):
+        modelo = registro.cargar(entrada["id"])
+===========================================================================
+"""
+
+import os
+import re
+import json
+import fcntl
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+MODELOS_DIR = REPO_DIR / "modelos" / "ml"
+REGISTRO_PATH = MODELOS_DIR / "registro.json"
+ARTEFACTOS_DIR = MODELOS_DIR / "registro"
+
+ESTADOS = ("activo", "sombra", "retirado")
+
+# xgboost_aapl_20250601_1200.pkl / xgboost_20250601_1200.pkl / rf_debug_buy_20250601_1200.pkl
+PATRON_LEGADO = re.compile(r"^(?P<familia>xgboost|rf_debug_buy)(?:_(?P<simbolo>[a-z0-9.\-]+?))?_(?P<ts>\d{8}_\d{4})$")
+
+_CACHE = {}
+
+def sha256_archivo(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+def _cargar_artefacto(ruta, sha):
+    clave = (str(ruta), sha)
+    if clave not in _CACHE:
+        if str(ruta).endswith(".npz"):
+            from my_modules.arboles_compilados import ArbolesCompilados
+            _CACHE[clave] = ArbolesCompilados.cargar(ruta)
+        else:
+            import joblib
+            _CACHE[clave] = joblib.load(ruta, mmap_mode="r")
+    return _CACHE[clave]
+
+class RegistroModelos:
+    def __init__(self, path=REGISTRO_PATH, artefactos_dir=ARTEFACTOS_DIR):
+        self.path = Path(path)
+        self.artefactos_dir = Path(artefactos_dir)
+        self.entradas = self._leer()
+        self._en_lote = False
+
+    @contextmanager
+    def lote(self):
+        """Agrupa muchas altas/cambios en una sola escritura del manifiesto (p.ej. entrenamiento por lotes)."""
+        with self._escritura():
+            self._en_lote = True
+            try:
+                yield self
+            finally:
+                self._en_lote = False
+
+    def _leer(self):
+        if not self.path.exists():
+            return {}
+        with open(self.path, "r") as f:
+            return json.load(f).get("modelos", {})
+
+    @contextmanager
+    def _escritura(self):
+        """Relee el manifiesto bajo flock, aplica los cambios y lo reescribe atomicamente."""
+        if self._en_lote:
+            yield self.entradas
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.entradas = self._leer()
+            yield self.entradas
+            tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({"actualizado": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "modelos": self.entradas}, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+    # === ALTA / ESTADO ===
+    def registrar(self, modelo, nombre, features, simbolos=None, objetivo=None, dataset=None,
+                  metricas=None, estado="activo", parametros=None, huella_dataset=None):
+        """Guarda el artefacto versionado y lo anade al manifiesto. Devuelve el id."""
+        return self.anadir(self.preparar(modelo, nombre, features, simbolos, objetivo, dataset,
+                                         metricas, estado, parametros, huella_dataset))
+
+    def preparar(self, modelo, nombre, features, simbolos=None, objetivo=None, dataset=None,
+                 metricas=None, estado="activo", parametros=None, huella_dataset=None):
+        """
+        Guarda el artefacto (joblib + compilado) y devuelve su entrada sin
+        tocar el manifiesto: el trabajo pesado queda fuera del flock.
+        """
+        import joblib
+        if estado not in ESTADOS:
+            raise ValueError(f"Estado invalido: {estado}")
+        self.artefactos_dir.mkdir(parents=True, exist_ok=True)
+        creado = datetime.now()
+        tmp_path = self.artefactos_dir / f".{nombre}.{os.getpid()}.tmp"
+        joblib.dump(modelo, tmp_path)
+        sha = sha256_archivo(tmp_path)
+        id_modelo = f"{nombre}_{creado.strftime('%Y%m%d_%H%M%S')}_{sha[:8]}"
+        ruta = self.artefactos_dir / f"{id_modelo}.joblib"
+        os.replace(tmp_path, ruta)
+        compilado = self._exportar_compilado(modelo, features, id_modelo)
+        entrada = {
+            "id": id_modelo,
+            "ruta": str(ruta),
+            "sha256": sha,
+            "tipo": type(modelo).__name__,
+            "features": list(features),
+            "simbolos": sorted(simbolos) if simbolos else None,
+            "objetivo": objetivo,
+            "dataset": dataset,
+            "huella_dataset": huella_dataset,
+            "metricas": metricas or {},
+            "parametros": parametros or {},
+            "estado": estado,
+            "creado": creado.strftime("%Y-%m-%d %H:%M:%S"),
+            "compilado": compilado,
+        }
+        return entrada
+
+    def anadir(self, entrada):
+        """Anade al manifiesto una entrada de preparar(). Devuelve el id."""
+        with self._escritura() as entradas:
+            entradas[entrada["id"]] = entrada
+        return entrada["id"]
+
+    def _exportar_compilado(self, modelo, features, id_modelo):
+        """Guarda <id>.npz si el modelo es un ensemble exportable y equivalente; None si no."""
+        from my_modules.arboles_compilados import exportar, verificar_equivalencia
+        try:
+            compilado = exportar(modelo, features)
+            verificacion = verificar_equivalencia(modelo, compilado)
+        except Exception:
+            return None
+        if not verificacion["ok"]:
+            return None
+        ruta = self.artefactos_dir / f"{id_modelo}.npz"
+        compilado.guardar(ruta)
+        return {"ruta": str(ruta), "sha256": sha256_archivo(ruta), "max_dif": verificacion["max_dif"]}
+
+    def compilar(self, id_modelo):
+        """Exporta a arboles compilados un modelo ya registrado. Devuelve la entrada compilado o None."""
+        entrada = self.entradas[id_modelo]
+        self.artefactos_dir.mkdir(parents=True, exist_ok=True)
+        compilado = self._exportar_compilado(self.cargar(id_modelo), entrada["features"], id_modelo)
+        with self._escritura() as entradas:
+            entradas[id_modelo]["compilado"] = compilado
+        return compilado
+
+    def cambiar_estado(self, id_modelo, estado):
+        if estado not in ESTADOS:
+            raise ValueError(f"Estado invalido: {estado}")
+        with self._escritura() as entradas:
+            if id_modelo not in entradas:
+                raise KeyError(f"Modelo no registrado: {id_modelo}")
+            entradas[id_modelo]["estado"] = estado
+
+    def promover(self, id_modelo):
+        """Activa el modelo y retira los activos que cubren los mismos simbolos con el mismo objetivo."""
+        with self._escritura() as entradas:
+            nuevo = entradas[id_modelo]
+            for e in entradas.values():
+                if (e["id"] != id_modelo and e["estado"] == "activo"
+                        and e["simbolos"] == nuevo["simbolos"] and e["objetivo"] == nuevo["objetivo"]):
+                    e["estado"] = "retirado"
+            nuevo["estado"] = "activo"
+
+    # === CONSULTA ===
+    def modelos(self, estados=("activo",)):
+        return [e for e in self.entradas.values() if e["estado"] in estados]
+
+    def modelos_para(self, simbolo, estados=("activo",)):
+        simbolo = simbolo.upper()
+        return [e for e in self.modelos(estados) if e["simbolos"] is None or simbolo in e["simbolos"]]
+
+    def cargar(self, id_modelo, compilado=False):
+        """Modelo original, o su version compilada si compilado=True y existe."""
+        entrada = self.entradas[id_modelo]
+        if compilado and entrada.get("compilado"):
+            return _cargar_artefacto(entrada["compilado"]["ruta"], entrada["compilado"]["sha256"])
+        return _cargar_artefacto(entrada["ruta"], entrada["sha256"])
+
+    # === LEGADO ===
+    def importar_legado(self, directorio=MODELOS_DIR):
+        """Registra los .pkl sueltos de modelos/ml que aun no esten en el manifiesto."""
+        registradas = {e["ruta"] for e in self.entradas.values()}
+        candidatos = []
+        for path in sorted(Path(directorio).glob("*.pkl")):
+            if str(path) in registradas:
+                continue
+            m = PATRON_LEGADO.match(path.stem)
+            familia = m.group("familia") if m else path.stem
+            simbolo = m.group("simbolo") if m else None
+            ts = m.group("ts") if m else datetime.fromtimestamp(path.stat().st_mtime).strftime("%Y%m%d_%H%M")
+            candidatos.append((familia, simbolo, ts, path))
+        if not candidatos:
+            # Caso habitual (sml.py en cada ejecucion): ni flock ni reescritura del manifiesto
+            return 0
+
+        # El mas reciente de cada (familia, simbolo) queda vigente; el resto retirado
+        ultimos = {}
+        for familia, simbolo, ts, path in candidatos:
+            if ts >= ultimos.get((familia, simbolo), ("",))[0]:
+                ultimos[(familia, simbolo)] = (ts, path)
+        with self._escritura() as entradas:
+            for familia, simbolo, ts, path in candidatos:
+                vigente = ultimos[(familia, simbolo)][1] == path
+                entradas[path.stem] = {
+                    "id": path.stem,
+                    "ruta": str(path),
+                    "sha256": sha256_archivo(path),
+                    "tipo": None,
+                    "features": None,
+                    "simbolos": [simbolo.upper()] if simbolo else None,
+                    "objetivo": "senal",
+                    "dataset": None,
+                    "huella_dataset": None,
+                    "metricas": {},
+                    "parametros": {},
+                    "estado": ("sombra" if familia == "rf_debug_buy" else "activo") if vigente else "retirado",
+                    "creado": datetime.strptime(ts, "%Y%m%d_%H%M").strftime("%Y-%m-%d %H:%M:%S"),
+                    "compilado": None,
+                }
+        return len(candidatos)
@@ -1,9 +1,10 @@
 import pandas as pd
-from my_modules.logger_estrategia import configurar_logger
+from my_modules.logger_estrategia import logger_perezoso, registrar_ejecucion
 
 # Logger con nombre específico
-logger = configurar_logger("reversion_zscore_v1")
+logger = logger_perezoso("reversion_zscore_v1")
 
+@registrar_ejecucion("reversion_zscore_v1")
 def generar_senales(
     df: pd.DataFrame,
     ventana: int = 20,            # ventana para la media y desvío estándar
@@ -33,8 +34,6 @@ def generar_senales(
         df.loc[df["zscore"] > z_sell, "signal"] = "sell"
         df["estrategia"] = "reversion_zscore_v1"
 
-        logger.info(f"RZ v1 | BUY={df['signal'].eq('buy').sum()} | SELL={df['signal'].eq('sell').sum()}")
-
         columnas = ["fecha", "signal", "estrategia"]
         if debug:
             columnas += ["zscore", "ma", "std"]
@@ -1,9 +1,10 @@
 import pandas as pd
-from my_modules.logger_estrategia import configurar_logger
+from my_modules.logger_estrategia import logger_perezoso, registrar_ejecucion
 
 # Configura logger para registrar actividad de la estrategia
-logger = configurar_logger("ruptura_volumen_v1")
+logger = logger_perezoso("ruptura_volumen_v1")
 
+@registrar_ejecucion("ruptura_volumen_v1")
 def generar_senales(
     df: pd.DataFrame,
     umbral_roc: float = 0.03,      # cambio mínimo en % para considerar ruptura
@@ -37,8 +38,6 @@ def generar_senales(
         df.loc[df["cond_sell"], "signal"] = "sell"
         df["estrategia"] = "ruptura_volumen_v1"
 
-        logger.info(f"RV v1 | BUY={df['signal'].eq('buy').sum()} | SELL={df['signal'].eq('sell').sum()}")
-
         columnas = ["fecha", "signal", "estrategia"]
         if debug:
             columnas += ["roc_1d", "vol_z", "cond_buy", "cond_sell"]
@@ -0,0 +1,249 @@
+"""
+===========================================================================
+ Modulo: Validacion de historicos .parquet basada en metadatos
+===========================================================================
+
+Descripcion:
+------------
+Motor de validacion para los historicos por simbolo. Lee primero el
+footer de cada .parquet (schema, numero de filas, estadisticas min/max
+por row group) y solo recurre a leer datos cuando un chequeo de metadatos
+falla o no es concluyente. Reescribe un archivo unicamente si hace falta
+una correccion (duplicados, orden, tipo de fecha).
+
+Chequeos:
+---------
+- Columnas y tipos esperados (desde el schema)
+- Filas vs sesiones esperadas entre fecha_min y fecha_max (calendario_trading)
+- Orden: rangos de row groups solapados o sin metadata de orden
+  (los archivos escritos con escribir_ordenado() la declaran en el footer)
+- Desactualizado: fecha_max anterior a la fecha de referencia
+
+Salida:
+-------
+validar_directorio() devuelve un DataFrame con una fila por simbolo:
+['simbolo', 'filas', 'fecha_min', 'fecha_max', 'lectura', 'errores_tipo',
+ 'dias_faltantes', 'n_dias_faltantes', 'fuera_calendario',
+ 'max_hueco_sesiones', 'duplicados', 'no_monotonico', 'desactualizado',
+ 'reescrito', 'error']
+===========================================================================
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from my_modules.calendario_trading import cargar_calendario
+
+# === CONFIGURACION ===
+COLUMNAS_FECHA = ("fecha", "datetime")
+TIPOS_ESPERADOS = {
+    "open": "double",
+    "high": "double",
+    "low": "double",
+    "close": "double",
+    "volume": "int64",
+}
+TOLERANCIA_FALTANTES = 0.0  # fraccion de sesiones faltantes aceptada sin leer datos
+MAX_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+
+
+# === METADATOS ===
+def _a_fecha(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return pd.Timestamp(valor).date()
+    except Exception:
+        return None
+
+def leer_metadatos(path):
+    """Lee footer y schema sin cargar datos. Devuelve dict con filas, tipos y rangos por row group."""
+    pf = pq.ParquetFile(path)
+    meta = pf.metadata
+    schema = pf.schema_arrow
+
+    col_fecha = next((c for c in COLUMNAS_FECHA if c in schema.names), None)
+    tipos = {campo.name: str(campo.type) for campo in schema}
+
+    rangos = []
+    ordenado_declarado = meta.num_row_groups > 0
+    if col_fecha is not None:
+        idx = schema.get_field_index(col_fecha)
+        for i in range(meta.num_row_groups):
+            rg = meta.row_group(i)
+            stats = rg.column(idx).statistics
+            if stats is None or not stats.has_min_max:
+                rangos = None
+                break
+            rangos.append((_a_fecha(stats.min), _a_fecha(stats.max), rg.num_rows))
+        for i in range(meta.num_row_groups):
+            orden = getattr(meta.row_group(i), "sorting_columns", None) or ()
+            if not any(sc.column_index == idx and not sc.descending for sc in orden):
+                ordenado_declarado = False
+                break
+    else:
+        ordenado_declarado = False
+
+    return {
+        "filas": meta.num_rows,
+        "tipos": tipos,
+        "col_fecha": col_fecha,
+        "rangos": rangos,
+        "ordenado_declarado": ordenado_declarado,
+    }
+
+def chequear_tipos(tipos, col_fecha):
+    errores = []
+    if col_fecha is None:
+        errores.append("sin columna 'fecha'")
+    elif not (tipos[col_fecha].startswith("date") or tipos[col_fecha].startswith("timestamp")):
+        errores.append(f"{col_fecha} tipo invalido: {tipos[col_fecha]} (esperado date32)")
+    for col, tipo in TIPOS_ESPERADOS.items():
+        if col not in tipos:
+            errores.append(f"FALTA {col}")
+        elif tipos[col] != tipo:
+            errores.append(f"{col} tipo invalido: {tipos[col]} (esperado {tipo})")
+    return errores
+
+def sesiones_esperadas(fecha_min, fecha_max):
+    return cargar_calendario().sesiones_en_rango(fecha_min, fecha_max)
+
+# === VALIDACION POR ARCHIVO ===
+def validar_archivo(path, fecha_referencia=None, corregir=True, profundo=False):
+    path = Path(path)
+    res = {
+        "simbolo": path.stem.upper(),
+        "filas": 0,
+        "fecha_min": None,
+        "fecha_max": None,
+        "lectura": "metadatos",
+        "errores_tipo": [],
+        "dias_faltantes": [],
+        "n_dias_faltantes": 0,
+        "fuera_calendario": [],
+        "max_hueco_sesiones": 0,
+        "duplicados": 0,
+        "no_monotonico": False,
+        "desactualizado": False,
+        "reescrito": False,
+        "error": None,
+    }
+    try:
+        meta = leer_metadatos(path)
+        res["filas"] = meta["filas"]
+        res["errores_tipo"] = chequear_tipos(meta["tipos"], meta["col_fecha"])
+        col_fecha = meta["col_fecha"]
+        if col_fecha is None or meta["filas"] == 0:
+            return res
+
+        leer_datos = profundo or meta["rangos"] is None or bool(res["errores_tipo"])
+        if meta["rangos"]:
+            res["fecha_min"] = min(r[0] for r in meta["rangos"])
+            res["fecha_max"] = max(r[1] for r in meta["rangos"])
+            n_esperadas = len(sesiones_esperadas(res["fecha_min"], res["fecha_max"]))
+            # Mas filas que sesiones -> duplicados; demasiado pocas -> huecos
+            if meta["filas"] > n_esperadas or meta["filas"] < n_esperadas * (1 - TOLERANCIA_FALTANTES):
+                leer_datos = True
+            # Row groups solapados o sin orden declarado por el writer
+            anteriores = sorted(meta["rangos"], key=lambda r: r[0])
+            if any(a[1] >= b[0] for a, b in zip(anteriores, anteriores[1:])):
+                leer_datos = True
+            if not meta["ordenado_declarado"]:
+                leer_datos = True
+
+        if leer_datos:
+            # Solo se proyecta la columna de fecha; el resto no se lee
+            res["lectura"] = "datos"
+            fechas = pd.read_parquet(path, columns=[col_fecha])[col_fecha]
+            fechas = pd.to_datetime(fechas, errors="coerce").dropna()
+            fechas = fechas.dt.normalize()
+            res["fecha_min"] = fechas.min().date()
+            res["fecha_max"] = fechas.max().date()
+            res["duplicados"] = int(fechas.duplicated().sum())
+            res["no_monotonico"] = not fechas.is_monotonic_increasing
+            huecos = cargar_calendario().reporte_huecos(fechas.values, res["simbolo"])
+            res["n_dias_faltantes"] = len(huecos["faltantes"])
+            res["dias_faltantes"] = huecos["faltantes"]
+            res["fuera_calendario"] = huecos["fuera_calendario"]
+            res["max_hueco_sesiones"] = huecos["max_hueco_sesiones"]
+
+            necesita_fix = (
+                res["duplicados"] > 0 or res["no_monotonico"]
+                or any(e.startswith(f"{col_fecha} tipo") for e in res["errores_tipo"])
+            )
+            if corregir and necesita_fix:
+                corregir_archivo(path, col_fecha)
+                res["reescrito"] = True
+
+        if fecha_referencia is not None and res["fecha_max"] is not None:
+            res["desactualizado"] = res["fecha_max"] < _a_fecha(fecha_referencia)
+
+    except Exception as e:
+        res["error"] = str(e)
+    return res
+
+# === CORRECCION ===
+def escribir_ordenado(df, path, col_fecha="fecha"):
+    """Escribe un historico ya ordenado declarando el orden en el footer (sorting_columns)."""
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    kwargs = {}
+    if hasattr(pq, "SortingColumn"):
+        kwargs["sorting_columns"] = [pq.SortingColumn(tabla.schema.get_field_index(col_fecha))]
+    tmp_path = f"{path}.tmp"
+    pq.write_table(tabla, tmp_path, **kwargs)
+    os.replace(tmp_path, path)
+
+def corregir_archivo(path, col_fecha):
+    df = pd.read_parquet(path)
+    df[col_fecha] = pd.to_datetime(df[col_fecha], errors="coerce")
+    df = df.dropna(subset=[col_fecha])
+    df = df.sort_values(col_fecha).drop_duplicates(col_fecha, keep="last")
+    if col_fecha == "fecha":
+        df["fecha"] = df["fecha"].dt.date
+    escribir_ordenado(df.reset_index(drop=True), path, col_fecha)
+
+# === VALIDACION DEL UNIVERSO ===
+def validar_directorio(directorio, fecha_referencia=None, corregir=True, profundo=False, max_workers=MAX_WORKERS):
+    """
+    Valida en paralelo todos los .parquet de `directorio`.
+    Si `fecha_referencia` es None se usa la fecha_max mas reciente del universo.
+    """
+    archivos = sorted(Path(directorio).glob("*.parquet"))
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        resultados = list(ex.map(lambda p: validar_archivo(p, None, corregir, profundo), archivos))
+
+    df = pd.DataFrame(resultados)
+    if df.empty:
+        return df
+    if fecha_referencia is None:
+        fecha_referencia = df["fecha_max"].dropna().max()
+    if fecha_referencia is not None:
+        ref = _a_fecha(fecha_referencia)
+        df["desactualizado"] = df["fecha_max"].apply(lambda f: f is not None and f < ref)
+    return df
+
+def resumen_reporte(df):
+    if df.empty:
+        return {"archivos": 0}
+    return {
+        "archivos": int(len(df)),
+        "leidos_solo_metadatos": int((df["lectura"] == "metadatos").sum()),
+        "leidos_datos": int((df["lectura"] == "datos").sum()),
+        "errores_tipo": int(df["errores_tipo"].apply(bool).sum()),
+        "con_dias_faltantes": int((df["n_dias_faltantes"] > 0).sum()),
+        "con_duplicados": int((df["duplicados"] > 0).sum()),
+        "no_monotonicos": int(df["no_monotonico"].sum()),
+        "desactualizados": int(df["desactualizado"].sum()),
+        "reescritos": int(df["reescrito"].sum()),
+        "errores_lectura": int(df["error"].notna().sum()),
+    }
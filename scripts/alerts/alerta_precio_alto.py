@@ -1,39 +1,48 @@
 
 import os
+import sys
+import argparse
 import pandas as pd
-import boto3
 import logging
-import watchtower
 from datetime import datetime
 
 BASE_DIR = "/home/ec2-user/tr"
+sys.path.append(BASE_DIR)
+
+from my_modules.cambios_ingesta import agregar_argumento, simbolos_a_procesar
+
 FEATURES_DIR = f"{BASE_DIR}/data/features"
 LOG_DIR = f"{BASE_DIR}/logs"
 LOG_FILE = f"{LOG_DIR}/precio_alto.log"
 CLOUDWATCH_GROUP = "EC2AlertasLogs"
 EMAIL = os.getenv("EMAIL_TRADING")
 
-os.makedirs(LOG_DIR, exist_ok=True)
-
 logger = logging.getLogger("AlertaPrecioAlto")
 logger.setLevel(logging.INFO)
-formatter = logging.Formatter("%(asctime)s,precio_alto,INFO,%(message)s")
 
-fh = logging.FileHandler(LOG_FILE)
-fh.setFormatter(formatter)
-logger.addHandler(fh)
+def configurar_logging():
+    if logger.handlers:
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+    formatter = logging.Formatter("%(asctime)s,precio_alto,INFO,%(message)s")
+    fh = logging.FileHandler(LOG_FILE)
+    fh.setFormatter(formatter)
+    logger.addHandler(fh)
 
-cw = watchtower.CloudWatchLogHandler(log_group=CLOUDWATCH_GROUP)
-cw.setFormatter(formatter)
-logger.addHandler(cw)
+    import watchtower
+    cw = watchtower.CloudWatchLogHandler(log_group=CLOUDWATCH_GROUP)
+    cw.setFormatter(formatter)
+    logger.addHandler(cw)
 
-def revisar_precios_altos():
+def revisar_precios_altos(simbolos=None):
     print("=== INICIANDO ALERTA PRECIO ALTO ===")
     alertas = []
     for file in os.listdir(FEATURES_DIR):
         if not file.endswith("_features.parquet"):
             continue
         symbol = file.replace("_features.parquet", "")
+        if simbolos is not None and symbol.upper() not in simbolos:
+            continue
         path = os.path.join(FEATURES_DIR, file)
         try:
             df = pd.read_parquet(path)
@@ -70,6 +79,7 @@ def revisar_precios_altos():
         logger.info("No se detectaron alertas de precios altos.")
 
 def enviar_correo(alertas):
+    import boto3
     ses = boto3.client("ses", region_name="eu-central-1")
     asunto = "Alerta de precios altos en acciones"
     cuerpo = "\n".join(alertas)
@@ -84,4 +94,11 @@ def enviar_correo(alertas):
     logger.info(f"Correo enviado con {len(alertas)} alertas")
 
 if __name__ == "__main__":
-    revisar_precios_altos()
+    configurar_logging()
+    args = agregar_argumento(argparse.ArgumentParser(description="Alerta precio alto")).parse_args()
+    simbolos = None
+    if args.cambios:
+        todos = [f.replace("_features.parquet", "").upper() for f in os.listdir(FEATURES_DIR) if f.endswith("_features.parquet")]
+        lista, modo = simbolos_a_procesar(todos, args.cambios)
+        simbolos = set(lista) if modo == "incremental" else None
+    revisar_precios_altos(simbolos)
@@ -1,44 +1,56 @@
 import os
-import json
+import sys
 import logging
-import boto3
-import watchtower
 from datetime import datetime
+from functools import lru_cache
 
 # === RUTAS Y CONFIGURACION ===
 BASE_DIR = "/home/ec2-user/tr"
-STATUS_FILE = os.path.join(BASE_DIR, "reports/summary/system_status.json")
+sys.path.append(BASE_DIR)
+
+from my_modules.estado_sistema import cargar_estado
+from my_modules.recursos_job import derivas, guardar_pendientes
+
 LOG_DIR = os.path.join(BASE_DIR, "logs/alerts")
 LOG_FILE = os.path.join(LOG_DIR, "system_status.log")
 LOG_GROUP = "EC2SystemStatusLogs"
 
 EMAIL_TRADING = os.getenv("EMAIL_TRADING")
-ses = boto3.client("ses", region_name="eu-central-1")
 
 # === LOGGING ===
-os.makedirs(LOG_DIR, exist_ok=True)
-
 logger = logging.getLogger("status_report")
 logger.setLevel(logging.INFO)
-formatter = logging.Formatter("%(asctime)s,%(name)s,%(levelname)s,%(message)s", datefmt="%Y-%m-%d %H:%M:%S")
 
-fh = logging.FileHandler(LOG_FILE)
-fh.setFormatter(formatter)
-logger.addHandler(fh)
+def configurar_logging():
+    """Crea los handlers (fichero + CloudWatch) en el primer uso, no al importar."""
+    if logger.handlers:
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+    formatter = logging.Formatter("%(asctime)s,%(name)s,%(levelname)s,%(message)s", datefmt="%Y-%m-%d %H:%M:%S")
 
-try:
-    cw_handler = watchtower.CloudWatchLogHandler(log_group=LOG_GROUP)
-    cw_handler.setFormatter(formatter)
-    logger.addHandler(cw_handler)
-except Exception as e:
-    logger.warning(f"CloudWatch deshabilitado: {e}")
+    fh = logging.FileHandler(LOG_FILE)
+    fh.setFormatter(formatter)
+    logger.addHandler(fh)
+
+    try:
+        import watchtower
+        cw_handler = watchtower.CloudWatchLogHandler(log_group=LOG_GROUP)
+        cw_handler.setFormatter(formatter)
+        logger.addHandler(cw_handler)
+    except Exception as e:
+        logger.warning(f"CloudWatch deshabilitado: {e}")
+
+@lru_cache(maxsize=1)
+def cliente_ses():
+    import boto3
+    return boto3.client("ses", region_name="eu-central-1")
 
 # === FUNCIONES ===
 def cargar_status():
-    if not os.path.exists(STATUS_FILE):
-        raise FileNotFoundError("system_status.json no encontrado")
-    with open(STATUS_FILE, "r") as f:
-        return json.load(f)
+    data = cargar_estado()
+    if not data:
+        raise FileNotFoundError("Sin estado registrado en system_status.db")
+    return data
 
 def construir_tabla_html(data):
     filas = []
@@ -47,6 +59,8 @@ def construir_tabla_html(data):
         hora = info.get("ultima_ejecucion", "-")
         estado = info.get("status", "-")
         mensaje = info.get("mensaje", "")
+        duracion = info.get("duracion_s")
+        duracion = "-" if duracion is None else f"{duracion:.1f}"
         color = "#c6efce" if estado == "OK" else "#ffc7ce" if estado == "ERROR" else "#ffeb9c"
         fila = f"""
         <tr style="background-color:{color}">
@@ -54,6 +68,7 @@ def construir_tabla_html(data):
             <td>{fecha}</td>
             <td>{hora}</td>
             <td>{estado}</td>
+            <td>{duracion}</td>
             <td>{mensaje}</td>
         </tr>
         """
@@ -62,7 +77,53 @@ def construir_tabla_html(data):
     <table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse">
         <thead>
             <tr>
-                <th>Modulo</th><th>Fecha</th><th>Hora</th><th>Estado</th><th>Mensaje</th>
+                <th>Modulo</th><th>Fecha</th><th>Hora</th><th>Estado</th><th>Duracion (s)</th><th>Mensaje</th>
+            </tr>
+        </thead>
+        <tbody>
+            {filas}
+        </tbody>
+    </table>
+    """.format(filas="\n".join(filas))
+
+def valor_vs_mediana(r, metrica):
+    valor, mediana, ratio = r[metrica], r[f"{metrica}_baseline"], r[f"{metrica}_ratio"]
+    if valor is None:
+        return "-"
+    if mediana is None or ratio is None:
+        return f"{valor:.2f}"
+    return f"{valor:.2f} (mediana {mediana:.2f}, x{ratio:.2f})"
+
+def construir_derivas_html():
+    """Etapas recientes alejadas de su mediana movil (my_modules.recursos_job.derivas)."""
+    try:
+        guardar_pendientes()  # dentro del pipeline diario, incluye las etapas de esta misma ejecucion
+        filas_deriva = derivas()
+    except Exception as e:
+        logger.warning(f"No se pudieron calcular las derivas de rendimiento: {e}")
+        return ""
+    if not filas_deriva:
+        return ""
+    filas = []
+    for r in filas_deriva:
+        filas.append(f"""
+        <tr style="background-color:#ffeb9c">
+            <td>{r['job']}</td>
+            <td>{r['etapa']}</td>
+            <td>{r['fin']}</td>
+            <td>{valor_vs_mediana(r, 'wall_s')}</td>
+            <td>{valor_vs_mediana(r, 'simbolos_s')}</td>
+            <td>{r['pico_rss_mb']}</td>
+            <td>{r['cambios'] or 'sin cambios de commit ni estrategias'}</td>
+        </tr>
+        """)
+        logger.warning(f"Deriva de rendimiento {r['job']}/{r['etapa']}: {', '.join(r['motivos'])} - {r['cambios']}")
+    return """
+    <h3>Derivas de rendimiento</h3>
+    <table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse">
+        <thead>
+            <tr>
+                <th>Job</th><th>Etapa</th><th>Fin</th><th>Duracion (s)</th><th>Simbolos/s</th><th>Pico RSS (MB)</th><th>Cambios</th>
             </tr>
         </thead>
         <tbody>
@@ -77,7 +138,7 @@ def enviar_correo_html(asunto, cuerpo_html):
         return
 
     try:
-        ses.send_email(
+        cliente_ses().send_email(
             Source=EMAIL_TRADING,
             Destination={"ToAddresses": [EMAIL_TRADING]},
             Message={
@@ -92,14 +153,19 @@ def enviar_correo_html(asunto, cuerpo_html):
         logger.error(f"Fallo envio de correo: {str(e)}")
 
 # === MAIN ===
-def main():
+def main(extra_html=""):
+    """`extra_html` permite anexar secciones (p.ej. tiempos del pipeline diario) al correo."""
+    configurar_logging()
     try:
         logger.info("Inicio status_report")
         data = cargar_status()
         fecha_hoy = datetime.utcnow().strftime("%Y-%m-%d")
         asunto = f"[TRADING] Estado diario del sistema - {fecha_hoy}"
         tabla_html = construir_tabla_html(data)
-        enviar_correo_html(asunto, tabla_html)
+        derivas_html = construir_derivas_html()
+        if derivas_html:
+            asunto += " - derivas de rendimiento"
+        enviar_correo_html(asunto, tabla_html + derivas_html + extra_html)
     except Exception as e:
         logger.error(f"Error en status_report: {str(e)}")
 
@@ -1,10 +1,17 @@
 import os
+import sys
 import boto3
 import pandas as pd
 from io import StringIO
 from datetime import datetime
 from pathlib import Path
 
+sys.path.append("/home/ubuntu/tr")
+
+from my_modules.validacion_historicos import escribir_ordenado
+from my_modules.cambios_ingesta import RegistroCambios
+from my_modules.metricas import contar, exportar_al_salir, medir
+
 # === CONFIGURACION ===
 BUCKET_NAME = "leantech-trading"
 S3_CONFIG_PATH = "config/symbol_groups.json"
@@ -43,15 +50,18 @@ def cargar_parquet_local(simbolo):
 
 def guardar_parquet_local(simbolo, df):
     df = df.sort_values("fecha").drop_duplicates("fecha")
-    df.to_parquet(f"{LOCAL_PARQUET_PATH}/{simbolo}.parquet", index=False)
+    # Declara el orden en el footer para que val.py pueda validar solo con metadatos
+    escribir_ordenado(df, f"{LOCAL_PARQUET_PATH}/{simbolo}.parquet")
 
 def guardar_recorte(simbolo, df):
     df = df.sort_values("fecha").drop_duplicates("fecha").tail(NUM_DIAS)
     os.makedirs(RECORTE_PARQUET_PATH, exist_ok=True)
     df.to_parquet(f"{RECORTE_PARQUET_PATH}/{simbolo}.parquet", index=False)
+    return df
 
 # === PROCESAR SIMBOLO ===
-def procesar_simbolo(simbolo):
+def procesar_simbolo(simbolo, registro):
+    """Actualiza el historico del simbolo. Devuelve el recorte de NUM_DIAS si hubo filas nuevas, si no None."""
     try:
         # Descargar .csv reciente desde S3
         obj = s3.get_object(Bucket=BUCKET_NAME, Key=f"{S3_CSV_PATH}/{simbolo}.csv")
@@ -60,6 +70,7 @@ def procesar_simbolo(simbolo):
 
         if "fecha" not in df_csv.columns or df_csv.empty:
             log_event(simbolo, "ERROR", "CSV sin columna 'fecha' o vacio", 0)
+            registro.error(simbolo)
             return
 
         df_parquet = cargar_parquet_local(simbolo)
@@ -70,6 +81,7 @@ def procesar_simbolo(simbolo):
 
         if df_nuevo.empty:
             log_event(simbolo, "SKIP", "Sin fechas nuevas", 0)
+            registro.sin_cambio(simbolo)
             return
 
         # Merge y guardar historico completo
@@ -77,29 +89,53 @@ def procesar_simbolo(simbolo):
         df_combined = df_combined.sort_values("fecha").drop_duplicates("fecha")
 
         guardar_parquet_local(simbolo, df_combined)
-        guardar_recorte(simbolo, df_combined)
+        df_recorte = guardar_recorte(simbolo, df_combined)
 
         log_event(simbolo, "OK", "Actualizacion exitosa", len(df_nuevo))
+        contar("filas_nuevas", len(df_nuevo), etapa="upd", simbolo=simbolo)
+        registro.cambio(simbolo, df_nuevo["fecha"].drop_duplicates(), len(df_nuevo), llegada=obj.get("LastModified"))
+        return df_recorte
 
     except Exception as e:
         log_event(simbolo, "ERROR", str(e), 0)
-
-# === MAIN ===
-def main():
+        registro.error(simbolo)
+
+# === EJECUCION ===
+def ejecutar():
+    """
+    Actualiza todo el universo y escribe el manifiesto de cambios.
+    Devuelve (registro, recortes) con recortes = {simbolo: DataFrame de NUM_DIAS}
+    solo para los simbolos con filas nuevas, para pasarlos en memoria a la etapa siguiente.
+    """
     os.makedirs(LOG_DIR, exist_ok=True)
-    try:
-        obj = s3.get_object(Bucket=BUCKET_NAME, Key=S3_CONFIG_PATH)
-        simbolos_json = obj["Body"].read().decode("utf-8")
+    obj = s3.get_object(Bucket=BUCKET_NAME, Key=S3_CONFIG_PATH)
+    simbolos_json = obj["Body"].read().decode("utf-8")
+
+    with open(LOCAL_CONFIG_PATH, "w") as f:
+        f.write(simbolos_json)
 
-        with open(LOCAL_CONFIG_PATH, "w") as f:
-            f.write(simbolos_json)
+    grupos = pd.read_json(StringIO(simbolos_json))
+    simbolos = sorted(set(sum(grupos.values.tolist(), [])))
 
-        grupos = pd.read_json(StringIO(simbolos_json))
-        simbolos = sorted(set(sum(grupos.values.tolist(), [])))
+    registro = RegistroCambios()
+    recortes = {}
+    for simbolo in simbolos:
+        with medir("simbolo_segundos", etapa="upd", simbolo=simbolo):
+            df_recorte = procesar_simbolo(simbolo, registro)
+        if df_recorte is not None:
+            recortes[simbolo] = df_recorte
 
-        for simbolo in simbolos:
-            procesar_simbolo(simbolo)
+    # Manifiesto de cambios para que las etapas siguientes procesen solo lo afectado
+    path_cambios = registro.guardar()
+    log_event("GLOBAL", "OK", f"Manifiesto de cambios: {path_cambios}", len(registro.simbolos))
+    return registro, recortes
 
+# === MAIN ===
+def main():
+    os.makedirs(LOG_DIR, exist_ok=True)
+    exportar_al_salir("upd")
+    try:
+        ejecutar()
     except Exception as e:
         log_event("GLOBAL", "ERROR", f"No se pudo iniciar: {e}", 0)
 
@@ -1,82 +1,68 @@
 # ruta: /home/ubuntu/tr/scripts/core/val.py
 
 import os
-import pandas as pd
+import sys
+import json
+import argparse
 from datetime import datetime
-from pathlib import Path
 
-BASE_PATH = "/home/ubuntu/tr/data/historic"
-TIPOS_ESPERADOS = {
-    "fecha": "object",
-    "open": "float64",
-    "high": "float64",
-    "low": "float64",
-    "close": "float64",
-    "volume": "int64"
-}
-
-errores = []
-total_archivos = 0
-rangos_fechas = []
-
-def validar_archivo(parquet_path):
-    global total_archivos
-    simbolo = parquet_path.stem
-    total_archivos += 1
-    print(f"\n=== Validando {simbolo} ===")
-    try:
-        df = pd.read_parquet(parquet_path)
-
-        print(f"Columnas: {list(df.columns)}")
-
-        errores_tipo = []
-        for col, tipo in TIPOS_ESPERADOS.items():
-            if col not in df.columns:
-                errores_tipo.append(f"FALTA {col}")
-            elif df[col].dtype != tipo:
-                errores_tipo.append(f"{col} tipo invalido: {df[col].dtype} (esperado {tipo})")
+sys.path.append("/home/ubuntu/tr")
 
-        if errores_tipo:
-            print("ERRORES de tipo o columnas:", errores_tipo)
-            errores.append((simbolo, errores_tipo))
-        else:
-            print("Tipos de datos OK")
+from my_modules.validacion_historicos import validar_directorio, resumen_reporte
 
-        if "fecha" in df.columns:
-            df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce")
-            df = df.dropna(subset=["fecha"])
-            df = df.sort_values("fecha").reset_index(drop=True)
-            min_f, max_f = df["fecha"].min().date(), df["fecha"].max().date()
-            rangos_fechas.append((simbolo, min_f, max_f))
-            print(f"Fechas ordenadas. Rango: {min_f} a {max_f}")
-        else:
-            print("No se puede ordenar: falta columna 'fecha'")
-            errores.append((simbolo, ["sin columna 'fecha'"]))
-            return
+BASE_PATH = "/home/ubuntu/tr/data/historic"
+REPORTE_DIR = "/home/ubuntu/tr/reports/validacion"
 
-        df.to_parquet(parquet_path, index=False)
-        print(f"{simbolo} actualizado correctamente.")
+def main():
+    parser = argparse.ArgumentParser(description="Validacion de historicos .parquet")
+    parser.add_argument("--profundo", action="store_true", help="Lee la columna de fecha de todos los archivos")
+    parser.add_argument("--sin-corregir", action="store_true", help="Solo reporta, nunca reescribe")
+    parser.add_argument("--fecha-referencia", default=None, help="YYYY-MM-DD para detectar simbolos desactualizados")
+    args = parser.parse_args()
 
-    except Exception as e:
-        errores.append((simbolo, [str(e)]))
-        print(f"ERROR procesando {simbolo}: {e}")
+    inicio = datetime.now()
+    df = validar_directorio(
+        BASE_PATH,
+        fecha_referencia=args.fecha_referencia,
+        corregir=not args.sin_corregir,
+        profundo=args.profundo,
+    )
+    resumen = resumen_reporte(df)
+    resumen["duracion_s"] = round((datetime.now() - inicio).total_seconds(), 2)
 
-def main():
-    archivos = sorted(Path(BASE_PATH).glob("*.parquet"))
-    print(f"Total archivos encontrados: {len(archivos)}")
-    for f in archivos:
-        validar_archivo(f)
+    os.makedirs(REPORTE_DIR, exist_ok=True)
+    hoy = datetime.now().date()
+    if not df.empty:
+        df.to_csv(f"{REPORTE_DIR}/val_{hoy}.csv", index=False)
+    with open(f"{REPORTE_DIR}/val_{hoy}_resumen.json", "w") as f:
+        json.dump(resumen, f, indent=2)
 
     print("\n=== RESUMEN FINAL ===")
-    print(f"Archivos analizados: {total_archivos}")
-    print(f"Errores encontrados: {len(errores)}")
-    if errores:
+    for clave, valor in resumen.items():
+        print(f"{clave}: {valor}")
+    if df.empty:
+        return
+
+    con_problemas = df[
+        df["errores_tipo"].apply(bool) | (df["duplicados"] > 0) | df["no_monotonico"]
+        | df["desactualizado"] | df["error"].notna()
+    ]
+    if not con_problemas.empty:
         print("Detalle de errores:")
-        for simb, err in errores:
-            print(f"  - {simb}: {err}")
+        for _, r in con_problemas.iterrows():
+            detalle = r["errores_tipo"] + ([r["error"]] if r["error"] else [])
+            if r["duplicados"]:
+                detalle.append(f"{r['duplicados']} fechas duplicadas")
+            if r["no_monotonico"]:
+                detalle.append("fechas no ordenadas")
+            if r["desactualizado"]:
+                detalle.append(f"desactualizado (ultima fecha {r['fecha_max']})")
+            if r["reescrito"]:
+                detalle.append("corregido y reescrito")
+            print(f"  - {r['simbolo']}: {detalle}")
     print(f"Rangos de fechas por simbolo:")
-    for simb, start, end in rangos_fechas:
-        print(f"  - {simb}: {start} a {end}")
+    for _, r in df.iterrows():
+        print(f"  - {r['simbolo']}: {r['fecha_min']} a {r['fecha_max']} ({r['filas']} filas, {r['n_dias_faltantes']} dias faltantes)")
 
 if __name__ == "__main__":
     main()
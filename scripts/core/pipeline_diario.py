@@ -0,0 +1,188 @@
+"""
+===========================================================================
+ Script: Pipeline diario en un solo proceso - LeanTech Trading
+===========================================================================
+
+Descripcion:
+------------
+Ejecuta en un mismo proceso la cadena diaria que antes eran crons
+separados, pasando los DataFrames en memoria entre etapas:
+
+    upd -> shu_dia -> alc -> gen_ordenes_dia
+                                       \\-> status_report (siempre)
+
+- upd entrega los recortes de NUM_DIAS de los simbolos actualizados
+- shu_dia genera senales solo para esos simbolos (o todo con --completo)
+- alc y gen_ordenes_dia reciben senales y precios sin releer disco
+- status_report anexa al correo la tabla de tiempos del pipeline
+
+Metricas:
+---------
+- Tiempo por etapa y total del DAG (tambien en my_modules.metricas:
+  metrics/textfile/pipeline_diario.prom y reports/metricas)
+- Latencia llegada de datos -> correo enviado (LastModified de S3 hasta
+  fin de alc); si no hay dato de llegada, desde el inicio del pipeline
+
+Uso:
+----
+python pipeline_diario.py
+python pipeline_diario.py --completo                # todo el universo en shu_dia
+python pipeline_diario.py --persistir /tmp/pipeline # guarda intermedios
+python pipeline_diario.py --profile                 # cProfile por etapa y estrategia
+
+===========================================================================
+"""
+
+import os
+import sys
+import json
+import argparse
+import importlib.util
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = "/home/ubuntu/tr"
+sys.path.append(BASE_DIR)
+
+from my_modules.orquestador import Etapa, ejecutar_dag
+from my_modules.estado_sistema import guardar_estado
+from my_modules.metricas import exportar_al_salir
+from my_modules.recursos_job import anotar_volumen, iniciar_muestreo
+from my_modules.perfilado import activar_perfilado, agregar_argumento_perfil
+
+# === CONFIGURACION ===
+SCRIPTS_DIR = Path(__file__).resolve().parents[1]
+LOG_DIR = f"{BASE_DIR}/logs/pipeline"
+LOG_FILE = f"{LOG_DIR}/pipeline_{datetime.now().date()}.log"
+REPORTE_FILE = f"{LOG_DIR}/pipeline_{datetime.now().date()}.json"
+
+# === LOG ===
+def log(msg):
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    linea = f"{ts} | {msg}"
+    print(linea)
+    with open(LOG_FILE, "a") as f:
+        f.write(linea + "\n")
+
+def cargar_script(ruta_relativa, nombre):
+    """Importa un script de scripts/ como modulo (los scripts no son paquetes)."""
+    spec = importlib.util.spec_from_file_location(nombre, SCRIPTS_DIR / ruta_relativa)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def tabla_tiempos_html(reporte, latencia):
+    filas = "".join(
+        f"<tr><td>{r['etapa']}</td><td>{r['status']}</td><td>{r['duracion_s']}</td>"
+        f"<td>{r.get('cpu_s', '-')}</td><td>{r.get('pico_rss_mb', '-')}</td><td>{r['mensaje']}</td></tr>"
+        for r in reporte
+    )
+    return f"""
+    <h3>Pipeline diario - latencia datos a correo: {latencia}</h3>
+    <table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse">
+        <thead><tr><th>Etapa</th><th>Estado</th><th>Duracion (s)</th><th>CPU (s)</th><th>Pico RSS (MB)</th><th>Mensaje</th></tr></thead>
+        <tbody>{filas}</tbody>
+    </table>
+    """
+
+# === ETAPAS ===
+def construir_etapas(args, estado):
+    upd = cargar_script("core/ing/upd.py", "upd")
+    shu_dia = cargar_script("utils/shu_dia.py", "shu_dia")
+    alc = cargar_script("utils/alc.py", "alc")
+    gen_ordenes_dia = cargar_script("utils/backtesting/gen_ordenes_dia.py", "gen_ordenes_dia")
+    status_report = cargar_script("alerts/status_report.py", "status_report")
+
+    def etapa_upd(ctx):
+        registro, recortes = upd.ejecutar()
+        estado["registro"] = registro
+        anotar_volumen(filas=sum(len(df) for df in recortes.values()), simbolos=len(recortes))
+        return recortes
+
+    def etapa_shu_dia(ctx):
+        inicio = datetime.now()
+        recortes = ctx["upd"]
+        if args.completo:
+            simbolos, modo = sorted(shu_dia.cargar_simbolos()), "completo"
+        else:
+            simbolos, modo = sorted(recortes), "incremental"
+        shu_dia.preparar_salida(simbolos, modo)
+        df_senales, errores = shu_dia.generar_senales_dia(simbolos, shu_dia.cargar_estrategias(), precios=recortes)
+        shu_dia.actualizar_status(simbolos, errores, modo, inicio=inicio)
+        return df_senales
+
+    def etapa_alc(ctx):
+        resultado = alc.ejecutar(ctx["shu_dia"], precios=ctx["upd"])
+        if not resultado["enviado"]:
+            # Sin correo no hay latencia datos -> correo que reportar y la etapa queda en ERROR
+            raise RuntimeError("No se envio el correo de alertas")
+        estado["email_enviado"] = datetime.now(timezone.utc)
+        return resultado
+
+    def etapa_gen_ordenes(ctx):
+        os.makedirs(os.path.dirname(gen_ordenes_dia.LOG), exist_ok=True)
+        df_ordenes = gen_ordenes_dia.generar_ordenes(ctx["shu_dia"], precios=ctx["upd"])
+        anotar_volumen(filas=len(df_ordenes))
+        gen_ordenes_dia.guardar_ordenes(df_ordenes)
+        return df_ordenes
+
+    def etapa_status(ctx):
+        status_report.main(extra_html=tabla_tiempos_html(ctx["_reporte"], latencia_texto(estado)))
+        return None
+
+    return [
+        Etapa("upd", etapa_upd),
+        Etapa("shu_dia", etapa_shu_dia, depende_de=["upd"]),
+        Etapa("alc", etapa_alc, depende_de=["shu_dia", "upd"]),
+        Etapa("gen_ordenes_dia", etapa_gen_ordenes, depende_de=["shu_dia", "upd"]),
+        Etapa("status_report", etapa_status, depende_de=["alc", "gen_ordenes_dia"], siempre=True),
+    ]
+
+def latencia_segundos(estado):
+    fin = estado.get("email_enviado")
+    if fin is None:
+        return None
+    registro = estado.get("registro")
+    llegada = registro.llegada_datos if registro is not None else None
+    return round((fin - (llegada or estado["inicio"])).total_seconds(), 2)
+
+def latencia_texto(estado):
+    seg = latencia_segundos(estado)
+    return "N/D" if seg is None else f"{seg}s"
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline diario en proceso")
+    parser.add_argument("--completo", action="store_true", help="shu_dia procesa todo el universo")
+    parser.add_argument("--persistir", default=None, help="Directorio para guardar resultados intermedios")
+    args = agregar_argumento_perfil(parser).parse_args()
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    activar_perfilado("pipeline_diario", args.profile)
+    exportar_al_salir("pipeline_diario")
+    iniciar_muestreo("pipeline_diario")
+    estado = {"inicio": datetime.now(timezone.utc)}
+    log("Inicio pipeline diario")
+
+    reporte = ejecutar_dag(construir_etapas(args, estado), persistir_dir=args.persistir, log=log)
+
+    resumen = {
+        "inicio": estado["inicio"].isoformat(),
+        "duracion_total_s": reporte["duracion_total_s"],
+        "latencia_datos_email_s": latencia_segundos(estado),
+        "etapas": reporte["etapas"],
+    }
+    with open(REPORTE_FILE, "w") as f:
+        json.dump(resumen, f, indent=2)
+
+    fallidas = [r["etapa"] for r in reporte["etapas"] if r["status"] != "OK"]
+    guardar_estado(
+        "pipeline_diario",
+        "OK" if not fallidas else "ERROR",
+        f"{len(reporte['etapas']) - len(fallidas)} de {len(reporte['etapas'])} etapas OK" + (f" (fallan: {', '.join(fallidas)})" if fallidas else ""),
+        duracion_s=reporte["duracion_total_s"],
+    )
+    log(f"Fin pipeline: {reporte['duracion_total_s']}s | latencia datos->email: {latencia_texto(estado)}")
+
+if __name__ == "__main__":
+    main()
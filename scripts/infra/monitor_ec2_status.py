@@ -1,5 +1,6 @@
 
 import os
+import sys
 import psutil
 import boto3
 import logging
@@ -8,6 +9,10 @@ import time
 import watchtower
 import requests
 
+sys.path.append("/home/ubuntu/tr")
+
+from my_modules.recursos_job import etapas_recientes
+
 # === CONFIGURACION ===
 THRESHOLDS = {
     "cpu": 90,
@@ -89,6 +94,19 @@ def evaluar_y_loguear(nombre, valor, umbral):
 
     logger.log(getattr(logging, estado), f"{nombre.upper()} = valor={valor:.2f} - status={estado} - umbral={umbral}" + (f" - {alerta}" if alerta else ""))
 
+def loguear_etapas_memoria(minutos=60, top=3):
+    """Atribuye el uso de RAM a las etapas de jobs recientes (my_modules.recursos_job)."""
+    try:
+        etapas = [e for e in etapas_recientes(minutos) if e["etapa"] != "total"][:top]
+    except Exception as e:
+        logger.error(f"No se pudieron leer los recursos por etapa: {e}")
+        return
+    for e in etapas:
+        logger.warning(
+            f"RAM_ETAPA = {e['job']}/{e['etapa']} - pico_rss_mb={e['pico_rss_mb']} - "
+            f"pico_host={e['pico_mem_host_pct']}% - fin={e['fin']}"
+        )
+
 # === FUNCION PRINCIPAL ===
 def monitorear():
     cpu = psutil.cpu_percent(interval=1)
@@ -99,6 +117,8 @@ def monitorear():
 
     evaluar_y_loguear("cpu", cpu, THRESHOLDS["cpu"])
     evaluar_y_loguear("ram", memoria, THRESHOLDS["memoria"])
+    if memoria > THRESHOLDS["memoria"]:
+        loguear_etapas_memoria()
     evaluar_y_loguear("hdd", disco, THRESHOLDS["disco"])
     evaluar_y_loguear("procesos", procesos, THRESHOLDS["procesos"])
     evaluar_y_loguear("uptime", uptime, THRESHOLDS["uptime"])
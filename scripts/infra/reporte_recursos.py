@@ -0,0 +1,79 @@
+"""
+===========================================================================
+ Script: Reporte de recursos por job y etapa - LeanTech Trading
+===========================================================================
+
+Descripcion:
+------------
+Lee reports/summary/recursos.db (my_modules.recursos_job) y compara la
+ultima ejecucion de cada (job, etapa) con la mediana de sus ejecuciones
+anteriores: wall, CPU, pico de RSS y simbolos/s. Marca regresiones, las
+etapas en las que la memoria del host supero el umbral de
+monitor_ec2_status (65%) y el cambio de commit/estrategias respecto a la
+ejecucion anterior.
+
+Uso:
+----
+python reporte_recursos.py
+python reporte_recursos.py --job pipeline_diario --ventana 20 --tolerancia 0.3
+python reporte_recursos.py --csv /tmp/recursos.csv
+
+===========================================================================
+"""
+
+import sys
+import csv
+import argparse
+
+sys.path.append("/home/ubuntu/tr")
+
+from my_modules.recursos_job import reporte_baseline, UMBRAL_MEMORIA_HOST
+
+def formatear(valor, ratio=None):
+    if valor is None:
+        return "-"
+    texto = f"{valor:.1f}"
+    if ratio is not None:
+        texto += f" (x{ratio:.2f})"
+    return texto
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recursos por etapa vs baseline")
+    parser.add_argument("--job", default=None)
+    parser.add_argument("--ventana", type=int, default=10, help="Ejecuciones previas para la mediana")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Exceso sobre la mediana que cuenta como regresion")
+    parser.add_argument("--csv", default=None, help="Guarda el reporte en CSV")
+    args = parser.parse_args(argv)
+
+    reporte = reporte_baseline(args.job, args.ventana, args.tolerancia)
+    if not reporte:
+        print("Sin registros de recursos.")
+        return reporte
+
+    print(f"{'job':22} {'etapa':18} {'wall_s':>16} {'cpu_s':>16} {'pico_rss_mb':>18} {'simbolos_s':>16} {'host%':>6}  alertas")
+    for r in reporte:
+        alertas = list(r["regresiones"])
+        if r["supero_umbral"]:
+            alertas.append(f"host>={UMBRAL_MEMORIA_HOST}%")
+        print(
+            f"{r['job']:22} {r['etapa']:18} "
+            f"{formatear(r['wall_s'], r['wall_s_ratio']):>16} "
+            f"{formatear(r['cpu_s'], r['cpu_s_ratio']):>16} "
+            f"{formatear(r['pico_rss_mb'], r['pico_rss_mb_ratio']):>18} "
+            f"{formatear(r['simbolos_s'], r['simbolos_s_ratio']):>16} "
+            f"{formatear(r['pico_mem_host_pct']):>6}  {', '.join(alertas)}"
+        )
+        if r["regresiones"] and r["cambios"]:
+            print(f"{'':42}cambios: {r['cambios']}")
+
+    if args.csv:
+        columnas = [c for c in reporte[0] if c != "regresiones"] + ["regresiones"]
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columnas)
+            writer.writeheader()
+            for r in reporte:
+                writer.writerow(dict(r, regresiones=";".join(r["regresiones"])))
+    return reporte
+
+if __name__ == "__main__":
+    main()
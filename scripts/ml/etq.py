@@ -1,68 +1,49 @@
 # etq.py - Generar etiquetas ML a partir de señales heuristicas + retornos reales
 import os
+import sys
+import time
+import argparse
 import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append("/home/ec2-user/tr")
+from my_modules.calendario_trading import cargar_calendario
+from my_modules.cambios_ingesta import agregar_argumento, simbolos_a_procesar
+from my_modules.etiquetado import ESPEC_DEFECTO, etiquetar
+from my_modules.feature_store import guardar_etiquetas
 
 # === RUTAS ===
 BASE_DIR = "/home/ec2-user/tr"
-FEATURES_DIR = f"{BASE_DIR}/data/features"
 HISTORIC_DIR = f"{BASE_DIR}/data/historic"
 SENALES_DIR = f"{BASE_DIR}/reports/senales_heuristicas/diarias"
-OUTPUT_DIR = f"{BASE_DIR}/data/features_etiquetados"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+ETIQUETAS_DIR = f"{BASE_DIR}/data/features/etiquetas"
 
 # === PARAMETROS ===
-RETORNO_OBJETIVO = 0.02  # 2%
-DIAS_RETORNO = 3
-fecha_hoy = datetime.utcnow().strftime("%Y-%m-%d")
+# Horizonte: retorno a 3 sesiones > 2%; triple barrera: TP/SL/MAX_DIAS de gen_ordenes_v2
+ESPEC = dict(ESPEC_DEFECTO)
+CALENDARIO = cargar_calendario()
 
 # === FUNCIONES ===
-def calcular_retorno_futuro(df, dias):
-    return df["close"].shift(-dias) / df["close"] - 1
+def cargar_senales():
+    """Todas las senales heuristicas en un DataFrame (simbolo, fecha, signal, estrategia)."""
+    dfs = []
+    for archivo in Path(SENALES_DIR).glob("*.csv"):
+        df = pd.read_csv(archivo)
+        if not {"fecha", "signal"}.issubset(df.columns):
+            continue
+        dfs.append(df.assign(simbolo=archivo.name.split("_senales")[0].upper()))
+    if not dfs:
+        return pd.DataFrame(columns=["simbolo", "fecha", "signal"])
+    return pd.concat(dfs, ignore_index=True)
 
-def generar_etiquetas(symbol):
+def generar_etiquetas(symbol, df_senales):
     try:
-        path_feat = os.path.join(FEATURES_DIR, f"{symbol}_features.parquet")
-        path_hist = os.path.join(HISTORIC_DIR, f"{symbol}.parquet")
-        path_senales = os.path.join(SENALES_DIR, f"{symbol}_*.csv")
-
-        if not os.path.exists(path_feat) or not os.path.exists(path_hist):
+        df_hist = pd.read_parquet(os.path.join(HISTORIC_DIR, f"{symbol}.parquet"))
+        df_etq = etiquetar(df_hist, symbol, df_senales, ESPEC, CALENDARIO)
+        if df_etq is None:
             return None
-
-        df_feat = pd.read_parquet(path_feat)
-        df_hist = pd.read_parquet(path_hist)
-        df_hist["datetime"] = pd.to_datetime(df_hist["datetime"])
-        df_hist.set_index("datetime", inplace=True)
-
-        # Calcular retorno futuro en base a datos reales
-        df_feat["datetime"] = pd.to_datetime(df_feat["datetime"])
-        df_feat = df_feat.sort_values("datetime")
-        df_feat.set_index("datetime", inplace=True)
-        df_feat["retorno_futuro"] = calcular_retorno_futuro(df_feat, DIAS_RETORNO)
-
-        # Cargar senales heuristicas para ese simbolo
-        senales_files = [f for f in os.listdir(SENALES_DIR) if f.startswith(symbol) and f.endswith(".csv")]
-        df_feat["senal"] = "hold"
-
-        for file in senales_files:
-            df_senal = pd.read_csv(os.path.join(SENALES_DIR, file))
-            df_senal["fecha"] = pd.to_datetime(df_senal["fecha"])
-            df_senal = df_senal[df_senal["signal"] == "buy"]
-
-            for fecha in df_senal["fecha"]:
-                if fecha in df_feat.index:
-                    retorno = df_feat.loc[fecha, "retorno_futuro"]
-                    if isinstance(retorno, pd.Series):
-                        retorno = retorno.values[0]
-                    if retorno > RETORNO_OBJETIVO:
-                        df_feat.at[fecha, "senal"] = "buy"
-                    else:
-                        df_feat.at[fecha, "senal"] = "hold"
-
-        df_feat.reset_index(inplace=True)
-        df_feat.to_parquet(os.path.join(OUTPUT_DIR, f"{symbol}_etiquetado.parquet"), index=False)
+        guardar_etiquetas(symbol, df_etq, ESPEC, ETIQUETAS_DIR)
         return symbol
 
     except Exception as e:
@@ -70,11 +51,22 @@ def generar_etiquetas(symbol):
         return None
 
 # === PROCESAR TODOS LOS SIMBOLOS ===
-symbols = [f.replace("_features.parquet", "") for f in os.listdir(FEATURES_DIR) if f.endswith("_features.parquet")]
-total = 0
-for sym in symbols:
-    res = generar_etiquetas(sym)
-    if res:
-        total += 1
+def main():
+    args = agregar_argumento(argparse.ArgumentParser(description="Etiquetas ML (horizonte fijo y triple barrera)")).parse_args()
+    os.makedirs(ETIQUETAS_DIR, exist_ok=True)
+    inicio = time.perf_counter()
+
+    todos = [f.replace(".parquet", "").upper() for f in os.listdir(HISTORIC_DIR) if f.endswith(".parquet")]
+    symbols, modo = simbolos_a_procesar(todos, args.cambios)
+    df_senales = cargar_senales()
+    por_simbolo = {s: g for s, g in df_senales.groupby("simbolo")}
+
+    # Cada simbolo se etiqueta vectorizado; los hilos solapan la lectura/escritura de parquet
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+        resultados = pool.map(lambda s: generar_etiquetas(s, por_simbolo.get(s)), symbols)
+        total = sum(1 for r in resultados if r)
+
+    print(f"Etiquetas generadas para {total} simbolos (modo {modo}) en {time.perf_counter() - inicio:.1f}s")
 
-print(f"Etiquetas generadas para {total} simbolos")
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,23 @@
 import os
+import sys
+import argparse
 import pandas as pd
-import numpy as np
 from datetime import datetime
 from pathlib import Path
 
+sys.path.append("/home/ubuntu/tr")
+
+from my_modules.cambios_ingesta import agregar_argumento, simbolos_a_procesar
+from my_modules.perfilado import activar_perfilado, agregar_argumento_perfil
+from my_modules.feature_store import (
+    actualizar_simbolo, guardar_ultimas, lookback, nombres_features, ultima_guardada,
+)
+
 # === CONFIG ===
-HIST_DIR = "/home/ubuntu/tr/data/historic_reciente"
-OUTPUT_PATH = "/home/ubuntu/tr/data/features/features_dia.parquet"
+HIST_DIR = "/home/ubuntu/tr/data/historic"
+FEATURES_DIR = "/home/ubuntu/tr/data/features"
+OUTPUT_PATH = f"{FEATURES_DIR}/features_dia.parquet"
 LOG_PATH = f"/home/ubuntu/tr/logs/utils/fea_{datetime.now().date()}.log"
-N_FEATURES = 8
-
-# === FUNCIONES DE FEATURES ===
-def calcular_rsi(series, window=14):
-    delta = series.diff()
-    up = delta.clip(lower=0)
-    down = -delta.clip(upper=0)
-    ma_up = up.rolling(window).mean()
-    ma_down = down.rolling(window).mean()
-    rs = ma_up / ma_down
-    return 100 - (100 / (1 + rs))
 
 def log(msg):
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -29,59 +28,45 @@ def log(msg):
 
 # === MAIN ===
 def main():
-    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+    parser = agregar_argumento(argparse.ArgumentParser(description="Feature store: historico completo + features del dia"))
+    parser.add_argument("--recalcular", action="store_true", help="Recalcula el historico completo de cada simbolo")
+    args = agregar_argumento_perfil(parser).parse_args()
+    activar_perfilado("fea", args.profile)
+    os.makedirs(FEATURES_DIR, exist_ok=True)
     os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
 
-    archivos = sorted(Path(HIST_DIR).glob("*.parquet"))
-    filas = []
+    archivos = {a.stem.upper(): a for a in Path(HIST_DIR).glob("*.parquet")}
+    simbolos, modo = simbolos_a_procesar(archivos, args.cambios)
+    sin_ultimas = not os.path.exists(OUTPUT_PATH)
+    if modo == "incremental" and sin_ultimas:
+        simbolos, modo = sorted(archivos), "completo"
+    log(f"Modo {modo}: {len(simbolos)} simbolos a procesar ({len(nombres_features())} features, lookback {lookback()})")
+    ultimas = []
+    conteo = {}
 
-    for archivo in archivos:
-        simbolo = archivo.stem.upper()
+    for simbolo in simbolos:
         try:
-            df = pd.read_parquet(archivo)
-            df = df[df["fecha"].notna()]
-            df["fecha"] = pd.to_datetime(df["fecha"])
-            df = df.sort_values("fecha")
-
-            if len(df) < 60:
-                log(f"SKIP {simbolo}: menos de 60 filas")
+            resultado = actualizar_simbolo(simbolo, pd.read_parquet(archivos[simbolo]), FEATURES_DIR, completo=args.recalcular)
+            conteo[resultado["modo"]] = conteo.get(resultado["modo"], 0) + 1
+            if resultado["modo"] == "insuficiente":
+                log(f"SKIP {simbolo}: menos de {lookback()} filas")
                 continue
-
-            df["ma_5"] = df["close"].rolling(5).mean()
-            df["ma_20"] = df["close"].rolling(20).mean()
-            df["rsi_14"] = calcular_rsi(df["close"], 14)
-            df["pos_rango_60"] = (df["close"] - df["low"].rolling(60).min()) / (df["high"].rolling(60).max() - df["low"].rolling(60).min())
-            df["volatilidad_20"] = df["close"].rolling(20).std()
-            df["cambio_1d"] = df["close"].pct_change(1)
-            df["cambio_3d"] = df["close"].pct_change(3)
-
-            ultima = df.iloc[-1]
-
-            fila = {
-                "simbolo": simbolo,
-                "fecha": ultima["fecha"].date(),
-                "ma_5": ultima["ma_5"],
-                "ma_20": ultima["ma_20"],
-                "rsi_14": ultima["rsi_14"],
-                "pos_rango_60": ultima["pos_rango_60"],
-                "volatilidad_20": ultima["volatilidad_20"],
-                "cambio_1d": ultima["cambio_1d"],
-                "cambio_3d": ultima["cambio_3d"],
-                "volume": ultima["volume"]
-            }
-
-            filas.append(fila)
-            log(f"OK {simbolo}")
+            ultima = resultado["ultima"]
+            if ultima is None and sin_ultimas:
+                ultima = ultima_guardada(simbolo, FEATURES_DIR)
+            if ultima is not None:
+                ultimas.append(ultima)
+            log(f"OK {simbolo}: {resultado['modo']}, {resultado['filas_nuevas']} filas nuevas")
 
         except Exception as e:
             log(f"ERROR {simbolo}: {e}")
 
-    if filas:
-        df_final = pd.DataFrame(filas)
-        df_final.to_parquet(OUTPUT_PATH, index=False)
-        log(f"Archivo generado con {len(df_final)} simbolos y {N_FEATURES} features.")
+    log(f"Resumen: {conteo}")
+    df_final = guardar_ultimas(ultimas, OUTPUT_PATH)
+    if df_final is not None:
+        log(f"Archivo generado con {len(df_final)} simbolos y {len(nombres_features())} features.")
     else:
-        log("No se generaron datos.")
+        log("Sin fechas nuevas para features_dia.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,65 @@
+"""
+===========================================================================
+ Script: Busqueda de hiperparametros ML - LeanTech Trading
+===========================================================================
+
+Descripcion:
+------------
+Random search + successive halving (my_modules.busqueda_hiper) sobre el
+dataset point-in-time. Pensado para correr de noche en CPU: los ensayos
+se anotan en data/busquedas/ y relanzar el mismo comando reanuda la
+busqueda. El mejor modelo queda registrado en sombra; promoverlo con
+registro.py promover <id>.
+
+Uso:
+----
+python hiper.py xgboost                       # 27 configs, 3 rondas
+python hiper.py rf --configs 9 --cpus 8 --hilos 2
+python hiper.py xgboost --horas 7             # corta y se reanuda despues
+
+===========================================================================
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_DIR))
+
+from my_modules.busqueda_hiper import MODELOS, buscar
+from my_modules.dataset_ml import materializar_dataset
+from my_modules.feature_store import nombres_features
+from my_modules.perfilado import activar_perfilado, agregar_argumento_perfil
+
+TARGET_COLUMN = "senal"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busqueda de hiperparametros (successive halving)")
+    parser.add_argument("modelo", choices=sorted(MODELOS))
+    parser.add_argument("--desde", default=None)
+    parser.add_argument("--hasta", default=None, help="Corte: solo etiquetas conocidas en esta fecha")
+    parser.add_argument("--configs", type=int, default=27, help="Configuraciones aleatorias iniciales")
+    parser.add_argument("--eta", type=int, default=3, help="Factor de descarte y de aumento de recurso por ronda")
+    parser.add_argument("--rondas", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--cpus", type=int, default=os.cpu_count() or 1, help="Presupuesto total de cpus")
+    parser.add_argument("--hilos", type=int, default=1, help="Hilos por ensayo")
+    parser.add_argument("--horas", type=float, default=None, help="Limite de tiempo; se reanuda al relanzar")
+    parser.add_argument("--sin-registrar", action="store_true", help="Solo informa la mejor configuracion")
+    args = agregar_argumento_perfil(parser).parse_args(argv)
+    activar_perfilado("hiper", args.profile)
+
+    features = nombres_features()
+    ruta, _, huella = materializar_dataset(None, args.desde, args.hasta, features, etiquetas=[TARGET_COLUMN])
+    id_modelo, mejor = buscar(
+        args.modelo, ruta, features, TARGET_COLUMN, n_configs=args.configs, eta=args.eta, rondas=args.rondas,
+        semilla=args.semilla, cpus=args.cpus, hilos=args.hilos, limite_horas=args.horas,
+        registrar=not args.sin_registrar, huella_dataset=huella,
+    )
+    if id_modelo:
+        print(f"Registrado en sombra: {id_modelo} (python registro.py promover {id_modelo})")
+
+if __name__ == "__main__":
+    main()
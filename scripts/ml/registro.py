@@ -0,0 +1,81 @@
+"""
+===========================================================================
+ Script: Registro de modelos ML - LeanTech Trading
+===========================================================================
+
+Descripcion:
+------------
+Consulta y gestion de modelos/ml/registro.json (my_modules.registro_modelos).
+
+Uso:
+----
+python registro.py listar                    # activos y sombra
+python registro.py listar --todos
+python registro.py importar                  # registra los .pkl sueltos
+python registro.py estado <id> retirado      # activo | sombra | retirado
+python registro.py promover <id>             # activa y retira los que cubre
+python registro.py compilar                  # exporta a .npz los activos/sombra sin compilar
+python registro.py compilar <id>             # (re)exporta y verifica un modelo concreto
+
+===========================================================================
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_DIR))
+
+from my_modules.registro_modelos import ESTADOS, RegistroModelos
+
+def listar(registro, todos):
+    entradas = registro.modelos(ESTADOS if todos else ("activo", "sombra"))
+    for e in sorted(entradas, key=lambda e: (e["estado"], e["creado"])):
+        simbolos = "universal" if e["simbolos"] is None else ",".join(e["simbolos"][:5]) + ("..." if len(e["simbolos"]) > 5 else "")
+        metricas = " ".join(f"{k}={v}" for k, v in e["metricas"].items())
+        compilado = "npz" if e.get("compilado") else "-"
+        print(f"{e['estado']:<9} {e['id']:<48} {simbolos:<20} {compilado:<4} {e['creado']} {metricas}")
+    print(f"{len(entradas)} modelos")
+
+def compilar(registro, id_modelo):
+    ids = [id_modelo] if id_modelo else [e["id"] for e in registro.modelos(("activo", "sombra")) if not e.get("compilado")]
+    for i in ids:
+        try:
+            compilado = registro.compilar(i)
+        except Exception as ex:
+            compilado = None
+            print(f"{i}: error cargando el modelo: {ex}")
+        print(f"{i}: {'compilado, max_dif ' + str(compilado['max_dif']) if compilado else 'no exportable o no equivalente'}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Registro de modelos ML")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_listar = sub.add_parser("listar")
+    p_listar.add_argument("--todos", action="store_true", help="Incluye los retirados")
+    sub.add_parser("importar")
+    p_estado = sub.add_parser("estado")
+    p_estado.add_argument("id")
+    p_estado.add_argument("estado", choices=ESTADOS)
+    p_promover = sub.add_parser("promover")
+    p_promover.add_argument("id")
+    p_compilar = sub.add_parser("compilar")
+    p_compilar.add_argument("id", nargs="?", default=None)
+    args = parser.parse_args(argv)
+
+    registro = RegistroModelos()
+    if args.comando == "listar":
+        listar(registro, args.todos)
+    elif args.comando == "importar":
+        print(f"{registro.importar_legado()} modelos importados")
+    elif args.comando == "estado":
+        registro.cambiar_estado(args.id, args.estado)
+        print(f"{args.id} -> {args.estado}")
+    elif args.comando == "promover":
+        registro.promover(args.id)
+        print(f"{args.id} activo")
+    elif args.comando == "compilar":
+        compilar(registro, args.id)
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,94 @@
 import os
-import json
-import pandas as pd
+import sys
+import argparse
 import numpy as np
-import joblib
 from datetime import datetime
 
 BASE_DIR = "/home/ec2-user/tr"
-FEATURES_DIR = f"{BASE_DIR}/data/features"
-MODELOS_DIR = f"{BASE_DIR}/modelos/ml"
-OUTPUT_DIR = f"{BASE_DIR}/reports/senales_ml"
-STATUS_FILE = f"{BASE_DIR}/reports/summary/system_status.json"
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-fecha_hoy = datetime.utcnow().strftime("%Y-%m-%d")
-
-def guardar_estado(modulo, status, mensaje):
-    now_str = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    status_obj = {}
-    if os.path.exists(STATUS_FILE):
-        with open(STATUS_FILE, "r") as f:
-            status_obj = json.load(f)
-    status_obj[modulo] = {
-        "fecha": fecha_hoy,
-        "ultima_ejecucion": now_str,
-        "status": status,
-        "mensaje": mensaje
-    }
-    with open(STATUS_FILE, "w") as f:
-        json.dump(status_obj, f, indent=2)
-
-# Detectar modelos disponibles
-modelos = [f for f in os.listdir(MODELOS_DIR) if f.endswith(".pkl")]
-if not modelos:
-    print("No se encontraron modelos en:", MODELOS_DIR)
-    guardar_estado("senales_ml", "ERROR", "No se encontraron modelos")
-    exit(1)
-
-# Cargar features disponibles
-features_files = [f for f in os.listdir(FEATURES_DIR) if f.endswith("_features.parquet")]
-if not features_files:
-    print("No se encontraron features en:", FEATURES_DIR)
-    guardar_estado("senales_ml", "ERROR", "No se encontraron archivos de features")
-    exit(1)
+sys.path.append(BASE_DIR)
 
-exitos = 0
-errores = 0
+from my_modules.arboles_compilados import ArbolesCompilados
+from my_modules.estado_sistema import guardar_estado
+from my_modules.inferencia_ml import cargar_matriz, puntuar
+from my_modules.registro_modelos import RegistroModelos
+from my_modules.perfilado import activar_perfilado, agregar_argumento_perfil, perfilar
 
-# Aplicar cada modelo a todos los archivos de features
-for modelo_file in modelos:
-    modelo_path = os.path.join(MODELOS_DIR, modelo_file)
-    model_name = modelo_file.replace(".pkl", "")
-    print(f"Usando modelo: {model_name}")
-
-    output_model_dir = os.path.join(OUTPUT_DIR, model_name)
-    os.makedirs(output_model_dir, exist_ok=True)
+OUTPUT_DIR = f"{BASE_DIR}/reports/senales_ml"
 
+def modelos_enrutados(registro, entradas, matriz, compilados=True):
+    """
+    Carga (perezosa, cacheada) solo los modelos con algun simbolo presente y su mascara de filas.
+    Con compilados=True usa los arboles compilados (.npz) cuando existen.
+    """
+    presentes = set(np.unique(matriz.simbolo))
+    modelos, filas = {}, {}
+    for e in entradas:
+        if e["simbolos"] is not None:
+            relevantes = presentes.intersection(e["simbolos"])
+            if not relevantes:
+                continue
+            filas[e["id"]] = np.isin(matriz.simbolo, list(relevantes))
+        try:
+            modelos[e["id"]] = registro.cargar(e["id"], compilado=compilados)
+        except Exception as ex:
+            print(f"Error cargando modelo {e['id']}: {str(ex)}")
+    return modelos, filas
+
+def main():
+    parser = argparse.ArgumentParser(description="Senales ML con los modelos activos del registro")
+    parser.add_argument("--modo", choices=["diario", "historico"], default="diario",
+                        help="diario: ultima fila por simbolo; historico: toda la historia del feature store")
+    parser.add_argument("--desde", default=None, help="Modo historico: primera fecha a puntuar")
+    parser.add_argument("--sombra", action="store_true", help="Puntua tambien los modelos en sombra")
+    parser.add_argument("--original", action="store_true",
+                        help="Usa los modelos xgboost/sklearn aunque tengan version compilada")
+    args = agregar_argumento_perfil(parser).parse_args()
+    activar_perfilado("sml", args.profile)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    fecha_hoy = datetime.utcnow().strftime("%Y-%m-%d")
+
+    registro = RegistroModelos()
+    nuevos = registro.importar_legado()
+    if nuevos:
+        print(f"Registrados {nuevos} modelos .pkl sueltos de modelos/ml")
+    estados = ("activo", "sombra") if args.sombra else ("activo",)
+    entradas = registro.modelos(estados)
+    if not entradas:
+        print("No hay modelos activos en el registro")
+        guardar_estado("senales_ml", "ERROR", "No se encontraron modelos")
+        sys.exit(1)
+
+    # Features una sola vez para todos los modelos
     try:
-        modelo = joblib.load(modelo_path)
+        matriz = cargar_matriz(args.modo, desde=args.desde)
     except Exception as e:
-        print(f"Error cargando modelo {modelo_file}: {str(e)}")
-        errores += 1
-        continue
-
-    if not hasattr(modelo, "feature_names_in_"):
-        print(f"Modelo {modelo_file} no contiene metadata de features.")
-        errores += 1
-        continue
-
-    feature_names = list(modelo.feature_names_in_)
-
-    for feat_file in features_files:
-        try:
-            symbol = feat_file.replace("_features.parquet", "")
-            df = pd.read_parquet(os.path.join(FEATURES_DIR, feat_file))
-
-            if df.shape[0] < 10:
-                print(f"{symbol} muy pocos datos, omitido")
-                continue
-
-            df_numeric = df.select_dtypes(include=[np.number])
-            for col in feature_names:
-                if col not in df_numeric.columns:
-                    df_numeric[col] = np.nan
-            X = df_numeric[feature_names].bfill().ffill()
-
-            y_pred = modelo.predict(X)
-            df["pred_senal"] = np.where(y_pred == 1, "buy", "hold")
-            df["symbol"] = symbol
-
-            output_path = os.path.join(output_model_dir, f"{symbol}.csv")
-            df.to_csv(output_path, index=False)
-            print(f"Senales generadas: {symbol} con {len(df)} filas")
-            exitos += 1
-
-        except Exception as e:
-            print(f"Error en {symbol} con {modelo_file}: {str(e)}")
-            errores += 1
-
-# === Estado final ===
-if exitos > 0:
-    guardar_estado("senales_ml", "OK", f"{exitos} archivos generados correctamente")
-else:
-    guardar_estado("senales_ml", "ERROR", "No se genero ninguna senal")
+        print(f"Error cargando features ({args.modo}): {str(e)}")
+        guardar_estado("senales_ml", "ERROR", "No se encontraron features")
+        sys.exit(1)
+    print(f"Features cargadas: {len(matriz)} filas, {len(matriz.columnas)} columnas")
+
+    with perfilar("carga_modelos"):
+        modelos, filas = modelos_enrutados(registro, entradas, matriz, compilados=not args.original)
+    compilados = sum(isinstance(m, ArbolesCompilados) for m in modelos.values())
+    print(f"{len(modelos)} de {len(entradas)} modelos ({'/'.join(estados)}) con simbolos en las features, {compilados} compilados")
+    with perfilar("inferencia"):
+        df_senales = puntuar(matriz, modelos, filas)
+
+    if df_senales.empty:
+        guardar_estado("senales_ml", "ERROR", "No se genero ninguna senal")
+        return
+    df_senales["estado"] = df_senales["modelo"].map({e["id"]: e["estado"] for e in entradas})
+
+    nombre = f"senales_ml_{fecha_hoy}.parquet" if args.modo == "diario" else "senales_ml_historico.parquet"
+    output_path = os.path.join(OUTPUT_DIR, nombre)
+    tmp_path = output_path + ".tmp"
+    df_senales.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+
+    resumen = df_senales.groupby("modelo", observed=True)["pred_senal"].agg(filas="size", buys=lambda s: int((s == "buy").sum()))
+    for model_name, fila in resumen.iterrows():
+        print(f"Senales generadas: {model_name} con {fila['filas']} filas ({fila['buys']} buy)")
+    guardar_estado("senales_ml", "OK", f"{len(resumen)} modelos, {len(df_senales)} senales en {nombre}")
+
+if __name__ == "__main__":
+    main()
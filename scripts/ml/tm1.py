@@ -1,14 +1,19 @@
 import os
 import sys
+import time
+import argparse
+import multiprocessing
 import pandas as pd
-import joblib
 from xgboost import XGBClassifier
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from pathlib import Path
+
+sys.path.append("/home/ubuntu/tr")
+from my_modules.dataset_ml import construir_dataset, materializar_dataset
+from my_modules.entrenamiento_xgb import corte_temporal
+from my_modules.registro_modelos import RegistroModelos
 
 # === CONFIGURACION ===
-INPUT_FILE = "/home/ubuntu/tr/data/entrenamiento/features_training.parquet"
-OUTPUT_DIR = "/home/ubuntu/tr/modelos/ml"
 LOG_FILE = f"/home/ubuntu/tr/logs/ml/tm1_{datetime.now().date()}.log"
 TARGET_COLUMN = "senal"
 
@@ -21,9 +26,15 @@ PARAMS = {
     "colsample_bytree": 0.8,
     "random_state": 42,
     "use_label_encoder": False,
-    "eval_metric": "mlogloss"
+    "eval_metric": "logloss"  # objetivo binario buy/hold
 }
 
+# === LOTE ===
+MIN_FILAS = 20
+VALIDACION = 0.2  # ultimo tramo temporal de cada simbolo para las metricas (purgado, corte_temporal)
+REPORTES_DIR = "/home/ubuntu/tr/reports/ml"
+COLUMNAS_NO_FEATURE = [TARGET_COLUMN, "simbolo", "fecha", "fecha_features", "fecha_etiqueta"]
+
 # === LOG SIMPLE ===
 def log(msg):
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -32,41 +43,193 @@ def log(msg):
     with open(LOG_FILE, "a") as f:
         f.write(linea + "\n")
 
+# === ENTRENAMIENTO ===
+def separar(df):
+    X = df.drop(columns=COLUMNAS_NO_FEATURE, errors="ignore")
+    y = (df[TARGET_COLUMN] == "buy").astype(int)
+    return X, y
+
+def entrenar(X, y, n_jobs=None):
+    model = XGBClassifier(**PARAMS, n_jobs=n_jobs)
+    model.fit(X, y)
+    return model
+
+def metricas_validacion(df, n_jobs=None):
+    """
+    Entrena con el tramo inicial y mide en el ultimo VALIDACION de fechas,
+    purgando las filas cuya etiqueta se conoce dentro de la validacion.
+    """
+    from sklearn.metrics import accuracy_score, precision_score, roc_auc_score
+    X, y = separar(df)
+    train, val = corte_temporal(df, frac_test=VALIDACION)
+    y_train, y_val = y[train], y[val]
+    metricas = {"filas": len(X), "positivos": int(y.sum()), "filas_train_val": int(train.sum())}
+    if y_train.nunique() < 2 or len(y_val) == 0:
+        return metricas
+    prob = entrenar(X[train], y_train, n_jobs).predict_proba(X[val])[:, 1]
+    pred = (prob > 0.5).astype(int)
+    metricas.update(
+        accuracy_val=round(float(accuracy_score(y_val, pred)), 4),
+        precision_buy_val=round(float(precision_score(y_val, pred, zero_division=0)), 4),
+        auc_val=round(float(roc_auc_score(y_val, prob)), 4) if y_val.nunique() == 2 else None,
+    )
+    return metricas
+
+# Dataset compartido con los procesos hijos por fork (sin serializar particiones)
+_DATASET = None
+
+def entrenar_particion(simbolo, inicio, fin, n_jobs):
+    t0 = time.perf_counter()
+    df = _DATASET.iloc[inicio:fin]
+    X, y = separar(df)
+    if len(X) < MIN_FILAS:
+        return simbolo, None, {"filas": len(X)}, "datos insuficientes", round(time.perf_counter() - t0, 2)
+    if y.nunique() < 2:
+        return simbolo, None, {"filas": len(X)}, "una sola clase", round(time.perf_counter() - t0, 2)
+    metricas = metricas_validacion(df, n_jobs)
+    model = entrenar(X, y, n_jobs)
+    return simbolo, model, metricas, "OK", round(time.perf_counter() - t0, 2)
+
+def entrenar_lote(df, procesos, hilos, promover=True):
+    """Un modelo por simbolo en un pool de `procesos` procesos con `hilos` hilos de xgboost cada uno."""
+    global _DATASET
+    _DATASET = df.sort_values(["simbolo", "fecha"]).reset_index(drop=True)
+    limites = _DATASET.groupby("simbolo", sort=False).indices
+    particiones = [(s, int(idx[0]), int(idx[-1]) + 1) for s, idx in limites.items()]
+    log(f"Lote: {len(particiones)} simbolos, {procesos} procesos x {hilos} hilos")
+
+    # Artefactos (joblib + compilado) guardados a medida que terminan; el flock solo para el manifiesto
+    registro = RegistroModelos()
+    resultados = []
+    contexto = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+        futuros = [pool.submit(entrenar_particion, s, a, b, hilos) for s, a, b in particiones]
+        for futuro in as_completed(futuros):
+            try:
+                simbolo, model, metricas, estado, segundos = futuro.result()
+            except Exception as e:
+                log(f"ERROR en un proceso de entrenamiento: {e}")
+                continue
+            log(f"{simbolo}: {estado} en {segundos}s {metricas}")
+            entrada = None
+            if model is not None:
+                entrada = registro.preparar(
+                    model, f"xgboost_{simbolo.lower()}", list(model.feature_names_in_), simbolos=[simbolo],
+                    objetivo=TARGET_COLUMN, dataset=df.attrs.get("clave_dataset"),
+                    huella_dataset=df.attrs.get("huella_dataset"),
+                    metricas=metricas, parametros=PARAMS, estado="activo" if promover else "sombra",
+                )
+            resultados.append((simbolo, entrada, metricas, estado, segundos))
+
+    filas = []
+    with registro.lote():
+        for simbolo, entrada, metricas, estado, segundos in resultados:
+            id_modelo = None
+            if entrada is not None:
+                id_modelo = registro.anadir(entrada)
+                if promover:
+                    registro.promover(id_modelo)
+            filas.append({"simbolo": simbolo, "estado": estado, "segundos": segundos, "id_modelo": id_modelo, **metricas})
+    _DATASET = None
+    return pd.DataFrame(filas)
+
+def entrenar_global_externo(args):
+    """Modelo universal fuera de memoria: el dataset se lee por lotes desde el parquet materializado."""
+    from my_modules.entrenamiento_xgb import entrenar_externo
+    from my_modules.feature_store import nombres_features
+    features = nombres_features()
+    ruta, clave, huella = materializar_dataset(None, args.desde, args.hasta, features, etiquetas=[TARGET_COLUMN],
+                                       forzar=args.reconstruir, log=log)
+    params = {k: PARAMS[k] for k in ("max_depth", "subsample", "colsample_bytree")}
+    params.update(eta=PARAMS["learning_rate"], seed=PARAMS["random_state"])
+    booster, reporte = entrenar_externo(ruta, features, TARGET_COLUMN, params, n_folds=args.folds,
+                                        embargo_dias=args.embargo, presupuesto_mb=args.memoria_mb, log=log)
+    metricas = {k: v for k, v in reporte.items() if k not in ("folds", "params")}
+    registro = RegistroModelos()
+    id_modelo = registro.registrar(
+        booster, "xgboost", features, objetivo=TARGET_COLUMN, dataset=clave, huella_dataset=huella,
+        metricas=metricas, parametros=reporte["params"], estado="sombra" if args.sin_promover else "activo",
+    )
+    if not args.sin_promover:
+        registro.promover(id_modelo)
+    log(f"Modelo global registrado: {id_modelo}")
+
 # === FLUJO PRINCIPAL ===
 def main():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
     os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
 
-    simbolo_filtrado = sys.argv[1].upper() if len(sys.argv) > 1 else None
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Entrena XGBoost sobre el dataset point-in-time")
+    parser.add_argument("simbolo", nargs="?", default=None, help="Entrena solo para este simbolo")
+    parser.add_argument("--desde", default=None)
+    parser.add_argument("--hasta", default=None, help="Corte: solo etiquetas conocidas en esta fecha")
+    parser.add_argument("--reconstruir", action="store_true", help="Ignora el dataset cacheado")
+    parser.add_argument("--lote", action="store_true", help="Un modelo por simbolo, en paralelo")
+    parser.add_argument("--procesos", type=int, default=max(1, cpus // 2), help="Modo lote: procesos de entrenamiento")
+    parser.add_argument("--hilos", type=int, default=None, help="Modo lote: hilos de xgboost por proceso (defecto cpus/procesos)")
+    parser.add_argument("--sin-promover", action="store_true", help="Lote/externo: registra los modelos en sombra")
+    parser.add_argument("--externo", action="store_true", help="Modelo global fuera de memoria con CV purgada")
+    parser.add_argument("--folds", type=int, default=5, help="Modo externo: folds temporales")
+    parser.add_argument("--embargo", type=int, default=10, help="Modo externo: dias de embargo tras cada fold")
+    parser.add_argument("--memoria-mb", type=int, default=4000, help="Modo externo: presupuesto para folds en paralelo")
+    args = parser.parse_args()
+    simbolo_filtrado = args.simbolo.upper() if args.simbolo else None
+
+    if args.externo:
+        try:
+            entrenar_global_externo(args)
+        except Exception as e:
+            log(f"ERROR en entrenamiento externo: {e}")
+        return
 
     try:
-        df = pd.read_parquet(INPUT_FILE)
-        log(f"Archivo cargado: {df.shape[0]} filas")
+        df = construir_dataset([simbolo_filtrado] if simbolo_filtrado else None, args.desde, args.hasta,
+                               etiquetas=[TARGET_COLUMN], forzar=args.reconstruir, log=log)
+        log(f"Dataset cargado: {df.shape[0]} filas")
     except Exception as e:
-        log(f"ERROR al cargar {INPUT_FILE}: {e}")
+        log(f"ERROR al construir el dataset: {e}")
         return
 
-    if simbolo_filtrado:
-        df = df[df["simbolo"] == simbolo_filtrado]
-        log(f"Entrenando modelo SOLO para simbolo: {simbolo_filtrado}")
-
     if TARGET_COLUMN not in df.columns:
         log(f"ERROR: columna '{TARGET_COLUMN}' no encontrada")
         return
 
-    if len(df) < 20:
+    if args.lote:
+        # Sin sobresuscripcion: procesos x hilos <= cpus
+        hilos = args.hilos or max(1, cpus // args.procesos)
+        t0 = time.perf_counter()
+        reporte = entrenar_lote(df, args.procesos, hilos, promover=not args.sin_promover)
+        if reporte.empty:
+            log("Lote sin modelos entrenados")
+            return
+        os.makedirs(REPORTES_DIR, exist_ok=True)
+        reporte_path = f"{REPORTES_DIR}/tm1_lote_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+        reporte.sort_values("simbolo").to_csv(reporte_path, index=False)
+        ok = reporte[reporte["estado"] == "OK"]
+        log(f"Lote terminado en {time.perf_counter() - t0:.1f}s: {len(ok)} de {len(reporte)} simbolos con modelo "
+            f"(mediana {ok['segundos'].median() if len(ok) else 0:.2f}s por simbolo); reporte en {reporte_path}")
+        return
+
+    if simbolo_filtrado:
+        log(f"Entrenando modelo SOLO para simbolo: {simbolo_filtrado}")
+
+    if len(df) < MIN_FILAS:
         log(f"ERROR: datos insuficientes para entrenamiento ({len(df)} filas)")
         return
 
     try:
-        X = df.drop(columns=[TARGET_COLUMN, "simbolo", "fecha"], errors="ignore")
-        y = df[TARGET_COLUMN]
-        model = XGBClassifier(**PARAMS)
-        model.fit(X, y)
-        nombre = f"xgboost_{simbolo_filtrado.lower()}_" if simbolo_filtrado else "xgboost_"
-        nombre += datetime.now().strftime("%Y%m%d_%H%M") + ".pkl"
-        joblib.dump(model, f"{OUTPUT_DIR}/{nombre}")
-        log(f"Modelo guardado como: {nombre}")
+        X, y = separar(df)
+        model = entrenar(X, y)
+        nombre = f"xgboost_{simbolo_filtrado.lower()}" if simbolo_filtrado else "xgboost"
+        registro = RegistroModelos()
+        id_modelo = registro.registrar(
+            model, nombre, list(X.columns), simbolos=[simbolo_filtrado] if simbolo_filtrado else None,
+            objetivo=TARGET_COLUMN, dataset=df.attrs.get("clave_dataset"),
+            huella_dataset=df.attrs.get("huella_dataset"),
+            metricas={"filas": len(df), "positivos": int(y.sum())}, parametros=PARAMS,
+        )
+        registro.promover(id_modelo)
+        log(f"Modelo registrado y activo: {id_modelo}")
     except Exception as e:
         log(f"ERROR durante entrenamiento: {e}")
 
@@ -1,28 +1,20 @@
-import os
-import pandas as pd
-import numpy as np
-import joblib
-from datetime import datetime
-from sklearn.model_selection import train_test_split
+import sys
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
 
 BASE_DIR = "/home/ec2-user/tr"
-FEATURES_DIR = f"{BASE_DIR}/data/features"
-MODELOS_DIR = f"{BASE_DIR}/modelos/ml"
+sys.path.append(BASE_DIR)
 
-os.makedirs(MODELOS_DIR, exist_ok=True)
+from my_modules.dataset_ml import construir_dataset
+from my_modules.entrenamiento_xgb import corte_temporal
+from my_modules.feature_store import nombres_features
+from my_modules.registro_modelos import RegistroModelos
 
 def cargar_datos():
-    dfs = []
-    for fname in os.listdir(FEATURES_DIR):
-        if fname.endswith("_features.parquet"):
-            df = pd.read_parquet(os.path.join(FEATURES_DIR, fname))
-            if "senal" in df.columns:
-                dfs.append(df)
-    if not dfs:
-        raise ValueError("No se encontraron datos con la columna 'senal'")
-    df_all = pd.concat(dfs, ignore_index=True)
+    # Union point-in-time de features y etiquetas; filas con features incompletas fuera (sin bfill)
+    df_all = construir_dataset(etiquetas=["senal"], dropna=True)
+    if df_all.empty:
+        raise ValueError("Dataset vacio: faltan features o etiquetas")
     return df_all
 
 def preparar_datos(df):
@@ -31,13 +23,15 @@ def preparar_datos(df):
     print("Total registros:", len(df))
     print("Target positivos (buy):", df["target"].sum())
 
-    # Seleccionar solo columnas numericas utiles
-    feature_cols = df.select_dtypes(include=[np.number]).columns.difference(["target"])
-    print("Features usados:", list(feature_cols))
+    feature_cols = nombres_features()
+    print("Features usados:", feature_cols)
 
-    X = df[feature_cols].fillna(method="bfill").fillna(method="ffill")
+    # Corte temporal purgado: el test es el ultimo 20% de fechas y el train no
+    # incluye filas cuya etiqueta se conoce ya dentro del test
+    train, test = corte_temporal(df, frac_test=0.2)
+    X = df[feature_cols]
     y = df["target"]
-    return train_test_split(X, y, test_size=0.2, random_state=42)
+    return X[train], X[test], y[train], y[test]
 
 def entrenar_modelo(X_train, y_train):
     print("Entrenando modelo con", len(X_train), "filas...")
@@ -56,10 +50,20 @@ def main():
         print("\nREPORTE DE CLASIFICACION")
         print(classification_report(y_test, y_pred))
 
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M")
-        model_path = os.path.join(MODELOS_DIR, f"rf_debug_buy_{timestamp}.pkl")
-        joblib.dump(modelo, model_path)
-        print("Modelo guardado en:", model_path)
+        reporte = classification_report(y_test, y_pred, output_dict=True, zero_division=0)
+        metricas = {
+            "accuracy": round(reporte["accuracy"], 4),
+            "precision_buy": round(reporte.get("1", {}).get("precision", 0.0), 4),
+            "recall_buy": round(reporte.get("1", {}).get("recall", 0.0), 4),
+            "filas_test": len(y_test),
+        }
+        # Modelo de depuracion: queda en sombra, sml.py solo lo puntua con --sombra
+        id_modelo = RegistroModelos().registrar(
+            modelo, "rf_debug_buy", list(X_train.columns), objetivo="senal",
+            dataset=df.attrs.get("clave_dataset"), huella_dataset=df.attrs.get("huella_dataset"),
+            metricas=metricas, estado="sombra",
+        )
+        print("Modelo registrado:", id_modelo)
 
     except Exception as e:
         print("ERROR en entrenamiento:", str(e))
@@ -2,7 +2,6 @@
 import os
 import sys
 import shutil
-import json
 import pandas as pd
 import logging
 import watchtower
@@ -16,85 +15,93 @@ BASE_DIR = "//home/ubuntu/tr"
 sys.path.append(BASE_DIR)
 
 from my_modules.email_sender import enviar_email
+from my_modules.estado_sistema import guardar_estado
 
 # === RUTAS ===
 SENALES_DIR = f"{BASE_DIR}/reports/senales_heuristicas/diarias"
 HISTORIC_DIR = f"{BASE_DIR}/data/historic"
 LOG_DIR = f"{BASE_DIR}/logs/alerts"
-SUMMARY_PATH = f"{BASE_DIR}/reports/summary/system_status.json"
 DESTINATARIO = os.getenv("EMAIL_TRADING")
 LOG_GROUP = "EC2AlertasSenales"
 fecha_hoy = datetime.utcnow().strftime("%Y-%m-%d")
 
 # === LOGGING ===
-os.makedirs(LOG_DIR, exist_ok=True)
-log_file = os.path.join(LOG_DIR, f"alertas_{fecha_hoy}.csv")
-log_persistente = os.path.join(LOG_DIR, "alertas.log")
-
 logger = logging.getLogger("AlertasSenales")
-logger.setLevel(logging.INFO)
-formatter = logging.Formatter("%(asctime)s,alertas,%(levelname)s,%(message)s", datefmt="%Y-%m-%d %H:%M:%S")
-
-for handler_path in [log_file, log_persistente]:
-    fh = logging.FileHandler(handler_path)
-    fh.setFormatter(formatter)
-    logger.addHandler(fh)
-
-cw_handler = watchtower.CloudWatchLogHandler(log_group=LOG_GROUP)
-cw_handler.setFormatter(formatter)
-logger.addHandler(cw_handler)
-
-# === FUNCION DE ESTADO ===
-def guardar_estado(modulo, status, mensaje):
-    now_str = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    status_obj = {}
-    if os.path.exists(SUMMARY_PATH):
-        with open(SUMMARY_PATH, "r") as f:
-            status_obj = json.load(f)
-    status_obj[modulo] = {
-        "fecha": fecha_hoy,
-        "ultima_ejecucion": now_str,
-        "status": status,
-        "mensaje": mensaje
-    }
-    with open(SUMMARY_PATH, "w") as f:
-        json.dump(status_obj, f, indent=2)
+
+def configurar_logging():
+    if logger.handlers:
+        return logger
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_file = os.path.join(LOG_DIR, f"alertas_{fecha_hoy}.csv")
+    log_persistente = os.path.join(LOG_DIR, "alertas.log")
+
+    logger.setLevel(logging.INFO)
+    formatter = logging.Formatter("%(asctime)s,alertas,%(levelname)s,%(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+
+    for handler_path in [log_file, log_persistente]:
+        fh = logging.FileHandler(handler_path)
+        fh.setFormatter(formatter)
+        logger.addHandler(fh)
+
+    cw_handler = watchtower.CloudWatchLogHandler(log_group=LOG_GROUP)
+    cw_handler.setFormatter(formatter)
+    logger.addHandler(cw_handler)
+    return logger
+
+# === CARGAR SENALES ===
+def cargar_senales_dir():
+    dfs = []
+    for archivo in os.listdir(SENALES_DIR):
+        if not archivo.endswith(".csv"):
+            continue
+        try:
+            df = pd.read_csv(os.path.join(SENALES_DIR, archivo))
+            if "simbolo" not in df.columns:
+                df["simbolo"] = archivo.split("_")[0]
+            dfs.append(df)
+        except Exception as e:
+            logger.error(f"Error procesando {archivo}: {str(e)}")
+    return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame(columns=["fecha", "signal", "estrategia", "simbolo"])
+
+def cierre_en_fecha(symbol, fecha, precios=None):
+    """Cierre del simbolo en `fecha`; usa el frame en memoria si la etapa anterior lo entrega."""
+    df_hist = (precios or {}).get(symbol)
+    if df_hist is None:
+        ruta_hist = os.path.join(HISTORIC_DIR, f"{symbol}.parquet")
+        if not os.path.exists(ruta_hist):
+            return None
+        df_hist = pd.read_parquet(ruta_hist)
+    col_fecha = "fecha" if "fecha" in df_hist.columns else "datetime"
+    fila_hist = df_hist[pd.to_datetime(df_hist[col_fecha]).dt.date == pd.to_datetime(fecha).date()]
+    if fila_hist.empty:
+        return None
+    return round(fila_hist["close"].iloc[-1], 2)
 
 # === AGRUPAR SENALES ===
-senales = defaultdict(list)
-
-for archivo in os.listdir(SENALES_DIR):
-    if not archivo.endswith(".csv"):
-        continue
-    try:
-        symbol = archivo.split("_")[0]
-        estrategia = "_".join(archivo.split("_")[1:-1])
-        ruta = os.path.join(SENALES_DIR, archivo)
-        df = pd.read_csv(ruta)
-
-        if "fecha" in df.columns and "signal" in df.columns:
+def agrupar_senales(df_senales, precios=None):
+    """
+    Agrupa por (simbolo, signal) las estrategias que coinciden en la sesion actual
+    (ultima fecha del conjunto). Los CSV que shu_dia incremental no regenero conservan
+    senales de dias anteriores y quedan fuera.
+    """
+    senales = defaultdict(list)
+    if df_senales.empty or not {"fecha", "signal", "simbolo"}.issubset(df_senales.columns):
+        return senales
+    fechas = pd.to_datetime(df_senales["fecha"], errors="coerce").dt.normalize()
+    df_senales = df_senales[fechas == fechas.max()]
+    for symbol, df in df_senales.groupby("simbolo"):
+        try:
             fecha_max = df["fecha"].max()
-            fila = df[df["fecha"] == fecha_max]
-            if fila.empty:
-                continue
-            signal = fila.iloc[-1]["signal"]
-
-            close = None
-            ruta_hist = os.path.join(HISTORIC_DIR, f"{symbol}.parquet")
-            if os.path.exists(ruta_hist):
-                df_hist = pd.read_parquet(ruta_hist)
-                df_hist["datetime"] = pd.to_datetime(df_hist["datetime"])
-                df_hist.set_index("datetime", inplace=True)
-                fila_hist = df_hist[df_hist.index.date == pd.to_datetime(fecha_max).date()]
-                if not fila_hist.empty:
-                    close = round(fila_hist["close"].iloc[-1], 2)
-
-            senales[(symbol, signal)].append((estrategia, fecha_max, close))
-    except Exception as e:
-        logger.error(f"Error procesando {archivo}: {str(e)}")
+            filas = df[df["fecha"] == fecha_max]
+            close = cierre_en_fecha(symbol, fecha_max, precios)
+            for _, fila in filas.iterrows():
+                senales[(symbol, fila["signal"])].append((fila.get("estrategia", "-"), fecha_max, close))
+        except Exception as e:
+            logger.error(f"Error procesando {symbol}: {str(e)}")
+    return senales
 
 # === FILTRAR SENALES CON MULTIPLES ESTRATEGIAS ===
-def preparar_tabla(signal_type):
+def preparar_tabla(senales, signal_type):
     filas = []
     for (symbol, signal), estrategias in senales.items():
         if signal != signal_type or len(estrategias) < 2:
@@ -114,10 +121,11 @@ def preparar_tabla(signal_type):
     tabla = df.to_html(index=False, border=1, justify="center", classes="tabla")
     return f"""<h3>{len(filas)} simbolos con 2 o mas estrategias de {signal_type.upper()} ({fecha_hoy}):</h3>{tabla}""", len(filas)
 
-html_buy, n_buy = preparar_tabla("buy")
-html_sell, n_sell = preparar_tabla("sell")
+def construir_html(senales):
+    html_buy, n_buy = preparar_tabla(senales, "buy")
+    html_sell, n_sell = preparar_tabla(senales, "sell")
 
-html_completo = f"""<html>
+    html_completo = f"""<html>
 <head>
 <style>
 h3 {{ font-family: Arial; }}
@@ -143,23 +151,41 @@ table.tabla th {{
 </body>
 </html>
 """
-
-asunto = f"Senales Coincidentes por Estrategia - {fecha_hoy}"
+    return html_completo, n_buy, n_sell
 
 # === ENVIAR EMAIL ===
-if DESTINATARIO:
-    exito = enviar_email(asunto=asunto, cuerpo=html_completo, destinatario=DESTINATARIO, html=True)
-    if exito:
-        logger.info("Correo enviado exitosamente.")
-        total = n_buy + n_sell
-        guardar_estado("alertas", "OK", f"{total} alertas detectadas y enviadas")
-    else:
-        logger.error("Fallo el envio del correo.")
-        guardar_estado("alertas", "ERROR", "Fallo envio de correo")
-else:
+def enviar_alertas(html_completo, n_buy, n_sell, inicio=None):
+    asunto = f"Senales Coincidentes por Estrategia - {fecha_hoy}"
+    if DESTINATARIO:
+        exito = enviar_email(asunto=asunto, cuerpo=html_completo, destinatario=DESTINATARIO, html=True)
+        if exito:
+            logger.info("Correo enviado exitosamente.")
+            total = n_buy + n_sell
+            guardar_estado("alertas", "OK", f"{total} alertas detectadas y enviadas", inicio=inicio)
+        else:
+            logger.error("Fallo el envio del correo.")
+            guardar_estado("alertas", "ERROR", "Fallo envio de correo", inicio=inicio)
+        return exito
     logger.error("EMAIL_TRADING no esta definido.")
-    guardar_estado("alertas", "ERROR", "EMAIL_TRADING no definido")
-    
+    guardar_estado("alertas", "ERROR", "EMAIL_TRADING no definido", inicio=inicio)
+    return False
+
+def ejecutar(df_senales=None, precios=None):
+    """Agrupa senales (de memoria o de SENALES_DIR), arma el HTML y envia el correo. "enviado" indica si salio."""
+    configurar_logging()
+    inicio = datetime.now()
+    if df_senales is None:
+        df_senales = cargar_senales_dir()
+    senales = agrupar_senales(df_senales, precios)
+    html_completo, n_buy, n_sell = construir_html(senales)
+    enviado = enviar_alertas(html_completo, n_buy, n_sell, inicio=inicio)
+    return {"buy": n_buy, "sell": n_sell, "enviado": bool(enviado)}
+
+def main():
+    ejecutar()
+
+if __name__ == "__main__":
+    main()
 
 
 # HIST_DIR = f"{BASE_DIR}/reports/senales_heuristicas/historicas"
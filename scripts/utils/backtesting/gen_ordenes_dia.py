@@ -21,21 +21,23 @@ def log(msg):
     with open(LOG, "a") as f:
         f.write(linea + "\n")
 
-def procesar_ordenes(df_senales, simbolo):
+def procesar_ordenes(df_senales, simbolo, df_precio=None):
     try:
-        df_precio = pd.read_parquet(f"{CARPETA_HIST}/{simbolo}.parquet")
+        if df_precio is None:
+            df_precio = pd.read_parquet(f"{CARPETA_HIST}/{simbolo}.parquet")
+        df_precio = df_precio.copy()
         df_precio["fecha"] = pd.to_datetime(df_precio["fecha"])
         df_precio = df_precio.sort_values("fecha").reset_index(drop=True)
 
         df_simbolo = df_senales[df_senales["simbolo"] == simbolo]
-        df_simbolo = df_simbolo[df_simbolo["signal"].isin(["buy", "sell"])]
+        df_simbolo = df_simbolo[df_simbolo["senal"].isin(["buy", "sell"])]
 
         ordenes = []
 
         for _, fila in df_simbolo.iterrows():
             fecha = pd.to_datetime(fila["fecha"])
             estrategia = fila["estrategia"]
-            senal = fila["signal"]
+            senal = fila["senal"]
 
             if fecha not in df_precio["fecha"].values:
                 continue
@@ -74,28 +76,22 @@ def procesar_ordenes(df_senales, simbolo):
         log(f"{simbolo} ERROR: {e}")
         return []
 
-# === MAIN ===
-def main():
-    os.makedirs(os.path.dirname(LOG), exist_ok=True)
-
-    if not os.path.exists(ARCHIVO_SENALES):
-        log(f"ERROR: archivo de señales no encontrado: {ARCHIVO_SENALES}")
-        return
-
-    df_senales = pd.read_csv(ARCHIVO_SENALES)
+def generar_ordenes(df_senales, precios=None):
+    """Simula ordenes para todas las senales; `precios` (dict simbolo -> DataFrame) evita releer parquet."""
+    precios = precios or {}
     if "signal" in df_senales.columns:
-        df_senales.rename(columns={"signal": "senal"}, inplace=True)
+        df_senales = df_senales.rename(columns={"signal": "senal"})
 
     ordenes_totales = []
-
     for simbolo in df_senales["simbolo"].unique():
-        ordenes = procesar_ordenes(df_senales, simbolo)
+        ordenes = procesar_ordenes(df_senales, simbolo, precios.get(simbolo))
         if ordenes:
             ordenes_totales.extend(ordenes)
             log(f"OK {simbolo}: {len(ordenes)} ordenes")
+    return pd.DataFrame(ordenes_totales)
 
-    if ordenes_totales:
-        df_out = pd.DataFrame(ordenes_totales)
+def guardar_ordenes(df_out):
+    if not df_out.empty:
         if os.path.exists(ARCHIVO_SALIDA):
             df_existente = pd.read_csv(ARCHIVO_SALIDA)
             df_final = pd.concat([df_existente, df_out], ignore_index=True)
@@ -106,5 +102,16 @@ def main():
     else:
         log("No se generaron ordenes.")
 
+# === MAIN ===
+def main():
+    os.makedirs(os.path.dirname(LOG), exist_ok=True)
+
+    if not os.path.exists(ARCHIVO_SENALES):
+        log(f"ERROR: archivo de señales no encontrado: {ARCHIVO_SENALES}")
+        return
+
+    df_senales = pd.read_csv(ARCHIVO_SENALES)
+    guardar_ordenes(generar_ordenes(df_senales))
+
 if __name__ == "__main__":
     main()
@@ -14,22 +14,31 @@ Mejoras:
 - Incluye campo "comision" y "tipo_salida"
 - Usa open/high/low/close para evaluar ejecución realista
 - Validaciones robustas para columnas y errores silenciosos
+- --profile: perfila la ejecucion con cProfile (reports/profiling/gen_ordenes_v2)
 
 =========================================================================== 
 """
 
 import os
+import sys
+import argparse
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+sys.path.append("/home/ubuntu/tr")
+from my_modules.calendario_trading import cargar_calendario
+from my_modules.perfilado import activar_perfilado, agregar_argumento_perfil
+
 TP = 0.03  # 2%
 SL = 0.01  # 1%
-MAX_DIAS = 5
+MAX_DIAS = 5  # sesiones de mercado desde la entrada
 COMISION = 0.6  # USD fijos por orden
 LOG_FOLDER = "/home/ubuntu/tr/logs/ordenes"
 SENALES_FOLDER = "/home/ubuntu/tr/reports/senales_heuristicas/historicas"
 HIST_FOLDER = "/home/ubuntu/tr/data/historic"
 SALIDA_FOLDER = "/home/ubuntu/tr/reports/ordenes"
+CALENDARIO = cargar_calendario()
 os.makedirs(SALIDA_FOLDER, exist_ok=True)
 os.makedirs(LOG_FOLDER, exist_ok=True)
 
@@ -56,6 +65,9 @@ def procesar_archivo(nombre_archivo):
 
         df_prices["fecha"] = pd.to_datetime(df_prices["fecha"])
         df_prices = df_prices.sort_values("fecha").reset_index(drop=True)
+        fechas_precio = df_prices["fecha"].values.astype("datetime64[D]")
+        # Ultima barra dentro de MAX_DIAS sesiones de cada posible entrada: un hueco no alarga la operacion
+        limites = np.searchsorted(fechas_precio, CALENDARIO.offset(fechas_precio, MAX_DIAS), side="right") - 1
         ordenes = []
 
         for _, fila in df_senales.iterrows():
@@ -72,8 +84,9 @@ def procesar_archivo(nombre_archivo):
             salida_idx = None
             tipo_salida = "TIMEOUT"
 
+            limite = limites[idx_entrada]
             for i in range(1, MAX_DIAS + 1):
-                if idx_entrada + i >= len(df_prices):
+                if idx_entrada + i >= len(df_prices) or idx_entrada + i > limite:
                     break
 
                 fila_dia = df_prices.loc[idx_entrada + i]
@@ -101,9 +114,12 @@ def procesar_archivo(nombre_archivo):
             if salida_idx:
                 fila_salida = df_prices.loc[salida_idx]
             else:
-                fila_salida = df_prices.iloc[min(idx_entrada + MAX_DIAS, len(df_prices) - 1)]
+                fila_salida = df_prices.iloc[max(min(idx_entrada + MAX_DIAS, limite, len(df_prices) - 1), idx_entrada)]
                 precio_salida = fila_salida["close"]
 
+            sesiones = int(CALENDARIO.sessions_between(fecha_entrada, fila_salida["fecha"])[0])
+            barras = int(fila_salida.name) - idx[0]
+
             orden = {
                 "id_orden": f"{simbolo}_{fecha_entrada.date()}_{estrategia}_{signal}",
                 "fecha_entrada": fecha_entrada,
@@ -113,6 +129,8 @@ def procesar_archivo(nombre_archivo):
                 "signal": signal,
                 "estrategia": estrategia,
                 "dias": (fila_salida["fecha"] - fecha_entrada).days,
+                "sesiones": sesiones,
+                "barras_faltantes": max(sesiones - barras, 0),
                 "resultado": round(precio_salida - precio_entrada - COMISION if signal == "buy" else precio_entrada - precio_salida - COMISION, 4),
                 "comision": COMISION,
                 "tipo_salida": tipo_salida
@@ -132,6 +150,9 @@ def procesar_archivo(nombre_archivo):
             log.write(f"{nombre_archivo} - {str(e)}\n")
 
 def main():
+    parser = argparse.ArgumentParser(description="Simulacion de ordenes con TP/SL/vencimiento")
+    args = agregar_argumento_perfil(parser).parse_args()
+    activar_perfilado("gen_ordenes_v2", args.profile)
     archivos = [f for f in os.listdir(SENALES_FOLDER) if f.endswith("_senales.csv")]
     for archivo in archivos:
         procesar_archivo(archivo)
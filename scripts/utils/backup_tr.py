@@ -1,8 +1,8 @@
 import os
+import sys
 import tarfile
 import boto3
 import logging
-import json
 import watchtower
 from datetime import datetime
 
@@ -29,25 +29,13 @@ logger.addHandler(cw_handler)
 
 # === Rutas y estado ===
 BASE_DIR = "/home/ec2-user/tr"
+sys.path.append(BASE_DIR)
+
+from my_modules.estado_sistema import guardar_estado
+
 BACKUP_BASE = "/home/ec2-user/backups"
-SUMMARY_FILE = os.path.join(BASE_DIR, "reports/summary/system_status.json")
 fecha_hoy = datetime.utcnow().strftime("%Y-%m-%d")
 
-def guardar_estado(modulo, status, mensaje):
-    now_str = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    estado = {}
-    if os.path.exists(SUMMARY_FILE):
-        with open(SUMMARY_FILE, "r") as f:
-            estado = json.load(f)
-    estado[modulo] = {
-        "fecha": fecha_hoy,
-        "ultima_ejecucion": now_str,
-        "status": status,
-        "mensaje": mensaje
-    }
-    with open(SUMMARY_FILE, "w") as f:
-        json.dump(estado, f, indent=2)
-
 # === Proceso de backup ===
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 backup_dir_name = f"backup_tr_{timestamp}"
@@ -0,0 +1,156 @@
+"""
+===========================================================================
+ Script: Benchmark de tiempo de importacion - LeanTech Trading
+===========================================================================
+
+Descripcion:
+------------
+Mide con `python -X importtime` el coste de importar cada modulo de
+my_modules y el nivel superior de los scripts cortos (status_report,
+alertas), en un interprete limpio por objetivo. Compara contra el
+presupuesto de config/importtime_presupuesto.json y agrega una fila por
+objetivo al historico reports/performance/importtime.csv.
+
+- import_ms: suma del tiempo acumulado de los imports de primer nivel,
+  sin contar los modulos que el interprete ya carga al arrancar
+- wall_ms: tiempo total del subproceso (arranque del interprete incluido)
+- Los scripts se cargan con spec_from_file_location, sin ejecutar main
+
+Uso:
+----
+python bench_importtime.py
+python bench_importtime.py --repeticiones 5 --estricto   # exit 1 si se excede
+python bench_importtime.py --detalle my_modules.email_sender
+
+===========================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+# === CONFIGURACION ===
+REPO_DIR = Path(__file__).resolve().parents[2]
+PRESUPUESTO_PATH = REPO_DIR / "config" / "importtime_presupuesto.json"
+HISTORICO_PATH = Path("/home/ubuntu/tr/reports/performance/importtime.csv")
+COLUMNAS = ["fecha", "objetivo", "import_ms", "wall_ms", "presupuesto_ms", "estado"]
+
+CARGAR_SCRIPT = (
+    "import importlib.util, sys; "
+    "spec = importlib.util.spec_from_file_location('_bench', {ruta!r}); "
+    "mod = importlib.util.module_from_spec(spec); "
+    "spec.loader.exec_module(mod)"
+)
+
+# === MEDICION ===
+def parsear_importtime(stderr):
+    """Devuelve [(modulo, self_us, acumulado_us, nivel)] de la salida de -X importtime."""
+    filas = []
+    for linea in stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        self_us, acumulado_us, nombre = linea.split("|", 2)
+        self_us = int(self_us.split(":")[-1].strip())
+        nivel = (len(nombre) - len(nombre.lstrip())) // 2
+        filas.append((nombre.strip(), self_us, int(acumulado_us.strip()), nivel))
+    return filas
+
+def medir(objetivo, es_script, base=frozenset()):
+    """`base`: modulos que el interprete importa al arrancar (se excluyen del total)."""
+    if es_script:
+        codigo = CARGAR_SCRIPT.format(ruta=str(REPO_DIR / objetivo))
+    elif objetivo:
+        codigo = f"import {objetivo}"
+    else:
+        codigo = "pass"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_DIR), os.environ.get("PYTHONPATH")])))
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        capture_output=True, text=True, env=env, cwd=REPO_DIR,
+    )
+    wall_ms = (time.perf_counter() - t0) * 1000
+    filas = parsear_importtime(proc.stderr)
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"
+        return None, wall_ms, filas, error
+    filas = [f for f in filas if f[0] not in base]
+    import_ms = sum(f[2] for f in filas if f[3] == 0) / 1000
+    return import_ms, wall_ms, filas, None
+
+def modulos_arranque():
+    _, _, filas, _ = medir("", False)
+    return frozenset(f[0] for f in filas)
+
+def medir_repetido(objetivo, es_script, repeticiones, base):
+    """Mediana de varias ejecuciones."""
+    medidas = []
+    for _ in range(repeticiones):
+        import_ms, wall_ms, filas, error = medir(objetivo, es_script, base)
+        if error:
+            return None, None, filas, error
+        medidas.append((import_ms, wall_ms, filas))
+    medidas.sort(key=lambda m: m[0])
+    import_ms, wall_ms, filas = medidas[len(medidas) // 2]
+    return round(import_ms, 1), round(wall_ms, 1), filas, None
+
+def detalle(filas, top=15):
+    for nombre, self_us, acumulado_us, nivel in sorted(filas, key=lambda f: -f[1])[:top]:
+        print(f"    {self_us / 1000:8.1f} ms self | {acumulado_us / 1000:8.1f} ms acum | {nombre}")
+
+def guardar_historico(resultados):
+    HISTORICO_PATH.parent.mkdir(parents=True, exist_ok=True)
+    nuevo = not HISTORICO_PATH.exists()
+    with open(HISTORICO_PATH, "a") as f:
+        if nuevo:
+            f.write(",".join(COLUMNAS) + "\n")
+        for r in resultados:
+            f.write(",".join("" if r[c] is None else str(r[c]) for c in COLUMNAS) + "\n")
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de tiempo de importacion")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--estricto", action="store_true", help="Termina con codigo 1 si algun objetivo excede el presupuesto")
+    parser.add_argument("--detalle", nargs="*", default=None, help="Muestra los imports mas lentos de estos objetivos (sin valor: todos)")
+    parser.add_argument("--sin-historico", action="store_true", help="No agrega filas a importtime.csv")
+    args = parser.parse_args(argv)
+
+    with open(PRESUPUESTO_PATH, "r") as f:
+        presupuesto = json.load(f)
+    objetivos = [(m, False, ms) for m, ms in presupuesto.get("modulos", {}).items()]
+    objetivos += [(s, True, ms) for s, ms in presupuesto.get("scripts", {}).items()]
+
+    fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    base = modulos_arranque()
+    resultados = []
+    for objetivo, es_script, limite in objetivos:
+        import_ms, wall_ms, filas, error = medir_repetido(objetivo, es_script, max(1, args.repeticiones), base)
+        if error:
+            estado = "ERROR"
+        else:
+            estado = "OK" if import_ms <= limite else "EXCEDIDO"
+        resultados.append({
+            "fecha": fecha, "objetivo": objetivo, "import_ms": import_ms,
+            "wall_ms": wall_ms, "presupuesto_ms": limite, "estado": estado,
+        })
+        extra = f" ({error})" if error else ""
+        print(f"[{estado:8}] {objetivo:50} import={import_ms} ms wall={wall_ms} ms presupuesto={limite} ms{extra}")
+        if args.detalle is not None and (not args.detalle or objetivo in args.detalle):
+            detalle(filas)
+
+    if not args.sin_historico:
+        guardar_historico(resultados)
+
+    excedidos = [r["objetivo"] for r in resultados if r["estado"] != "OK"]
+    print(f"\n{len(resultados) - len(excedidos)} de {len(resultados)} dentro de presupuesto")
+    if args.estricto and excedidos:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
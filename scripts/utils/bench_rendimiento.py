@@ -0,0 +1,458 @@
+"""
+===========================================================================
+ Script: Suite de benchmarks de rendimiento - LeanTech Trading
+===========================================================================
+
+Descripcion:
+------------
+Mide los caminos calientes del sistema sobre datasets sinteticos
+deterministas (misma semilla -> mismos precios y senales), a varias
+escalas de simbolos x anios:
+
+- carga              lectura de N parquet del historico
+- estrategia:<mod>   cada generar_senales de my_modules/estrategias y
+                     my_modules/versiones/v*
+- backtest           backtest() de run_backtest_heuristico
+- ordenes, ordenes_v2, ordenes_dia
+                     simuladores de gen_ordenes, gen_ordenes_v2 y
+                     gen_ordenes_dia
+- metricas_heuristico, metricas_ml
+                     agregacion de metricas (run_backtest_heuristico, bt)
+- features           historico completo de features (my_modules.feature_store)
+- etiquetas          horizonte fijo + triple barrera (my_modules.etiquetado)
+- sml                inferencia por lotes (my_modules.inferencia_ml) con un modelo entrenado
+                     sobre el propio dataset (xgboost o sklearn)
+- sml_compilado      lo mismo con el modelo exportado a arboles compilados
+
+Las funciones de los scripts se compilan desde su fuente sin ejecutar
+el nivel de modulo (que lee rutas de produccion); las constantes de
+rutas se redirigen a un directorio temporal.
+
+Los datasets (my_modules.mercado_sintetico, con gaps, picos de volumen,
+halts y dias faltantes) se generan una vez en
+cache/bench/<simbolos>x<anios>/ y se regeneran si cambia la version del
+generador. Cada corrida escribe reports/performance/bench/bench_<fecha>.json
+con la informacion de la maquina y, por caso y escala, la mediana de las
+repeticiones. `comparar` marca como REGRESION los casos mas lentos que
+la baseline por encima de la tolerancia.
+
+Uso:
+----
+python bench_rendimiento.py correr                          # 50 simbolos x 1 anio
+python bench_rendimiento.py correr --simbolos 50 500 --anios 1 10
+python bench_rendimiento.py correr --matriz --casos carga estrategia
+python bench_rendimiento.py correr --guardar-baseline
+python bench_rendimiento.py comparar                        # ultima corrida vs baseline
+python bench_rendimiento.py comparar bench_X.json --tolerancia 0.1 --estricto
+
+===========================================================================
+"""
+
+import os
+import ast
+import gc
+import sys
+import json
+import time
+import zlib
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from importlib import import_module
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# === CONFIGURACION ===
+REPO_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_DIR))
+
+from my_modules.arboles_compilados import exportar
+from my_modules.calendario_trading import cargar_calendario
+from my_modules.etiquetado import ESPEC_DEFECTO, etiquetar
+from my_modules.feature_store import calcular_features, preparar_historico
+from my_modules.inferencia_ml import MatrizFeatures, puntuar
+from my_modules.logger_estrategia import fijar_verbosidad
+from my_modules.mercado_sintetico import SEMILLA, VERSION as VERSION_GENERADOR, escribir_simbolo, iterar_panel, nombres_simbolos
+
+DATASETS_DIR = REPO_DIR / "cache" / "bench"
+RESULTADOS_DIR = REPO_DIR / "reports" / "performance" / "bench"
+BASELINE_PATH = RESULTADOS_DIR / "baseline.json"
+MATRIZ_SIMBOLOS = [50, 500, 5000]
+MATRIZ_ANIOS = [1, 10, 20]
+TOLERANCIA = 0.25
+
+# === DATASETS ===
+def senales_simbolo(simbolo, fechas):
+    rng = np.random.default_rng([SEMILLA + 1, zlib.crc32(simbolo.encode())])
+    return pd.DataFrame({
+        "fecha": pd.DatetimeIndex(fechas).strftime("%Y-%m-%d"),
+        "signal": rng.choice(["hold", "buy", "sell"], size=len(fechas), p=[0.9, 0.05, 0.05]),
+        "estrategia": "bench",
+    })
+
+def preparar_dataset(n_simbolos, anios, regenerar=False):
+    """
+    Escribe historic/<S>.parquet (my_modules.mercado_sintetico) y
+    senales/<S>_senales.csv si no existen para esta version del generador.
+    """
+    directorio = DATASETS_DIR / f"{n_simbolos}x{anios}"
+    marca = directorio / "completo.json"
+    if marca.exists() and not regenerar:
+        with open(marca, "r") as f:
+            if json.load(f).get("version") == VERSION_GENERADOR:
+                return directorio
+    if directorio.exists():
+        shutil.rmtree(directorio)
+    (directorio / "historic").mkdir(parents=True)
+    (directorio / "senales").mkdir()
+
+    t0 = time.perf_counter()
+    filas = 0
+    for simbolo, columnas in iterar_panel(n_simbolos, anios, SEMILLA):
+        filas += escribir_simbolo(directorio / "historic", simbolo, columnas)
+        senales_simbolo(simbolo, columnas["fecha"]).to_csv(directorio / "senales" / f"{simbolo}_senales.csv", index=False)
+    with open(marca, "w") as f:
+        json.dump({"simbolos": n_simbolos, "anios": anios, "filas": filas, "semilla": SEMILLA,
+                   "version": VERSION_GENERADOR, "generado_s": round(time.perf_counter() - t0, 1)}, f, indent=2)
+    return directorio
+
+# === CARGA DE FUNCIONES DE SCRIPTS ===
+def cargar_funciones(ruta, nombres, **globales):
+    """
+    Compila solo las funciones `nombres` y las constantes literales en
+    mayusculas de un script, sin ejecutar su nivel de modulo. `globales`
+    completa o sustituye lo que las funciones leen del modulo.
+    """
+    ruta = REPO_DIR / ruta
+    arbol = ast.parse(ruta.read_text(encoding="utf-8"))
+    espacio = {"__name__": f"bench_{ruta.stem}", "os": os, "np": np, "pd": pd, "datetime": datetime}
+    nodos = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.FunctionDef) and nodo.name in nombres:
+            nodos.append(nodo)
+        elif (isinstance(nodo, ast.Assign) and len(nodo.targets) == 1
+              and isinstance(nodo.targets[0], ast.Name) and nodo.targets[0].id.isupper()):
+            try:
+                espacio[nodo.targets[0].id] = ast.literal_eval(nodo.value)
+            except (ValueError, TypeError, SyntaxError):
+                pass
+    faltantes = set(nombres) - {n.name for n in nodos}
+    if faltantes:
+        raise ValueError(f"{ruta.name}: no define {sorted(faltantes)}")
+    espacio.update(globales)
+    exec(compile(ast.Module(body=nodos, type_ignores=[]), str(ruta), "exec"), espacio)
+    return espacio
+
+def cargar_estrategias():
+    estrategias = {}
+    dirs = [REPO_DIR / "my_modules" / "estrategias"]
+    dirs += sorted((REPO_DIR / "my_modules" / "versiones").glob("v*"))
+    for directorio in dirs:
+        paquete = ".".join(directorio.relative_to(REPO_DIR).parts)
+        for archivo in sorted(directorio.glob("*.py")):
+            nombre = f"{directorio.relative_to(REPO_DIR / 'my_modules').as_posix()}/{archivo.stem}"
+            try:
+                estrategias[nombre] = import_module(f"{paquete}.{archivo.stem}").generar_senales
+            except Exception as e:
+                print(f"[WARN] No se pudo cargar {nombre}: {e}")
+    return estrategias
+
+def entrenar_modelo_sml(df):
+    """Modelo pequenio para medir inferencia; None si no hay xgboost ni sklearn."""
+    try:
+        from xgboost import XGBClassifier
+        modelo = XGBClassifier(n_estimators=100, max_depth=4, n_jobs=1)
+    except ImportError:
+        try:
+            from sklearn.ensemble import RandomForestClassifier
+            modelo = RandomForestClassifier(n_estimators=100, max_depth=6, n_jobs=1, random_state=0)
+        except ImportError:
+            return None
+    X = df.select_dtypes(include=[np.number])
+    y = (df["close"].shift(-1) > df["close"]).astype(int)
+    modelo.fit(X, y)
+    return modelo
+
+# === CASOS ===
+def construir_casos(directorio, tmp, filtro=None):
+    """Devuelve {caso: funcion(datos_simbolo) -> filas procesadas}."""
+    calendario = cargar_calendario()
+    salida = Path(tmp)
+    casos = {}
+
+    for nombre, funcion in cargar_estrategias().items():
+        casos[f"estrategia:{nombre}"] = lambda d, f=funcion: len(f(d["precios"].copy()))
+
+    rbh = cargar_funciones("scripts/utils/run_backtest_heuristico.py", ["backtest", "calcular_metricas"],
+                           CALENDARIO=calendario)
+
+    def caso_backtest(d):
+        precios = d["precios"].set_index("datetime")
+        rbh["backtest"](d["senales"].copy(), precios)
+        return len(precios)
+    casos["backtest"] = caso_backtest
+
+    def caso_metricas_heuristico(d):
+        ops = d["operaciones"]
+        rbh["calcular_metricas"](ops, d["simbolo"], "bench")
+        return len(ops)
+    casos["metricas_heuristico"] = caso_metricas_heuristico
+
+    go = cargar_funciones("scripts/utils/backtesting/gen_ordenes.py", ["simular_ordenes", "log"],
+                          SENAL_DIR=str(directorio / "senales"), HIST_DIR=str(directorio / "historic"),
+                          ORDENES_DIR=str(salida / "ordenes"), LOG=str(salida / "gen_ordenes.log"))
+    casos["ordenes"] = lambda d: go["simular_ordenes"](d["simbolo"]) or len(d["precios"])
+
+    go2 = cargar_funciones("scripts/utils/backtesting/gen_ordenes_v2.py", ["procesar_archivo"],
+                           CALENDARIO=calendario, SENALES_FOLDER=str(directorio / "senales"),
+                           HIST_FOLDER=str(directorio / "historic"), SALIDA_FOLDER=str(salida),
+                           LOG_FOLDER=str(salida))
+    casos["ordenes_v2"] = lambda d: go2["procesar_archivo"](f"{d['simbolo']}_senales.csv") or len(d["precios"])
+
+    god = cargar_funciones("scripts/utils/backtesting/gen_ordenes_dia.py", ["procesar_ordenes", "log"],
+                           LOG=str(salida / "gen_ordenes_dia.log"))
+
+    def caso_ordenes_dia(d):
+        senales = d["senales"].rename(columns={"signal": "senal"}).assign(simbolo=d["simbolo"])
+        god["procesar_ordenes"](senales, d["simbolo"], d["precios"])
+        return len(d["precios"])
+    casos["ordenes_dia"] = caso_ordenes_dia
+
+    bt = cargar_funciones("scripts/utils/bt.py", ["calcular_metricas"])
+
+    def caso_metricas_ml(d):
+        df = d["precios"][["datetime", "close"]].assign(buy=d["senales"]["signal"].eq("buy").to_numpy())
+        bt["calcular_metricas"](df)
+        return len(df)
+    casos["metricas_ml"] = caso_metricas_ml
+
+    casos["features"] = lambda d: len(calcular_features(preparar_historico(d["precios"]), d["simbolo"]))
+    casos["etiquetas"] = lambda d: len(etiquetar(d["precios"], d["simbolo"], d["senales"].assign(simbolo=d["simbolo"]),
+                                                 ESPEC_DEFECTO, calendario))
+
+    estado_sml = {}
+
+    def caso_sml(d):
+        if "modelo" not in estado_sml:
+            estado_sml["modelo"] = entrenar_modelo_sml(d["precios"])
+        modelo = estado_sml["modelo"]
+        if modelo is None:
+            raise RuntimeError("sin xgboost ni sklearn")
+        matriz = MatrizFeatures(d["precios"].assign(simbolo=d["simbolo"]))
+        puntuar(matriz, {"bench": modelo}, log=lambda _: None)
+        return len(matriz)
+    casos["sml"] = caso_sml
+
+    def caso_sml_compilado(d):
+        if "compilado" not in estado_sml:
+            modelo = estado_sml.get("modelo") or entrenar_modelo_sml(d["precios"])
+            if modelo is None:
+                raise RuntimeError("sin xgboost ni sklearn")
+            estado_sml["compilado"] = exportar(modelo, list(modelo.feature_names_in_))
+        matriz = MatrizFeatures(d["precios"].assign(simbolo=d["simbolo"]))
+        puntuar(matriz, {"bench": estado_sml["compilado"]}, log=lambda _: None)
+        return len(matriz)
+    casos["sml_compilado"] = caso_sml_compilado
+
+    if filtro:
+        casos = {k: v for k, v in casos.items() if any(k == p or k.startswith(p) for p in filtro)}
+    return casos
+
+def operaciones_sinteticas(simbolo, senales):
+    rng = np.random.default_rng([SEMILLA + 2, zlib.crc32(simbolo.encode())])
+    n = int(senales["signal"].eq("buy").sum())
+    return pd.DataFrame({"retorno_pct": rng.normal(0.2, 3.0, n).round(2)})
+
+def correr_escala(n_simbolos, anios, filtro, repeticiones, regenerar=False):
+    directorio = preparar_dataset(n_simbolos, anios, regenerar)
+    simbolos = nombres_simbolos(n_simbolos)
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        casos = construir_casos(directorio, tmp, filtro)
+        medir_carga = not filtro or any("carga".startswith(p) for p in filtro)
+        tiempos = {c: [] for c in (["carga"] if medir_carga else []) + list(casos)}
+        filas = dict.fromkeys(tiempos, 0)
+        errores = {}
+
+        for rep in range(repeticiones):
+            gc.collect()
+            acumulado = dict.fromkeys(tiempos, 0.0)
+            for simbolo in simbolos:
+                t0 = time.perf_counter()
+                precios = pd.read_parquet(directorio / "historic" / f"{simbolo}.parquet")
+                if medir_carga:
+                    acumulado["carga"] += time.perf_counter() - t0
+                    filas["carga"] += len(precios) if rep == 0 else 0
+                senales = pd.read_csv(directorio / "senales" / f"{simbolo}_senales.csv")
+                datos = {"simbolo": simbolo, "precios": precios, "senales": senales,
+                         "operaciones": operaciones_sinteticas(simbolo, senales)}
+                for caso, funcion in casos.items():
+                    if caso in errores:
+                        continue
+                    t0 = time.perf_counter()
+                    try:
+                        n = funcion(datos)
+                    except Exception as e:
+                        errores[caso] = str(e)
+                        continue
+                    acumulado[caso] += time.perf_counter() - t0
+                    if rep == 0:
+                        filas[caso] += int(n or 0)
+            for caso, segundos in acumulado.items():
+                tiempos[caso].append(segundos)
+
+    resultados = []
+    for caso, medidas in tiempos.items():
+        fila = {"caso": caso, "simbolos": n_simbolos, "anios": anios, "repeticiones": repeticiones,
+                "filas": filas[caso], "estado": "ERROR" if caso in errores else "OK"}
+        if caso in errores:
+            fila["error"] = errores[caso]
+        else:
+            mediana = statistics.median(medidas)
+            fila.update(mediana_s=round(mediana, 4), min_s=round(min(medidas), 4),
+                        ms_por_simbolo=round(1000 * mediana / n_simbolos, 3),
+                        filas_por_s=round(filas[caso] / mediana) if mediana else None)
+        resultados.append(fila)
+        extra = f" ({fila['error']})" if caso in errores else f" {fila['mediana_s']}s ({fila['ms_por_simbolo']} ms/simbolo)"
+        print(f"[{fila['estado']:5}] {n_simbolos}x{anios} {caso:50}{extra}")
+    return resultados
+
+# === MAQUINA ===
+def info_maquina():
+    cpu = platform.processor()
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            cpu = next((l.split(":", 1)[1].strip() for l in f if l.startswith("model name")), cpu)
+    except OSError:
+        pass
+    try:
+        ram_gb = round(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3, 1)
+    except (ValueError, OSError, AttributeError):
+        ram_gb = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "host": platform.node(),
+        "cpu": cpu,
+        "nucleos": os.cpu_count(),
+        "ram_gb": ram_gb,
+        "sistema": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "commit": commit,
+    }
+
+# === COMPARACION ===
+def comparar(actual, baseline, tolerancia):
+    """Lista de (caso, escala, base_s, actual_s, ratio, estado) para los casos presentes en ambas."""
+    base = {(r["caso"], r["simbolos"], r["anios"]): r for r in baseline["resultados"] if r.get("mediana_s")}
+    filas = []
+    for r in actual["resultados"]:
+        b = base.get((r["caso"], r["simbolos"], r["anios"]))
+        if not b or not r.get("mediana_s"):
+            continue
+        ratio = r["mediana_s"] / b["mediana_s"] if b["mediana_s"] else float("inf")
+        if ratio > 1 + tolerancia:
+            estado = "REGRESION"
+        elif ratio < 1 - tolerancia:
+            estado = "MEJORA"
+        else:
+            estado = "OK"
+        filas.append((r["caso"], f"{r['simbolos']}x{r['anios']}", b["mediana_s"], r["mediana_s"], round(ratio, 2), estado))
+    return filas
+
+def ultima_corrida():
+    corridas = sorted(RESULTADOS_DIR.glob("bench_*.json"))
+    if not corridas:
+        raise SystemExit(f"No hay corridas en {RESULTADOS_DIR}")
+    return corridas[-1]
+
+def guardar_json(data, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+# === MAIN ===
+def cmd_correr(args):
+    fijar_verbosidad(False)
+    simbolos = MATRIZ_SIMBOLOS if args.matriz else args.simbolos
+    anios = MATRIZ_ANIOS if args.matriz else args.anios
+    inicio = datetime.now()
+    resultados = []
+    for n in simbolos:
+        for a in anios:
+            resultados += correr_escala(n, a, args.casos, max(1, args.repeticiones), args.regenerar)
+
+    corrida = {
+        "fecha": inicio.strftime("%Y-%m-%d %H:%M:%S"),
+        "duracion_s": round((datetime.now() - inicio).total_seconds(), 1),
+        "maquina": info_maquina(),
+        "semilla": SEMILLA,
+        "resultados": resultados,
+    }
+    salida = Path(args.salida) if args.salida else RESULTADOS_DIR / f"bench_{inicio:%Y%m%d_%H%M%S}.json"
+    guardar_json(corrida, salida)
+    print(f"\nResultados en {salida}")
+    if args.guardar_baseline:
+        guardar_json(corrida, BASELINE_PATH)
+        print(f"Baseline actualizada: {BASELINE_PATH}")
+
+def cmd_comparar(args):
+    actual_path = Path(args.actual) if args.actual else ultima_corrida()
+    with open(actual_path, "r") as f:
+        actual = json.load(f)
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+
+    if actual["maquina"].get("cpu") != baseline["maquina"].get("cpu"):
+        print(f"[AVISO] CPU distinta: baseline={baseline['maquina'].get('cpu')} actual={actual['maquina'].get('cpu')}")
+    print(f"Baseline {baseline['fecha']} ({baseline['maquina'].get('commit')}) vs "
+          f"actual {actual['fecha']} ({actual['maquina'].get('commit')}), tolerancia {args.tolerancia:.0%}\n")
+
+    filas = comparar(actual, baseline, args.tolerancia)
+    for caso, escala, base_s, actual_s, ratio, estado in sorted(filas, key=lambda f: -f[4]):
+        print(f"[{estado:9}] {escala:9} {caso:50} {base_s:>9}s -> {actual_s:>9}s  x{ratio}")
+    regresiones = [f for f in filas if f[5] == "REGRESION"]
+    print(f"\n{len(regresiones)} regresiones de {len(filas)} casos comparados")
+    if args.estricto and regresiones:
+        sys.exit(1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de rendimiento sobre datasets sinteticos")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("correr", help="Ejecuta la suite y guarda el JSON de resultados")
+    p.add_argument("--simbolos", type=int, nargs="+", default=[50])
+    p.add_argument("--anios", type=int, nargs="+", default=[1])
+    p.add_argument("--matriz", action="store_true", help="50/500/5000 simbolos x 1/10/20 anios")
+    p.add_argument("--casos", nargs="+", default=None, help="Prefijos de casos a ejecutar (p.ej. carga estrategia:estrategias)")
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.add_argument("--regenerar", action="store_true", help="Regenera los datasets aunque existan")
+    p.add_argument("--salida", default=None)
+    p.add_argument("--guardar-baseline", action="store_true", help="Guarda tambien la corrida como baseline")
+    p.set_defaults(funcion=cmd_correr)
+
+    p = sub.add_parser("comparar", help="Compara una corrida con la baseline")
+    p.add_argument("actual", nargs="?", default=None, help="JSON de la corrida (por defecto la ultima)")
+    p.add_argument("--baseline", default=str(BASELINE_PATH))
+    p.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Fraccion de lentitud tolerada (0.25 = 25%%)")
+    p.add_argument("--estricto", action="store_true", help="Termina con codigo 1 si hay regresiones")
+    p.set_defaults(funcion=cmd_comparar)
+
+    args = parser.parse_args(argv)
+    args.funcion(args)
+
+if __name__ == "__main__":
+    main()
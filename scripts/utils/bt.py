@@ -1,15 +1,20 @@
 import os
-import json
+import sys
 import pandas as pd
 import numpy as np
 import logging
 from datetime import datetime
 
 BASE_DIR = "/home/ec2-user/tr"
+sys.path.append(BASE_DIR)
+
+from my_modules.estado_sistema import guardar_estado
+from my_modules.feature_store import cargar_historia
+
 SENALES_DIR = f"{BASE_DIR}/reports/senales_ml"
+SENALES_PATH = f"{SENALES_DIR}/senales_ml_historico.parquet"  # sml.py --modo historico
 RESULTADOS_DIR = f"{BASE_DIR}/reports/backtest_ml"
 LOG_DIR = f"{BASE_DIR}/logs/bt"
-STATUS_FILE = f"{BASE_DIR}/reports/summary/system_status.json"
 
 os.makedirs(RESULTADOS_DIR, exist_ok=True)
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -24,95 +29,144 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S"
 )
 
-def guardar_estado(modulo, status, mensaje):
-    now_str = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    status_obj = {}
-    if os.path.exists(STATUS_FILE):
-        with open(STATUS_FILE, "r") as f:
-            status_obj = json.load(f)
-    status_obj[modulo] = {
-        "fecha": fecha_hoy,
-        "ultima_ejecucion": now_str,
-        "status": status,
-        "mensaje": mensaje
-    }
-    with open(STATUS_FILE, "w") as f:
-        json.dump(status_obj, f, indent=2)
+COLUMNAS_ML = ["trades", "ganancia_total", "promedio_op", "winrate", "retorno_acumulado",
+               "volatilidad", "sharpe", "profit_factor", "max_drawdown"]
+RESUMEN_PATH = os.path.join(RESULTADOS_DIR, "resumen_metricas_full.csv")  # esquema de run_backtest_heuristico
+CURVAS_PATH = os.path.join(RESULTADOS_DIR, "curvas_modelos.csv")
+
+# === RETORNOS ===
+def retornos_siguientes(precios):
+    """Retorno close a close hasta la sesion siguiente del panel, por simbolo (NaN en la ultima)."""
+    precios = precios.sort_values(["simbolo", "fecha"])
+    siguiente = precios.groupby("simbolo", observed=True, sort=False)["close"].shift(-1)
+    return precios.assign(retorno=siguiente / precios["close"] - 1)[["simbolo", "fecha", "retorno"]]
+
+# === METRICAS AGRUPADAS ===
+def metricas_agrupadas(df, claves):
+    """
+    df ordenado por claves y fecha, con buy (bool) y retorno. Una fila por
+    grupo con las metricas ML: el resultado de cada sesion es el retorno
+    si hay buy y 0 si no.
+    """
+    df = df[[*claves, "buy", "retorno"]].copy()
+    df["resultado"] = np.where(df["buy"], df["retorno"], 0.0)
+    df["log"] = np.log1p(df["resultado"])
+    df["curva"] = np.exp(df.groupby(claves, observed=True, sort=False)["log"].cumsum())
+    df["drawdown"] = df["curva"] / df.groupby(claves, observed=True, sort=False)["curva"].cummax() - 1
+    df["ganadora"] = df["resultado"] > 0
+    df["ganancia"] = df["resultado"].clip(lower=0)
+    df["perdida"] = (-df["resultado"]).clip(lower=0)
+
+    r = df.groupby(claves, observed=True, sort=False).agg(
+        trades=("buy", "sum"), ganancia_total=("resultado", "sum"), media=("resultado", "mean"),
+        n_ganadoras=("ganadora", "sum"), log=("log", "sum"), volatilidad=("resultado", "std"),
+        ganadoras=("ganancia", "sum"), perdedoras=("perdida", "sum"), max_drawdown=("drawdown", "min"),
+    )
+    con_trades = r["trades"] > 0
+    return pd.DataFrame({
+        "trades": r["trades"].astype(int),
+        "ganancia_total": r["ganancia_total"].round(4),
+        "promedio_op": r["media"].where(con_trades, 0).round(6),
+        "winrate": (r["n_ganadoras"] / r["trades"]).where(con_trades, 0).round(4),
+        "retorno_acumulado": np.expm1(r["log"]).round(4),
+        "volatilidad": r["volatilidad"].round(6),
+        "sharpe": (r["media"] / r["volatilidad"]).where(r["volatilidad"] > 0, 0).round(4),
+        "profit_factor": (r["ganadoras"] / r["perdedoras"]).where(r["perdedoras"] > 0).round(4),
+        "max_drawdown": r["max_drawdown"].round(4),
+    })
 
 def calcular_metricas(df):
-    df = df.copy()
+    """Metricas de una sola serie (datetime, close, buy)."""
     df = df.sort_values("datetime")
-    df["retorno"] = df["close"].pct_change().shift(-1)
-    df = df.dropna(subset=["retorno"])
-
-    df["resultado"] = np.where(df["buy"], df["retorno"], 0)
-    trades = df["buy"].sum()
-    ganancia_total = df["resultado"].sum()
-    promedio_op = df["resultado"].mean() if trades > 0 else 0
-    winrate = (df["resultado"] > 0).sum() / trades if trades > 0 else 0
-    retorno_acum = (df["resultado"] + 1).prod() - 1
-    volatilidad = df["resultado"].std()
-    sharpe = df["resultado"].mean() / df["resultado"].std() if df["resultado"].std() > 0 else 0
-    ganadoras = df[df["resultado"] > 0]["resultado"].sum()
-    perdedoras = abs(df[df["resultado"] < 0]["resultado"].sum())
-    profit_factor = ganadoras / perdedoras if perdedoras > 0 else np.nan
-
-    curva = (df["resultado"] + 1).cumprod()
-    max_acum = curva.cummax()
-    drawdown = (curva - max_acum) / max_acum
-    max_drawdown = drawdown.min()
-
-    return {
-        "trades": int(trades),
-        "ganancia_total": float(round(ganancia_total, 4)),
-        "promedio_op": float(round(promedio_op, 6)),
-        "winrate": float(round(winrate, 4)),
-        "retorno_acumulado": float(round(retorno_acum, 4)),
-        "volatilidad": float(round(volatilidad, 6)),
-        "sharpe": float(round(sharpe, 4)),
-        "profit_factor": float(round(profit_factor, 4)) if not np.isnan(profit_factor) else None,
-        "max_drawdown": float(round(max_drawdown, 4))
-    }
-
+    df = df.assign(retorno=df["close"].pct_change().shift(-1), grupo=0).dropna(subset=["retorno"])
+    fila = metricas_agrupadas(df, ["grupo"]).iloc[0]
+    return {c: (None if pd.isna(fila[c]) else int(fila[c]) if c == "trades" else float(fila[c])) for c in COLUMNAS_ML}
+
+def resumen_heuristico(df):
+    """
+    Resumen con el esquema de run_backtest_heuristico (resumen_metricas_full.csv):
+    una operacion por senal buy con retorno_pct = retorno de la sesion siguiente,
+    Estrategia = modelo.
+    """
+    claves = ["modelo", "simbolo"]
+    ops = df.loc[df["buy"], claves].copy()
+    ops["retorno_pct"] = df.loc[df["buy"], "retorno"].to_numpy() * 100
+    ops["ganadora"] = ops["retorno_pct"] > 0
+    ops["ret_ganadora"] = ops["retorno_pct"].where(ops["ganadora"])
+    ops["ret_perdedora"] = ops["retorno_pct"].where(~ops["ganadora"])
+    ops["acumulado"] = ops.groupby(claves, observed=True, sort=False)["retorno_pct"].cumsum()
+    ops["drawdown"] = ops.groupby(claves, observed=True, sort=False)["acumulado"].cummax() - ops["acumulado"]
+
+    r = ops.groupby(claves, observed=True, sort=False).agg(
+        operaciones=("retorno_pct", "size"), n_ganadoras=("ganadora", "sum"),
+        promedio=("retorno_pct", "mean"), mediana=("retorno_pct", "median"), std=("retorno_pct", "std"),
+        ganancia_total=("ret_ganadora", "sum"), perdida_total=("ret_perdedora", "sum"),
+        media_ganadora=("ret_ganadora", "mean"), media_perdedora=("ret_perdedora", "mean"),
+        n_perdedoras=("ret_perdedora", "count"), drawdown=("drawdown", "max"),
+    ).reset_index()
+    return pd.DataFrame({
+        "Simbolo": r["simbolo"].astype(str),
+        "Estrategia": r["modelo"].astype(str),
+        "Operaciones": r["operaciones"],
+        "WinRate_%": (r["n_ganadoras"] / r["operaciones"] * 100).round(2),
+        "RetornoPromedio_%": r["promedio"].round(2),
+        "MedianaRetorno_%": r["mediana"].round(2),
+        "ProfitFactor": (r["ganancia_total"] / r["perdida_total"].abs()).where(r["perdida_total"] != 0, np.inf).round(2),
+        "PayoffRatio": (r["media_ganadora"] / r["media_perdedora"].abs()).where(r["n_perdedoras"] > 0, np.inf).round(2),
+        "SharpeSimplificado": (r["promedio"] / r["std"]).where(r["std"] > 0, np.inf).round(2),
+        "DrawdownMax_%": r["drawdown"].round(2),
+    })
+
+def curvas_modelos(df):
+    """
+    Curva agregada por modelo: cada sesion reparte el capital por igual entre
+    los simbolos con buy (retorno medio); sin buys el dia rinde 0.
+    """
+    dia = df.assign(ret_buy=df["retorno"].where(df["buy"])).groupby(["modelo", "fecha"], observed=True).agg(
+        posiciones=("buy", "sum"), retorno_dia=("ret_buy", "mean"))
+    dia["retorno_dia"] = dia["retorno_dia"].fillna(0.0)
+    dia["equity"] = np.exp(np.log1p(dia["retorno_dia"]).groupby(level="modelo", observed=True).cumsum())
+    dia["drawdown"] = dia["equity"] / dia["equity"].groupby(level="modelo", observed=True).cummax() - 1
+    return dia.reset_index()
+
+# === FLUJO PRINCIPAL ===
 def main():
     logging.info("Inicio del backtesting ML")
-    modelos = os.listdir(SENALES_DIR)
-    if not modelos:
-        logging.error("No hay carpetas de modelos en senales_ml")
-        guardar_estado("backtest", "ERROR", "No hay carpetas de modelos en senales_ml")
+    if not os.path.exists(SENALES_PATH):
+        logging.error("No hay senales historicas en senales_ml")
+        guardar_estado("backtest", "ERROR", "No hay senales historicas en senales_ml")
         return
 
-    modelos_exitosos = 0
+    # Tabla compacta de senales una sola vez + retornos de la sesion siguiente del panel de precios
+    senales = pd.read_parquet(SENALES_PATH, columns=["modelo", "simbolo", "fecha", "pred_senal"])
+    precios = cargar_historia([str(s) for s in senales["simbolo"].unique()], columnas=["close"])
+    df = senales.merge(retornos_siguientes(precios), on=["simbolo", "fecha"], how="inner")
+    df = df.dropna(subset=["retorno"])
+    if df.empty:
+        logging.error("Senales sin precios en el feature store")
+        guardar_estado("backtest", "ERROR", "No se genero ningun resumen de backtest")
+        return
+    df["buy"] = (df["pred_senal"] == "buy").to_numpy()
+    df = df.sort_values(["modelo", "simbolo", "fecha"], kind="stable").reset_index(drop=True)
+    logging.info("%s senales de %s modelos y %s simbolos", len(df), df["modelo"].nunique(), df["simbolo"].nunique())
 
-    for modelo in modelos:
-        path_modelo = os.path.join(SENALES_DIR, modelo)
-        if not os.path.isdir(path_modelo):
-            continue
-
-        resumen = []
-        for file in os.listdir(path_modelo):
-            if not file.endswith(".csv"):
-                continue
-            symbol = file.replace(".csv", "")
-            try:
-                df = pd.read_csv(os.path.join(path_modelo, file))
-                if "datetime" not in df.columns or "close" not in df.columns:
-                    raise ValueError("Faltan columnas necesarias")
-                columna = "pred_senal" if "pred_senal" in df.columns else "senal"
-                df["buy"] = df[columna] == "buy"
-                resultado = calcular_metricas(df)
-                resultado["symbol"] = symbol
-                resumen.append(resultado)
-                logging.info("%s - %s OK: %s", modelo, symbol, resultado)
-            except Exception as e:
-                logging.error("%s - %s ERROR: %s", modelo, symbol, str(e))
-
-        if resumen:
-            df_resumen = pd.DataFrame(resumen)
-            output_file = os.path.join(RESULTADOS_DIR, f"{modelo}_resumen.csv")
-            df_resumen.to_csv(output_file, index=False)
-            logging.info("Resumen guardado: %s", output_file)
-            modelos_exitosos += 1
+    metricas = metricas_agrupadas(df, ["modelo", "simbolo"]).reset_index()
+    modelos_exitosos = 0
+    for modelo, df_resumen in metricas.groupby("modelo", observed=True):
+        df_resumen = df_resumen.rename(columns={"simbolo": "symbol"})[[*COLUMNAS_ML, "symbol"]]
+        output_file = os.path.join(RESULTADOS_DIR, f"{modelo}_resumen.csv")
+        df_resumen.to_csv(output_file, index=False)
+        logging.info("Resumen guardado: %s (%s simbolos)", output_file, len(df_resumen))
+        modelos_exitosos += 1
+
+    resumen = resumen_heuristico(df)
+    resumen.to_csv(RESUMEN_PATH, index=False)
+    logging.info("Resumen (esquema heuristico) guardado: %s", RESUMEN_PATH)
+
+    curvas = curvas_modelos(df)
+    curvas.to_csv(CURVAS_PATH, index=False)
+    for modelo, c in curvas.groupby("modelo", observed=True):
+        logging.info("%s curva agregada: equity final %.4f, max drawdown %.4f", modelo, c["equity"].iloc[-1], c["drawdown"].min())
 
     if modelos_exitosos > 0:
         guardar_estado("backtest", "OK", f"{modelos_exitosos} modelos procesados correctamente")
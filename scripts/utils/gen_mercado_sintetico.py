@@ -0,0 +1,75 @@
+"""
+===========================================================================
+ Script: Generacion de mercado sintetico - LeanTech Trading
+===========================================================================
+
+Descripcion:
+------------
+Escribe un historico OHLCV sintetico (un parquet por simbolo, mismo
+formato que data/historic) y el symbol_groups.json correspondiente,
+usando my_modules.mercado_sintetico. Sirve para probar escala (p.ej.
+5000 simbolos x 20 anios) y casos limite (gaps, picos de volumen,
+halts, dias faltantes) sin datos externos.
+
+- --param clave=valor sobrescribe PARAMETROS del generador (valor JSON)
+- Junto al historico se deja sintetico.json con semilla, version,
+  parametros y tiempos
+
+Uso:
+----
+python gen_mercado_sintetico.py --simbolos 5000 --anios 20
+python gen_mercado_sintetico.py --simbolos 50 --salida /tmp/sint/historic --grupos /tmp/sint/symbol_groups.json
+python gen_mercado_sintetico.py --param prob_gap=0.05 --param halts_anio=1
+
+===========================================================================
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_DIR))
+
+from my_modules.mercado_sintetico import PARAMETROS, SEMILLA, escribir_grupos, escribir_historico
+
+SALIDA_DEFECTO = REPO_DIR / "data" / "sintetico" / "historic"
+
+def parsear_parametros(pares):
+    parametros = {}
+    for par in pares or []:
+        clave, _, valor = par.partition("=")
+        if clave not in PARAMETROS:
+            raise SystemExit(f"Parametro desconocido: {clave} (validos: {', '.join(PARAMETROS)})")
+        valor = json.loads(valor)
+        parametros[clave] = tuple(valor) if isinstance(valor, list) else valor
+    return parametros
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un historico OHLCV sintetico")
+    parser.add_argument("--simbolos", type=int, default=50)
+    parser.add_argument("--anios", type=float, default=1)
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--salida", default=str(SALIDA_DEFECTO), help="Directorio de los parquet")
+    parser.add_argument("--grupos", default=None, help="Ruta del symbol_groups.json (por defecto junto a --salida)")
+    parser.add_argument("--tam-grupo", type=int, default=5)
+    parser.add_argument("--hilos", type=int, default=min(8, os.cpu_count() or 1))
+    parser.add_argument("--param", action="append", help="clave=valor (JSON) para PARAMETROS")
+    args = parser.parse_args(argv)
+
+    parametros = parsear_parametros(args.param)
+    salida = Path(args.salida)
+    resumen = escribir_historico(salida, args.simbolos, args.anios, args.semilla, hilos=args.hilos, **parametros)
+    grupos_path = Path(args.grupos) if args.grupos else salida.parent / "symbol_groups.json"
+    escribir_grupos(resumen["simbolos"], grupos_path, args.tam_grupo)
+
+    meta = {k: v for k, v in resumen.items() if k != "simbolos"}
+    meta.update(n_simbolos=len(resumen["simbolos"]), parametros=dict(PARAMETROS, **parametros), grupos=str(grupos_path))
+    with open(salida / "sintetico.json", "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"{meta['n_simbolos']} simbolos, {meta['filas']} filas en {salida} ({meta['duracion_s']}s); grupos en {grupos_path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
 import os
+import sys
+import argparse
 import boto3
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 
+sys.path.append("/home/ubuntu/tr")
+
+from my_modules.cambios_ingesta import agregar_argumento, simbolos_a_procesar
+
 # === CONFIGURACION ===
 PROFILE = "ses-trading"
 BUCKET_NAME = "apariciodevcom"
 S3_KEY = "trading/datos.html"
 LOCAL_DIR = "/home/ubuntu/tr/data/historic_reciente"
 LOG_FILE = f"/home/ubuntu/tr/logs/utils/pub_{datetime.now().date()}.log"
+FILAS_CACHE = "/home/ubuntu/tr/data/cache/pub_filas.parquet"
 
 session = boto3.Session(profile_name=PROFILE)
 s3 = session.client("s3")
@@ -49,8 +56,7 @@ def detectar_tendencia(close_series):
     return "↑" if b > a else "↓"
 
 # === PROCESAR DATOS ===
-def procesar_archivos():
-    archivos = sorted(Path(LOCAL_DIR).glob("*.parquet"))
+def procesar_archivos(archivos):
     filas = []
 
     for archivo in archivos:
@@ -129,8 +135,27 @@ def subir_html(html_content):
 
 # === MAIN ===
 def main():
+    args = agregar_argumento(argparse.ArgumentParser(description="Publica tabla OHLCV en S3")).parse_args()
     os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-    df = procesar_archivos()
+    os.makedirs(os.path.dirname(FILAS_CACHE), exist_ok=True)
+
+    archivos = {a.stem.upper(): a for a in Path(LOCAL_DIR).glob("*.parquet")}
+    simbolos, modo = simbolos_a_procesar(archivos, args.cambios)
+    if modo == "incremental" and not os.path.exists(FILAS_CACHE):
+        simbolos, modo = sorted(archivos), "completo"
+    log(f"Modo {modo}: {len(simbolos)} simbolos a procesar")
+
+    df = procesar_archivos([archivos[s] for s in simbolos])
+    if modo == "incremental":
+        # Filas ya formateadas de los simbolos sin cambios
+        df_prev = pd.read_parquet(FILAS_CACHE)
+        df_prev = df_prev[df_prev["simbolo"].isin(archivos.keys())]
+        if not df.empty:
+            df_prev = df_prev[~df_prev["simbolo"].isin(df["simbolo"])]
+        df = pd.concat([df_prev, df], ignore_index=True)
+    if not df.empty:
+        df.to_parquet(FILAS_CACHE, index=False)
+
     if df.empty:
         log("No se encontraron datos validos para generar HTML.")
         return
@@ -14,16 +14,19 @@ fuera del ciclo de ingesta automatizada por Lambda.
 
 Acciones principales:
 - Carga todos los simbolos definidos en symbol_groups.json
-- Solicita a la API hasta 5000 datos diarios por simbolo
+- Solicita a la API hasta 5000 datos diarios por simbolo, en paralelo
+  dentro de la cuota del plan (token bucket + reintentos con backoff)
 - Convierte y normaliza columnas numericas y de fecha
 - Aplica un recorte por fecha si esta activado
 - Guarda archivos .parquet por simbolo
+- Mantiene un checkpoint para reanudar en el primer simbolo faltante
 - Registra un log local por simbolo y evento
 
 Archivos involucrados:
 ----------------------
 - Config entrada:   /home/ubuntu/tr/config/symbol_groups.json
 - Salida datos:     /home/ubuntu/tr/data/historic_recuperado/{SIMBOLO}.parquet
+- Checkpoint:       /home/ubuntu/tr/data/historic_recuperado/_checkpoint.json
 - Log de ejecucion: /home/ubuntu/tr/logs/utils/recuperar_YYYY-MM-DD.log
 
 Formato de datos:
@@ -35,22 +38,36 @@ Parametros configurables:
 -------------------------
 - RESPETAR_FECHA_LIMITE: bool
 - FECHA_LIMITE: YYYY-MM-DD (incluyente)
+- REQUESTS_POR_MINUTO: cuota del plan de Twelve Data (un request cada
+  60/REQUESTS_POR_MINUTO s)
+- MAX_EN_VUELO: requests concurrentes maximos
+- MAX_REINTENTOS / BACKOFF_BASE: reintentos ante 429, 5xx o fallos de red
+- TWELVE_API_URL (env): permite apuntar a un servidor HTTP local de pruebas
+
+Uso:
+----
+python recuperar_historico.py               # reanuda desde el checkpoint
+python recuperar_historico.py --reiniciar   # borra salida y checkpoint
 
 Notas:
 ------
-- Sobrescribe todos los archivos .parquet existentes antes de iniciar
-- Limita el ritmo de requests a ~5/minuto por simbolo
+- Solo borra los .parquet existentes con --reiniciar o si cambia FECHA_LIMITE
+- El tiempo total queda acotado por la cuota de la API, no por sleeps fijos
 - No requiere acceso a S3 ni permisos IAM
 
 Autor:        LeanTech
-Ultima ed.:   2025-06-01
+Ultima ed.:   2025-06-10
 
 ===========================================================================
 """
 
 import os
+import sys
 import json
 import time
+import random
+import asyncio
+import argparse
 import requests
 import pandas as pd
 from datetime import datetime
@@ -63,19 +80,21 @@ FECHA_LIMITE = "2025-05-28"
 BASE_DIR = "/home/ubuntu/tr"
 OUTPUT_DIR = f"{BASE_DIR}/data/historic_recuperado"
 CONFIG_PATH = f"{BASE_DIR}/config/symbol_groups.json"
+CHECKPOINT_PATH = f"{OUTPUT_DIR}/_checkpoint.json"
 LOG_FILE = f"{BASE_DIR}/logs/utils/recuperar_{datetime.now().date()}.log"
 
+# === CUOTA API (plan Twelve Data) ===
+API_URL = os.getenv("TWELVE_API_URL", "https://api.twelvedata.com/time_series")
+REQUESTS_POR_MINUTO = 8
+MAX_EN_VUELO = 4
+MAX_REINTENTOS = 5
+BACKOFF_BASE = 2.0
+TIMEOUT_HTTP = 30
+
 # === API KEY ===
 load_dotenv(f"{BASE_DIR}/.keys.sh")
 API_KEY = os.getenv("TWELVE_API_KEY")
 
-# === CREAR RUTAS ===
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-
-for f in Path(OUTPUT_DIR).glob("*.parquet"):
-    f.unlink()
-
 
 # === FUNCIONES ===
 def log(msg):
@@ -85,17 +104,48 @@ def log(msg):
     with open(LOG_FILE, "a") as f:
         f.write(linea + "\n")
 
+class ErrorReintentable(Exception):
+    """Fallo transitorio de la API (429, 5xx, red) que merece reintento."""
+
+class TokenBucket:
+    """Limitador token bucket: `capacidad` tokens, recarga a `tasa` tokens/s."""
+
+    def __init__(self, capacidad, tasa):
+        self.capacidad = capacidad
+        self.tasa = tasa
+        self.tokens = float(capacidad)
+        self.ultimo = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def adquirir(self):
+        async with self.lock:
+            while True:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.tasa)
+
 def fetch_data(symbol):
-    url = "https://api.twelvedata.com/time_series"
     params = {
         "symbol": symbol,
         "interval": "1day",
         "outputsize": 5000,
         "apikey": API_KEY
     }
-    response = requests.get(url, params=params)
+    try:
+        response = requests.get(API_URL, params=params, timeout=TIMEOUT_HTTP)
+    except requests.RequestException as e:
+        raise ErrorReintentable(f"red: {e}")
+    if response.status_code == 429 or response.status_code >= 500:
+        raise ErrorReintentable(f"HTTP {response.status_code}")
     data = response.json()
     if "values" not in data:
+        # Twelve Data responde 200 con {"code": 429, ...} al agotar creditos
+        if data.get("code") == 429 or data.get("code", 0) >= 500:
+            raise ErrorReintentable(f"API {data.get('code')}: {data.get('message')}")
         raise ValueError(f"sin datos: {data}")
     df = pd.DataFrame(data["values"])
     for col in ["open", "high", "low", "close", "volume"]:
@@ -111,10 +161,80 @@ def guardar_parquet(df, symbol):
     df = df.drop(columns=["datetime"])
     df = df[["fecha", "open", "high", "low", "close", "volume"]]
     out_path = os.path.join(OUTPUT_DIR, f"{symbol}.parquet")
-    df.to_parquet(out_path, index=False)
+    tmp_path = out_path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, out_path)
+
+# === CHECKPOINT ===
+def firma_ejecucion():
+    return {"fecha_limite": FECHA_LIMITE if RESPETAR_FECHA_LIMITE else None}
+
+def cargar_checkpoint():
+    if not os.path.exists(CHECKPOINT_PATH):
+        return set()
+    try:
+        with open(CHECKPOINT_PATH, "r") as f:
+            data = json.load(f)
+    except Exception as e:
+        log(f"WARN checkpoint ilegible, se ignora: {e}")
+        return set()
+    if data.get("firma") != firma_ejecucion():
+        log("Checkpoint de otra configuracion (FECHA_LIMITE), se reinicia")
+        return None
+    # Solo cuenta como completado si el parquet sigue en disco
+    return {s for s in data.get("completados", []) if os.path.exists(os.path.join(OUTPUT_DIR, f"{s}.parquet"))}
+
+def guardar_checkpoint(completados):
+    tmp_path = CHECKPOINT_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"firma": firma_ejecucion(), "completados": sorted(completados)}, f, indent=2)
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+def limpiar_salida():
+    for f in Path(OUTPUT_DIR).glob("*.parquet"):
+        f.unlink()
+    if os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+
+# === DESCARGA CONCURRENTE ===
+async def recuperar_simbolo(simbolo, bucket, semaforo, completados):
+    for intento in range(1, MAX_REINTENTOS + 1):
+        await bucket.adquirir()
+        try:
+            async with semaforo:
+                df = await asyncio.to_thread(fetch_data, simbolo)
+                await asyncio.to_thread(guardar_parquet, df, simbolo)
+        except ErrorReintentable as e:
+            espera = BACKOFF_BASE ** intento + random.uniform(0, 1)
+            log(f"RETRY {simbolo} ({intento}/{MAX_REINTENTOS}) en {espera:.1f}s: {e}")
+            await asyncio.sleep(espera)
+            continue
+        except Exception as e:
+            log(f"ERROR {simbolo}: {e}")
+            return False
+        completados.add(simbolo)
+        guardar_checkpoint(completados)
+        log(f"OK {simbolo}: {len(df)} filas")
+        return True
+    log(f"ERROR {simbolo}: reintentos agotados")
+    return False
+
+async def recuperar_todos(simbolos, completados):
+    # Capacidad 1: requests espaciados 60/REQUESTS_POR_MINUTO s, sin rafaga inicial que exceda la cuota
+    bucket = TokenBucket(1, REQUESTS_POR_MINUTO / 60.0)
+    semaforo = asyncio.Semaphore(MAX_EN_VUELO)
+    tareas = [recuperar_simbolo(s, bucket, semaforo, completados) for s in simbolos]
+    return await asyncio.gather(*tareas)
 
 # === FLUJO PRINCIPAL ===
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recuperacion historica desde Twelve Data")
+    parser.add_argument("--reiniciar", action="store_true", help="Borra parquet y checkpoint antes de iniciar")
+    args = parser.parse_args(argv)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+
     try:
         with open(CONFIG_PATH, "r") as f:
             grupos = json.load(f)
@@ -122,19 +242,24 @@ def main():
         log(f"ERROR al leer symbol_groups.json: {e}")
         return
 
-    total = 0
-    for grupo, simbolos in grupos.items():
-        for simbolo in simbolos:
-            try:
-                df = fetch_data(simbolo)
-                guardar_parquet(df, simbolo)
-                log(f"OK {simbolo}: {len(df)} filas")
-                total += 1
-            except Exception as e:
-                log(f"ERROR {simbolo}: {e}")
-            time.sleep(12)
-
-    log(f"Proceso completado. Simbolos procesados: {total}")
+    simbolos = sorted(set(sum(grupos.values(), [])))
+
+    completados = None if args.reiniciar else cargar_checkpoint()
+    if completados is None:
+        limpiar_salida()
+        completados = set()
+
+    pendientes = [s for s in simbolos if s not in completados]
+    log(f"Simbolos: {len(simbolos)} | ya recuperados: {len(simbolos) - len(pendientes)} | pendientes: {len(pendientes)}")
+
+    inicio = time.monotonic()
+    resultados = asyncio.run(recuperar_todos(pendientes, completados)) if pendientes else []
+    total = sum(1 for r in resultados if r)
+    dur = round(time.monotonic() - inicio, 2)
+
+    log(f"Proceso completado. Simbolos procesados: {total} de {len(pendientes)} en {dur}s")
+    if total < len(pendientes):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
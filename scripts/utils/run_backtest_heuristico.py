@@ -1,15 +1,34 @@
 #!/usr/bin/env python3
 import os
 import sys
+import numpy as np
 import pandas as pd
 import logging
 import json
 import importlib
+import argparse
 from datetime import datetime, timedelta
 
 # === CONFIGURACION ===
 BASE_DIR = "/home/ec2-user/tr"
 sys.path.append(BASE_DIR)
+from my_modules.calendario_trading import cargar_calendario, CALENDARIO_PATH
+from my_modules.cache_incremental import ManifiestoIncremental, huella_archivo, huella_estrategia, combinar
+from my_modules.logger_estrategia import contexto_simbolo, emitir_resumen, fijar_verbosidad
+from my_modules.estado_sistema import guardar_estado
+from my_modules.metricas import exportar_al_salir, medir
+from my_modules.recursos_job import anotar_volumen, iniciar_muestreo
+from my_modules.perfilado import activar_perfilado, agregar_argumento_perfil, perfilar
+
+parser = argparse.ArgumentParser(description="Senales + backtest heuristico completo")
+parser.add_argument("--force", action="store_true", help="Ignora el manifiesto y recalcula todos los pares")
+parser.add_argument("--verbose", action="store_true", help="Log por llamada de cada estrategia (por defecto solo resumen)")
+args = agregar_argumento_perfil(parser).parse_args()
+fijar_verbosidad(args.verbose)
+activar_perfilado("backtest_heuristico", args.profile)
+exportar_al_salir("backtest_heuristico")
+iniciar_muestreo("backtest_heuristico")
+
 HISTORIC_DIR = f"{BASE_DIR}/data/historic"
 SENALES_DIR = f"{BASE_DIR}/reports/senales_historicas"
 RESULTADOS_DIR = f"{BASE_DIR}/reports/backtest_heuristicas"
@@ -18,10 +37,12 @@ RESUMEN_PATH = os.path.join(RESULTADOS_DIR, "resumen_metricas_full.csv")
 LOG_DIR = f"{BASE_DIR}/logs/backtest"
 GRUPOS_PATH = f"{BASE_DIR}/config/symbol_groups.json"
 ESTRATEGIAS_DIR = f"{BASE_DIR}/my_modules/estrategias"
-STATUS_FILE = os.path.join(SUMMARY_DIR, "system_status.json")
+MANIFIESTO_PATH = f"{BASE_DIR}/cache/backtest_heuristico/manifiesto.json"
 DIAS = 360
-DIAS_HOLD = 3
+DIAS_HOLD = 3  # sesiones de mercado, no dias naturales
+CALENDARIO = cargar_calendario()
 FECHA = datetime.utcnow().strftime("%Y-%m-%d")
+FECHA_CORTE = datetime.utcnow().date() - timedelta(days=DIAS)
 
 os.makedirs(SENALES_DIR, exist_ok=True)
 os.makedirs(RESULTADOS_DIR, exist_ok=True)
@@ -43,22 +64,6 @@ fh2 = logging.FileHandler(log_persistente)
 fh2.setFormatter(formatter)
 logger.addHandler(fh2)
 
-# === FUNCION ESTANDAR DE ESTADO ===
-def guardar_estado(modulo, status, mensaje):
-    now_str = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    status_obj = {}
-    if os.path.exists(STATUS_FILE):
-        with open(STATUS_FILE, "r") as f:
-            status_obj = json.load(f)
-    status_obj[modulo] = {
-        "fecha": FECHA,
-        "ultima_ejecucion": now_str,
-        "status": status,
-        "mensaje": mensaje
-    }
-    with open(STATUS_FILE, "w") as f:
-        json.dump(status_obj, f, indent=2)
-
 # === Cargar simbolos ===
 symbols = set()
 try:
@@ -84,29 +89,43 @@ for archivo in os.listdir(ESTRATEGIAS_DIR):
         except Exception as e:
             logger.error(f"Error al cargar {nombre}: {str(e)}")
 
+manifiesto = ManifiestoIncremental(MANIFIESTO_PATH, forzar=args.force)
+huellas_estrategias = {nombre: huella_estrategia(funcion) for nombre, funcion in estrategias.items()}
+huella_calendario = huella_archivo(CALENDARIO_PATH)
+
 # === Paso 1: Generar señales ===
+def cargar_precios_recortados(path):
+    df = pd.read_parquet(path)
+    df["datetime"] = pd.to_datetime(df["datetime"])
+    df.set_index("datetime", inplace=True)
+    return df[df.index.date >= FECHA_CORTE]
+
 for symbol in sorted(symbols):
     path = os.path.join(HISTORIC_DIR, f"{symbol}.parquet")
     if not os.path.exists(path):
         logger.warning(f"{symbol} sin historico")
         continue
     try:
-        df = pd.read_parquet(path)
-        df["datetime"] = pd.to_datetime(df["datetime"])
-        df.set_index("datetime", inplace=True)
-        fecha_corte = datetime.utcnow().date() - timedelta(days=DIAS)
-        df = df[df.index.date >= fecha_corte]
-        if df.empty:
-            logger.warning(f"{symbol} sin datos suficientes")
-            continue
-
+        huella_precio = huella_archivo(path)
+        df = None
         for nombre, funcion in estrategias.items():
+            clave = f"{symbol}|{nombre}"
+            huella = combinar(huella_precio, huellas_estrategias[nombre], FECHA_CORTE)
+            if manifiesto.vigente("senales", clave, huella):
+                continue
+            if df is None:
+                df = cargar_precios_recortados(path)
+            if df.empty:
+                logger.warning(f"{symbol} sin datos suficientes")
+                break
             try:
-                df_senales = funcion(df)
+                with contexto_simbolo(symbol):
+                    df_senales = funcion(df)
                 if "fecha" in df_senales.columns and "signal" in df_senales.columns:
                     df_senales = df_senales[["fecha", "signal"]]
                     salida = os.path.join(SENALES_DIR, f"{symbol}_{nombre}.csv")
                     df_senales.to_csv(salida, index=False)
+                    manifiesto.registrar("senales", clave, huella, [salida])
                     logger.info(f"{symbol} - {nombre} señales OK")
                 else:
                     logger.warning(f"{symbol} - {nombre} columnas faltantes")
@@ -115,34 +134,44 @@ for symbol in sorted(symbols):
     except Exception as e:
         logger.error(f"{symbol} fallo al leer historico: {str(e)}")
 
+anotar_volumen(simbolos=len(symbols))
+for nombre, r in emitir_resumen().items():
+    logger.info(f"{nombre} resumen senales: llamadas={r['llamadas']} buy={r['buy']} sell={r['sell']} errores={r['errores']} tiempo={r['duracion_s']}s")
+
 # === Paso 2: Backtest ===
 def backtest(df_signals, df_prices):
-    operaciones = []
     df_prices.index = pd.to_datetime(df_prices.index)
+    df_prices = df_prices[~df_prices.index.duplicated(keep="last")].sort_index()
     df_signals["fecha"] = pd.to_datetime(df_signals["fecha"])
-    df_signals = df_signals[df_signals["signal"] == "buy"]
-    for fecha_entrada in df_signals["fecha"]:
-        if fecha_entrada not in df_prices.index:
-            continue
-        try:
-            precio_entrada = df_prices.loc[fecha_entrada]["close"]
-            fecha_salida = fecha_entrada + timedelta(days=DIAS_HOLD)
-            df_sal = df_prices[df_prices.index > fecha_entrada]
-            df_sal = df_sal[df_sal.index <= fecha_salida]
-            if df_sal.empty:
-                continue
-            precio_salida = df_sal.iloc[-1]["close"]
-            retorno = (precio_salida - precio_entrada) / precio_entrada * 100
-            operaciones.append({
-                "fecha_entrada": fecha_entrada.date(),
-                "precio_entrada": round(precio_entrada, 2),
-                "fecha_salida": df_sal.index[-1].date(),
-                "precio_salida": round(precio_salida, 2),
-                "retorno_pct": round(retorno, 2)
-            })
-        except Exception as e:
-            logger.warning(f"Backtest error en {fecha_entrada}: {e}")
-    return operaciones
+    entradas = df_signals.loc[df_signals["signal"] == "buy", "fecha"]
+    entradas = entradas[entradas.isin(df_prices.index)]
+    if entradas.empty:
+        return []
+
+    fechas_precio = df_prices.index.values.astype("datetime64[D]")
+    close = df_prices["close"].to_numpy(dtype=float)
+    dias_entrada = entradas.values.astype("datetime64[D]")
+
+    # Salida a DIAS_HOLD sesiones; si esa sesion falta en el historico, ultima barra previa
+    pos_entrada = np.searchsorted(fechas_precio, dias_entrada)
+    objetivo = CALENDARIO.offset(dias_entrada, DIAS_HOLD)
+    pos_salida = np.searchsorted(fechas_precio, objetivo, side="right") - 1
+    valido = ~np.isnat(objetivo) & (pos_salida > pos_entrada)
+    if not valido.any():
+        return []
+
+    pos_entrada, pos_salida = pos_entrada[valido], pos_salida[valido]
+    precio_entrada = close[pos_entrada]
+    precio_salida = close[pos_salida]
+    df_ops = pd.DataFrame({
+        "fecha_entrada": df_prices.index[pos_entrada].date,
+        "precio_entrada": precio_entrada.round(2),
+        "fecha_salida": df_prices.index[pos_salida].date,
+        "precio_salida": precio_salida.round(2),
+        "retorno_pct": ((precio_salida - precio_entrada) / precio_entrada * 100).round(2),
+        "sesiones": CALENDARIO.sessions_between(fechas_precio[pos_entrada], fechas_precio[pos_salida]),
+    })
+    return df_ops.to_dict("records")
 
 # === Ejecutar backtest ===
 for archivo in os.listdir(SENALES_DIR):
@@ -155,21 +184,62 @@ for archivo in os.listdir(SENALES_DIR):
             if not os.path.exists(ruta_hist):
                 logger.warning(f"{symbol} historico no encontrado para backtest")
                 continue
+            clave = f"{symbol}|{estrategia}"
+            ruta_bt = os.path.join(RESULTADOS_DIR, f"{symbol}_{estrategia}_bt.csv")
+            huella = combinar(huella_archivo(ruta), huella_archivo(ruta_hist), DIAS_HOLD, huella_calendario)
+            if manifiesto.vigente("backtest", clave, huella):
+                continue
             df_senales = pd.read_csv(ruta)
             df_precio = pd.read_parquet(ruta_hist)
             df_precio["datetime"] = pd.to_datetime(df_precio["datetime"])
             df_precio.set_index("datetime", inplace=True)
-            ops = backtest(df_senales, df_precio)
+            with medir("backtest_segundos", etapa="backtest_heuristico", simbolo=symbol, estrategia=estrategia), perfilar("backtest"):
+                ops = backtest(df_senales, df_precio)
             if ops:
                 df_result = pd.DataFrame(ops)
-                df_result.to_csv(os.path.join(RESULTADOS_DIR, f"{symbol}_{estrategia}_bt.csv"), index=False)
+                df_result.to_csv(ruta_bt, index=False)
+                manifiesto.registrar("backtest", clave, huella, [ruta_bt])
                 logger.info(f"{symbol} - {estrategia} backtest OK con {len(ops)} operaciones")
             else:
+                if os.path.exists(ruta_bt):
+                    os.remove(ruta_bt)
+                manifiesto.registrar("backtest", clave, huella, [])
                 logger.info(f"{symbol} - {estrategia} sin operaciones")
         except Exception as e:
             logger.error(f"Fallo backtest {archivo}: {str(e)}")
 
+manifiesto.guardar()
+for etapa, r in manifiesto.reporte().items():
+    logger.info(f"Cache {etapa}: hits={r['hits']} misses={r['misses']} ratio={r['ratio_hits']}")
+
 # === Paso 3: Calculo de metricas ===
+def calcular_metricas(df, symbol, estrategia):
+    total_ops = len(df)
+    ganadoras = df[df["retorno_pct"] > 0]
+    perdedoras = df[df["retorno_pct"] <= 0]
+    promedio = df["retorno_pct"].mean()
+    mediana = df["retorno_pct"].median()
+    ganancia_total = ganadoras["retorno_pct"].sum()
+    perdida_total = perdedoras["retorno_pct"].sum()
+    profit_factor = round((ganancia_total / abs(perdida_total)) if perdida_total != 0 else float("inf"), 2)
+    win_rate = round(len(ganadoras) / total_ops * 100, 2)
+    payoff_ratio = round(ganadoras["retorno_pct"].mean() / abs(perdedoras["retorno_pct"].mean()), 2) if not perdedoras.empty else float("inf")
+    std = df["retorno_pct"].std()
+    sharpe = round(promedio / std, 2) if std > 0 else float("inf")
+    drawdown = round(df["retorno_pct"].cumsum().cummax() - df["retorno_pct"].cumsum(), 2).max()
+    return {
+        "Simbolo": symbol,
+        "Estrategia": estrategia,
+        "Operaciones": total_ops,
+        "WinRate_%": win_rate,
+        "RetornoPromedio_%": round(promedio, 2),
+        "MedianaRetorno_%": round(mediana, 2),
+        "ProfitFactor": profit_factor,
+        "PayoffRatio": payoff_ratio,
+        "SharpeSimplificado": sharpe,
+        "DrawdownMax_%": drawdown
+    }
+
 registros = []
 for archivo in os.listdir(RESULTADOS_DIR):
     if archivo.endswith("_bt.csv"):
@@ -180,31 +250,7 @@ for archivo in os.listdir(RESULTADOS_DIR):
                 continue
             symbol = archivo.split("_")[0]
             estrategia = "_".join(archivo.replace("_bt.csv", "").split("_")[1:])
-            total_ops = len(df)
-            ganadoras = df[df["retorno_pct"] > 0]
-            perdedoras = df[df["retorno_pct"] <= 0]
-            promedio = df["retorno_pct"].mean()
-            mediana = df["retorno_pct"].median()
-            ganancia_total = ganadoras["retorno_pct"].sum()
-            perdida_total = perdedoras["retorno_pct"].sum()
-            profit_factor = round((ganancia_total / abs(perdida_total)) if perdida_total != 0 else float("inf"), 2)
-            win_rate = round(len(ganadoras) / total_ops * 100, 2)
-            payoff_ratio = round(ganadoras["retorno_pct"].mean() / abs(perdedoras["retorno_pct"].mean()), 2) if not perdedoras.empty else float("inf")
-            std = df["retorno_pct"].std()
-            sharpe = round(promedio / std, 2) if std > 0 else float("inf")
-            drawdown = round(df["retorno_pct"].cumsum().cummax() - df["retorno_pct"].cumsum(), 2).max()
-            registros.append({
-                "Simbolo": symbol,
-                "Estrategia": estrategia,
-                "Operaciones": total_ops,
-                "WinRate_%": win_rate,
-                "RetornoPromedio_%": round(promedio, 2),
-                "MedianaRetorno_%": round(mediana, 2),
-                "ProfitFactor": profit_factor,
-                "PayoffRatio": payoff_ratio,
-                "SharpeSimplificado": sharpe,
-                "DrawdownMax_%": drawdown
-            })
+            registros.append(calcular_metricas(df, symbol, estrategia))
         except Exception as e:
             logger.warning(f"Error leyendo resultados de {archivo}: {e}")
 
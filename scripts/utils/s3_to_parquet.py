@@ -1,10 +1,15 @@
 import os
+import sys
 import boto3
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 import shutil
 
+sys.path.append("/home/ubuntu/tr")
+
+from my_modules.metricas import contar, exportar_al_salir, medir
+
 BUCKET_NAME = "leantech-trading"
 S3_PREFIX = "data/historic/"
 OUTPUT_DIR = Path("/home/ubuntu/tr/data/historic/")
@@ -30,17 +35,22 @@ def descargar_y_convertir(symbol):
     local_parquet = OUTPUT_DIR / f"{symbol}.parquet"
     try:
         inicio = datetime.now()
-        obj = s3.get_object(Bucket=BUCKET_NAME, Key=s3_key)
-        df = pd.read_csv(obj["Body"])
-        df["datetime"] = pd.to_datetime(df["datetime"])
-        df = df.sort_values("datetime").reset_index(drop=True)
-        df.to_parquet(local_parquet, index=False)
+        with medir("descarga_segundos", etapa="s3_to_parquet", simbolo=symbol):
+            obj = s3.get_object(Bucket=BUCKET_NAME, Key=s3_key)
+            df = pd.read_csv(obj["Body"])
+        with medir("escritura_segundos", etapa="s3_to_parquet", simbolo=symbol):
+            df["datetime"] = pd.to_datetime(df["datetime"])
+            df = df.sort_values("datetime").reset_index(drop=True)
+            df.to_parquet(local_parquet, index=False)
+        contar("filas", len(df), etapa="s3_to_parquet", simbolo=symbol)
         log_event("s3_to_parquet", "OK", f"{symbol} procesado", inicio)
     except Exception as e:
+        contar("errores", etapa="s3_to_parquet", simbolo=symbol)
         log_event("s3_to_parquet", "ERROR", f"{symbol} fallo: {str(e)}", inicio)
         
 def main():
     import json
+    exportar_al_salir("s3_to_parquet")
     total_inicio = datetime.now()
     procesados = 0
 
@@ -47,12 +47,13 @@ import traceback
 import sys
 sys.path.append("/home/ubuntu/tr")
 
+from my_modules.estado_sistema import guardar_estado
+
 # === CONFIGURACION ===
 CONFIG_PATH = Path("/home/ubuntu/tr/config/symbol_groups.json")
 HISTORIC_PATH = Path("/home/ubuntu/tr/data/historic")
 OUTPUT_PATH = Path("/home/ubuntu/tr/reports/senales_heuristicas/historicas")
 LOG_PATH = Path(f"/home/ubuntu/tr/logs/utils/shu_{datetime.now().date()}.csv")
-STATUS_PATH = Path("/home/ubuntu/tr/config/system_status.json")
 ESTRATEGIAS_DIR = "my_modules.estrategias"
 
 # === CARGAR SIMBOLOS ===
@@ -119,13 +120,10 @@ for simbolo in SIMBOLOS:
 log_event("shu", "RESUMEN", f"{len(SIMBOLOS)-len(errores)} de {len(SIMBOLOS)} procesados", inicio_total)
 
 # === ACTUALIZAR ESTADO ===
-estado = {
-    "fecha": datetime.now().strftime("%Y-%m-%d"),
-    "status": "OK" if not errores else "ERROR",
-    "mensaje": f"{len(SIMBOLOS)-len(errores)} de {len(SIMBOLOS)} procesados correctamente"
-}
-with open(STATUS_PATH, "r") as f:
-    status_json = json.load(f)
-status_json["senales_heuristicas"] = estado
-with open(STATUS_PATH, "w") as f:
-    json.dump(status_json, f, indent=2)
+guardar_estado(
+    "senales_heuristicas",
+    "OK" if not errores else "ERROR",
+    f"{len(SIMBOLOS)-len(errores)} de {len(SIMBOLOS)} procesados correctamente",
+    fecha=datetime.now().strftime("%Y-%m-%d"),
+    inicio=inicio_total,
+)
@@ -12,7 +12,14 @@ Mejoras implementadas:
 -----------------------
 - Log de estrategias cargadas exitosamente
 - Log por símbolo de estrategias que generaron señales
-- Limpieza del directorio de salida antes de ejecutar
+- Recomputo incremental: cada par (simbolo, estrategia) se reutiliza desde
+  la cache si no cambiaron ni el parquet ni el fuente/parametros de la
+  estrategia (manifiesto por hash de contenido)
+- El CSV de cada simbolo se reescribe cuando cambia la lista de pares que
+  contribuyen (estrategia nueva, borrada o con error); los CSV de simbolos
+  fuera de symbol_groups.json se eliminan
+- --force: limpia el directorio de salida y recalcula todo
+- --profile: perfila cada estrategia con cProfile (reports/profiling/shu_cro)
 
 Ubicación de estrategias:
 --------------------------
@@ -29,18 +36,36 @@ from datetime import datetime
 from pathlib import Path
 from importlib import import_module
 import traceback
+import argparse
 import sys
 
 sys.path.append("/home/ubuntu/tr")
 
+from my_modules.cache_incremental import ManifiestoIncremental, huella_archivo, huella_estrategia, combinar
+from my_modules.logger_estrategia import contexto_simbolo, emitir_resumen, fijar_verbosidad
+from my_modules.estado_sistema import guardar_estado
+from my_modules.metricas import contar, exportar_al_salir, observar
+from my_modules.recursos_job import anotar_volumen, iniciar_muestreo
+from my_modules.perfilado import activar_perfilado, agregar_argumento_perfil
+
+parser = argparse.ArgumentParser(description="Generacion de senales heuristicas historicas")
+parser.add_argument("--force", action="store_true", help="Ignora la cache y recalcula todos los pares")
+parser.add_argument("--verbose", action="store_true", help="Log por llamada de cada estrategia (por defecto solo resumen)")
+args = agregar_argumento_perfil(parser).parse_args()
+fijar_verbosidad(args.verbose)
+activar_perfilado("shu_cro", args.profile)
+exportar_al_salir("shu_cro")
+iniciar_muestreo("shu_cro")
+
 # === CONFIGURACION ===
 CONFIG_PATH = Path("/home/ubuntu/tr/config/symbol_groups.json")
 HISTORIC_PATH = Path("/home/ubuntu/tr/data/historic")
 OUTPUT_PATH = Path("/home/ubuntu/tr/reports/senales_heuristicas/historicas")
 LOG_PATH = Path(f"/home/ubuntu/tr/logs/utils/shu_{datetime.now().date()}.csv")
-STATUS_PATH = Path("/home/ubuntu/tr/config/system_status.json")
 ESTRATEGIAS_DIR = "my_modules.estrategias"
 ESTRATEGIAS_PATH = "/home/ubuntu/tr/my_modules/estrategias"
+CACHE_DIR = Path("/home/ubuntu/tr/cache/shu")
+MANIFIESTO_PATH = CACHE_DIR / "manifiesto.json"
 
 # === CARGAR SIMBOLOS ===
 with open(CONFIG_PATH, "r") as f:
@@ -73,10 +98,22 @@ def log_event(modulo, status, mensaje, inicio):
 
 log_event("loader", "OK", f"Estrategias cargadas: {', '.join(estrategias_cargadas)}", datetime.now())
 
+huellas_estrategias = {nombre: huella_estrategia(funcion) for nombre, funcion in estrategias.items()}
+manifiesto = ManifiestoIncremental(MANIFIESTO_PATH, forzar=args.force)
+(CACHE_DIR / "senales").mkdir(parents=True, exist_ok=True)
+
 # === LIMPIAR OUTPUT ANTERIOR ===
+# Con --force todo; siempre los CSV de simbolos que ya no estan en symbol_groups.json
 OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
-for f in OUTPUT_PATH.glob("*.csv"):
-    f.unlink()
+if args.force:
+    for f in OUTPUT_PATH.glob("*.csv"):
+        f.unlink()
+for f in OUTPUT_PATH.glob("*_senales.csv"):
+    simbolo_viejo = f.name[:-len("_senales.csv")]
+    if simbolo_viejo not in SIMBOLOS:
+        f.unlink()
+        manifiesto.olvidar("salida", simbolo_viejo)
+        log_event(simbolo_viejo, "LIMPIEZA", f"{f.name} eliminado: simbolo fuera de symbol_groups.json", datetime.now())
 
 # === PROCESAR SIMBOLOS ===
 errores = []
@@ -90,44 +127,80 @@ for simbolo in SIMBOLOS:
         if not archivo.exists():
             raise FileNotFoundError(f"{archivo} no encontrado")
 
-        df = pd.read_parquet(archivo).reset_index(drop=True)
+        huella_precio = huella_archivo(archivo)
+        salida = OUTPUT_PATH / f"{simbolo}_senales.csv"
+        df = None
         resultados = []
+        contribuyentes = []
 
         for nombre_est, funcion in estrategias.items():
+            clave = f"{simbolo}|{nombre_est}"
+            huella = combinar(huella_precio, huellas_estrategias[nombre_est])
             try:
-                df_out = funcion(df.copy())
+                if manifiesto.vigente("senales", clave, huella):
+                    cacheados = manifiesto.salidas("senales", clave)
+                    df_out = pd.read_parquet(cacheados[0]) if cacheados else None
+                else:
+                    if df is None:
+                        df = pd.read_parquet(archivo).reset_index(drop=True)
+                    with contexto_simbolo(simbolo):
+                        df_out = funcion(df.copy())
+                    cache_path = CACHE_DIR / "senales" / f"{simbolo}__{nombre_est}.parquet"
+                    if df_out is not None and not df_out.empty:
+                        df_out["simbolo"] = simbolo
+                        df_out.to_parquet(cache_path, index=False)
+                        manifiesto.registrar("senales", clave, huella, [cache_path])
+                    else:
+                        manifiesto.registrar("senales", clave, huella, [])
                 if df_out is not None and not df_out.empty:
-                    df_out["simbolo"] = simbolo
                     resultados.append(df_out)
                     estrategias_activas.append(nombre_est)
+                    contribuyentes.append(f"{clave}={huella}")
             except Exception as estr_err:
+                manifiesto.olvidar("senales", clave)
                 log_event(nombre_est, "ERROR", f"{simbolo} fallo interno: {estr_err}", inicio)
 
-        if resultados:
+        # La salida depende de que pares contribuyen y con que huella: si una estrategia
+        # desaparece o falla, la lista cambia y el CSV se rehace desde las partes cacheadas
+        huella_salida = combinar(*contribuyentes)
+        if resultados and manifiesto.vigente("salida", simbolo, huella_salida):
+            log_event(simbolo, "CACHE", f"{simbolo} sin cambios - salida reutilizada", inicio)
+        elif resultados:
             df_result = pd.concat(resultados)
             df_result["fecha"] = pd.to_datetime(df_result["fecha"])
             df_result = df_result.sort_values("fecha").reset_index(drop=True)
             df_result["fecha"] = df_result["fecha"].dt.strftime("%Y-%m-%d")
-            df_result.to_csv(OUTPUT_PATH / f"{simbolo}_senales.csv", index=False)
+            df_result.to_csv(salida, index=False)
+            manifiesto.registrar("salida", simbolo, huella_salida, [salida])
             log_event(simbolo, "OK", f"{simbolo} procesado - estrategias: {', '.join(estrategias_activas)}", inicio)
         else:
+            if salida.exists():
+                salida.unlink()
+            manifiesto.olvidar("salida", simbolo)
             log_event(simbolo, "SKIP", f"{simbolo} sin señales generadas", inicio)
 
     except Exception as e:
         errores.append(simbolo)
         log_event(simbolo, "ERROR", f"{simbolo} fallo global: {str(e)}", inicio)
         traceback.print_exc()
+    observar("simbolo_segundos", (datetime.now() - inicio).total_seconds(), etapa="shu_cro", simbolo=simbolo)
 
 log_event("shu", "RESUMEN", f"{len(SIMBOLOS)-len(errores)} de {len(SIMBOLOS)} procesados correctamente", inicio_total)
+anotar_volumen(simbolos=len(SIMBOLOS))
+
+manifiesto.guardar()
+for etapa, r in manifiesto.reporte().items():
+    log_event("cache", "RESUMEN", f"{etapa}: hits={r['hits']} misses={r['misses']} ratio={r['ratio_hits']}", inicio_total)
+    contar("cache", r["hits"], etapa=f"shu_cro_{etapa}", resultado="hit")
+    contar("cache", r["misses"], etapa=f"shu_cro_{etapa}", resultado="miss")
+for nombre_est, r in emitir_resumen().items():
+    log_event(nombre_est, "RESUMEN", f"llamadas={r['llamadas']} buy={r['buy']} sell={r['sell']} errores={r['errores']} tiempo={r['duracion_s']}s", inicio_total)
 
 # === ACTUALIZAR ESTADO ===
-estado = {
-    "fecha": datetime.now().strftime("%Y-%m-%d"),
-    "status": "OK" if not errores else "ERROR",
-    "mensaje": f"{len(SIMBOLOS)-len(errores)} de {len(SIMBOLOS)} procesados correctamente"
-}
-with open(STATUS_PATH, "r") as f:
-    status_json = json.load(f)
-status_json["senales_heuristicas"] = estado
-with open(STATUS_PATH, "w") as f:
-    json.dump(status_json, f, indent=2)
+guardar_estado(
+    "senales_heuristicas",
+    "OK" if not errores else "ERROR",
+    f"{len(SIMBOLOS)-len(errores)} de {len(SIMBOLOS)} procesados correctamente",
+    fecha=datetime.now().strftime("%Y-%m-%d"),
+    inicio=inicio_total,
+)
@@ -5,36 +5,26 @@ from datetime import datetime
 from pathlib import Path
 from importlib import import_module
 import traceback
+import argparse
 import sys
 
 sys.path.append("/home/ubuntu/tr")
 
+from my_modules.cambios_ingesta import agregar_argumento, simbolos_a_procesar
+from my_modules.logger_estrategia import contexto_simbolo, emitir_resumen
+from my_modules.estado_sistema import guardar_estado
+from my_modules.metricas import exportar_al_salir, observar
+from my_modules.perfilado import activar_perfilado, agregar_argumento_perfil
+from my_modules.recursos_job import anotar_volumen, iniciar_muestreo
+
 # === CONFIG ===
 CONFIG_PATH = Path("/home/ubuntu/tr/config/symbol_groups.json")
 HISTORIC_PATH = Path("/home/ubuntu/tr/data/historic_reciente")
 OUTPUT_PATH = Path("/home/ubuntu/tr/reports/senales_heuristicas/diarias")
 LOG_PATH = Path(f"/home/ubuntu/tr/logs/utils/shu_diario_{datetime.now().date()}.csv")
-STATUS_PATH = Path("/home/ubuntu/tr/config/system_status.json")
 ESTRATEGIAS_DIR = "my_modules.estrategias"
 ESTRATEGIAS_PATH = "/home/ubuntu/tr/my_modules/estrategias"
 
-# === CARGAR SIMBOLOS ===
-with open(CONFIG_PATH, "r") as f:
-    grupos = json.load(f)
-SIMBOLOS = sorted(set(sum(grupos.values(), [])))
-
-# === CARGAR ESTRATEGIAS ===
-estrategias = {}
-estrategias_cargadas = []
-for archivo in os.listdir(ESTRATEGIAS_PATH):
-    if archivo.endswith(".py"):
-        try:
-            mod = import_module(f"{ESTRATEGIAS_DIR}.{archivo[:-3]}")
-            estrategias[archivo[:-3]] = mod.generar_senales
-            estrategias_cargadas.append(archivo[:-3])
-        except Exception as e:
-            print(f"[ERROR] No se pudo cargar {archivo}: {e}")
-
 # === LOG ===
 def log_event(modulo, status, mensaje, inicio):
     fin = datetime.now()
@@ -45,73 +35,137 @@ def log_event(modulo, status, mensaje, inicio):
         f.write(linea)
     print(f"[{modulo}] {status}: {mensaje} ({dur}s)")
 
-log_event("loader", "OK", f"Estrategias cargadas: {', '.join(estrategias_cargadas)}", datetime.now())
+# === CARGAR SIMBOLOS ===
+def cargar_simbolos():
+    with open(CONFIG_PATH, "r") as f:
+        grupos = json.load(f)
+    return set(sum(grupos.values(), []))
 
-# === PREPARAR CARPETA OUTPUT ===
-if OUTPUT_PATH.exists():
-    for archivo in OUTPUT_PATH.glob("*"):
-        archivo.unlink()
-else:
-    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+# === CARGAR ESTRATEGIAS ===
+def cargar_estrategias():
+    estrategias = {}
+    for archivo in sorted(os.listdir(ESTRATEGIAS_PATH)):
+        if archivo.endswith(".py"):
+            try:
+                mod = import_module(f"{ESTRATEGIAS_DIR}.{archivo[:-3]}")
+                estrategias[archivo[:-3]] = mod.generar_senales
+            except Exception as e:
+                print(f"[ERROR] No se pudo cargar {archivo}: {e}")
+    log_event("loader", "OK", f"Estrategias cargadas: {', '.join(estrategias)}", datetime.now())
+    return estrategias
 
 # === PROCESAMIENTO ===
-errores = []
-inicio_total = datetime.now()
-
-for simbolo in SIMBOLOS:
-    inicio = datetime.now()
-    estrategias_activas = []
-    try:
-        archivo = HISTORIC_PATH / f"{simbolo}.parquet"
-        if not archivo.exists():
-            raise FileNotFoundError(f"{archivo} no encontrado")
+def senales_simbolo(simbolo, df, estrategias, inicio):
+    """Ejecuta todas las estrategias y devuelve las filas de la ultima fecha (o None)."""
+    if df.empty or "fecha" not in df.columns:
+        raise ValueError("Histórico vacío o sin columna 'fecha'")
 
-        df = pd.read_parquet(archivo).reset_index(drop=True)
-        if df.empty or "fecha" not in df.columns:
-            raise ValueError("Histórico vacío o sin columna 'fecha'")
+    ultima_fecha = df["fecha"].max()
+    log_event(simbolo, "INFO", f"Última fecha en histórico: {ultima_fecha}", inicio)
 
-        ultima_fecha = df["fecha"].max()
-        log_event(simbolo, "INFO", f"Última fecha en histórico: {ultima_fecha}", inicio)
-
-        resultados = []
-        for nombre_est, funcion in estrategias.items():
-            try:
+    resultados = []
+    for nombre_est, funcion in estrategias.items():
+        try:
+            with contexto_simbolo(simbolo):
                 df_out = funcion(df.copy())
-                if df_out is not None and not df_out.empty:
-                    df_out = df_out[df_out["fecha"] == ultima_fecha]
-                    if not df_out.empty:
-                        df_out["simbolo"] = simbolo
-                        df_out["estrategia"] = nombre_est
-                        resultados.append(df_out)
-                        estrategias_activas.append(nombre_est)
-            except Exception as e:
-                log_event(nombre_est, "ERROR", f"{simbolo} fallo interno: {str(e)}", inicio)
-                traceback.print_exc()
-
-        if resultados:
-            df_result = pd.concat(resultados)
-            df_result["fecha"] = pd.to_datetime(df_result["fecha"]).dt.strftime("%Y-%m-%d")
-            archivo_salida = OUTPUT_PATH / f"{simbolo}_senales_diarias.csv"
-            df_result.to_csv(archivo_salida, index=False)
-            log_event(simbolo, "OK", f"{simbolo} procesado - estrategias: {', '.join(estrategias_activas)}", inicio)
+            if df_out is not None and not df_out.empty:
+                df_out = df_out[df_out["fecha"] == ultima_fecha]
+                if not df_out.empty:
+                    df_out["simbolo"] = simbolo
+                    df_out["estrategia"] = nombre_est
+                    resultados.append(df_out)
+        except Exception as e:
+            log_event(nombre_est, "ERROR", f"{simbolo} fallo interno: {str(e)}", inicio)
+            traceback.print_exc()
+
+    if not resultados:
+        log_event(simbolo, "SKIP", f"{simbolo} sin señales para {ultima_fecha}", inicio)
+        return None
+    df_result = pd.concat(resultados)
+    df_result["fecha"] = pd.to_datetime(df_result["fecha"]).dt.strftime("%Y-%m-%d")
+    log_event(simbolo, "OK", f"{simbolo} procesado - estrategias: {', '.join(df_result['estrategia'].unique())}", inicio)
+    return df_result
+
+def generar_senales_dia(simbolos, estrategias, precios=None, guardar=True):
+    """
+    Genera las senales del ultimo dia para `simbolos`.
+    `precios` (dict simbolo -> DataFrame) evita releer historic_reciente cuando
+    la etapa anterior ya tiene los datos en memoria.
+    Devuelve (DataFrame con todas las senales, lista de simbolos con error).
+    """
+    precios = precios or {}
+    errores = []
+    senales = []
+    filas = 0
+    inicio_total = datetime.now()
+
+    for simbolo in simbolos:
+        inicio = datetime.now()
+        try:
+            df = precios.get(simbolo)
+            if df is None:
+                archivo = HISTORIC_PATH / f"{simbolo}.parquet"
+                if not archivo.exists():
+                    raise FileNotFoundError(f"{archivo} no encontrado")
+                df = pd.read_parquet(archivo)
+            filas += len(df)
+            df_result = senales_simbolo(simbolo, df.reset_index(drop=True), estrategias, inicio)
+            if df_result is not None:
+                senales.append(df_result)
+                if guardar:
+                    df_result.to_csv(OUTPUT_PATH / f"{simbolo}_senales_diarias.csv", index=False)
+        except Exception as e:
+            errores.append(simbolo)
+            log_event(simbolo, "ERROR", f"{simbolo} fallo: {str(e)}", inicio)
+            traceback.print_exc()
+        observar("simbolo_segundos", (datetime.now() - inicio).total_seconds(), etapa="shu_dia", simbolo=simbolo)
+
+    log_event("shu_diario", "RESUMEN", f"{len(simbolos)-len(errores)} de {len(simbolos)} procesados", inicio_total)
+    anotar_volumen(filas=filas, simbolos=len(simbolos))
+    for nombre_est, r in emitir_resumen().items():
+        log_event(nombre_est, "RESUMEN", f"llamadas={r['llamadas']} buy={r['buy']} sell={r['sell']} errores={r['errores']} tiempo={r['duracion_s']}s", inicio_total)
+    df_senales = pd.concat(senales, ignore_index=True) if senales else pd.DataFrame(columns=["fecha", "signal", "estrategia", "simbolo"])
+    return df_senales, errores
+
+# === PREPARAR CARPETA OUTPUT ===
+def preparar_salida(simbolos, modo):
+    # En modo incremental solo se regeneran los simbolos afectados; el resto conserva su salida
+    if OUTPUT_PATH.exists():
+        if modo == "completo":
+            for archivo in OUTPUT_PATH.glob("*"):
+                archivo.unlink()
         else:
-            log_event(simbolo, "SKIP", f"{simbolo} sin señales para {ultima_fecha}", inicio)
+            for simbolo in simbolos:
+                (OUTPUT_PATH / f"{simbolo}_senales_diarias.csv").unlink(missing_ok=True)
+    else:
+        OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+
+# === ACTUALIZAR STATUS ===
+def actualizar_status(simbolos, errores, modo, inicio=None):
+    guardar_estado(
+        "senales_heuristicas_diarias",
+        "OK" if not errores else "ERROR",
+        f"{len(simbolos)-len(errores)} de {len(simbolos)} procesados (modo {modo})",
+        fecha=datetime.now().strftime("%Y-%m-%d"),
+        inicio=inicio,
+    )
+
+# === MAIN ===
+def main(argv=None):
+    parser = agregar_argumento(argparse.ArgumentParser(description="Senales heuristicas diarias"))
+    args = agregar_argumento_perfil(parser).parse_args(argv)
+    exportar_al_salir("shu_dia")
+    activar_perfilado("shu_dia", args.profile)
+    iniciar_muestreo("shu_dia")
 
-    except Exception as e:
-        errores.append(simbolo)
-        log_event(simbolo, "ERROR", f"{simbolo} fallo: {str(e)}", inicio)
-        traceback.print_exc()
+    inicio = datetime.now()
+    simbolos, modo = simbolos_a_procesar(cargar_simbolos(), args.cambios)
+    estrategias = cargar_estrategias()
+    log_event("loader", "OK", f"Modo {modo}: {len(simbolos)} simbolos a procesar", datetime.now())
 
-log_event("shu_diario", "RESUMEN", f"{len(SIMBOLOS)-len(errores)} de {len(SIMBOLOS)} procesados", inicio_total)
+    preparar_salida(simbolos, modo)
+    _, errores = generar_senales_dia(simbolos, estrategias)
+    actualizar_status(simbolos, errores, modo, inicio=inicio)
 
-# === ACTUALIZAR STATUS ===
-estado = {
-    "fecha": datetime.now().strftime("%Y-%m-%d"),
-    "status": "OK" if not errores else "ERROR",
-    "mensaje": f"{len(SIMBOLOS)-len(errores)} de {len(SIMBOLOS)} procesados"
-}
-with open(STATUS_PATH, "r") as f:
-    status_json = json.load(f)
-status_json["senales_heuristicas_diarias"] = estado
-with open(STATUS_PATH, "w") as f:
-    json.dump(status_json, f, indent=2)
+if __name__ == "__main__":
+    main()
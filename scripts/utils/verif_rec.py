@@ -1,7 +1,11 @@
 import os
-import pandas as pd
+import sys
 from datetime import datetime
 
+sys.path.append("/home/ubuntu/tr")
+
+from my_modules.validacion_historicos import validar_directorio
+
 # === CONFIGURACION ===
 CARPETA = "/home/ubuntu/tr/data/historic_recuperado/"
 FECHA_OBJETIVO = "2025-05-29"
@@ -19,24 +23,19 @@ def log(msg):
 def main():
     os.makedirs(os.path.dirname(LOG), exist_ok=True)
 
-    archivos = [f for f in os.listdir(CARPETA) if f.endswith(".parquet")]
-    total = 0
+    # Solo footers: fecha_max sale de las estadisticas min/max del parquet
+    df = validar_directorio(CARPETA, fecha_referencia=FECHA_OBJETIVO, corregir=False)
     errores = []
 
-    for archivo in sorted(archivos):
-        simbolo = archivo.replace(".parquet", "").upper()
-        try:
-            df = pd.read_parquet(os.path.join(CARPETA, archivo))
-            fecha_max = df["datetime"].max().strftime("%Y-%m-%d")
-            if fecha_max != FECHA_OBJETIVO:
-                errores.append(f"{simbolo} tiene fecha {fecha_max}")
-            else:
-                log(f"OK {simbolo}")
-            total += 1
-        except Exception as e:
-            errores.append(f"{simbolo} ERROR al leer: {e}")
-
-    log(f"Validados {total} archivos.")
+    for _, r in df.iterrows():
+        if r["error"]:
+            errores.append(f"{r['simbolo']} ERROR al leer: {r['error']}")
+        elif r["fecha_max"] is None or r["fecha_max"].isoformat() != FECHA_OBJETIVO:
+            errores.append(f"{r['simbolo']} tiene fecha {r['fecha_max']}")
+        else:
+            log(f"OK {r['simbolo']}")
+
+    log(f"Validados {len(df) - int(df['error'].notna().sum()) if not df.empty else 0} archivos.")
     if errores:
         log("Errores encontrados:")
         for err in errores: